@@ -1,149 +1,583 @@
 import os
+import re
+import json
 import base64
-from io import BytesIO
-from typing import Dict, Any, List
-from PIL import Image
-from langchain_core.tools import tool
+import time
+import asyncio
+import functools
+import itertools
+from contextlib import closing
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage
+from langchain_core.runnables import Runnable
+from pydantic import BaseModel
 from pathlib import Path
-from agent.state import InputProcessorState, SymptomFinderState, SymptomCheckerState, MedicalKnowledgeState
-from agent.utils.tools import logger, get_agent
+from agent.prompt import (OCR_PROMPT, KNOWLEDGE_REASONING_PROMPT,
+                          IMAGE_CLASSIFIER_PROMPT, SYMPTOM_FINDER_PROMPT,
+                          SYMPTOM_CHECKER_PROMPT, REPORT_GENERATOR_PROMPT,
+                          CASCADE_CONFIDENCE_PROMPT, IMAGE_REGIONS_PROMPT,
+                          SYMPTOM_FINDER_REGIONS_PROMPT)
+from agent.state import (InputProcessorState, ImagePreprocessorState,
+                         SymptomFinderState, SymptomCheckerState,
+                         MedicalKnowledgeState)
+from agent.utils.pdf import iter_pdf_pages
+from langgraph.config import get_config, get_stream_writer
+from langgraph.types import interrupt
+from agent.utils.context import pack_context
+from agent.utils.image import (encode_image, encode_crops, image_profile,
+                               resolve_image)
+from agent.utils.ocr import ocr_image, ocr_pages
+from agent.utils.tools import DEFAULT_MODELS, logger, get_agent, call_cost
+from agent.utils.tracing import annotate, span
 
-API_CONFIG = {
-    "base_url": os.getenv("MODEL_URL", "https://api.siliconflow.cn/v1"),
-    "api_key": os.getenv("API_KEY", None),
-}
+TEXT_SUFFIXES = {".txt", ".md"}
+BOX_PATTERN = re.compile(
+    r"\[\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*\]")
 
-LLM_CONFIG = {
-    "model_name": os.getenv("LLM_MODEL", "Qwen/Qwen3-235B-A22B-Instruct-2507"),
-    "max_completion_tokens": int(os.getenv("LLM_MAX_TOKENS", 16384)),
-    "temperature": float(os.getenv("LLM_TEMPERATURE", 0.3)),
-    "top_p": float(os.getenv("LLM_TOP_P", 0.7)),
-}
 
-VLM_CONFIG = {
-    "model_name": os.getenv("VLM_MODEL", "Qwen/Qwen3-VL-235B-A22B-Instruct"),
-    "max_completion_tokens": int(os.getenv("VLM_MAX_TOKENS", 16384)),
-    "temperature": float(os.getenv("VLM_TEMPERATURE", 0.3)),
-    "top_p": float(os.getenv("VLM_TOP_P", 0.7)),
-}
+# Chat clients are built on first use and shared across graph invocations.
+def get_mk_agent() -> ChatOpenAI:
+    return get_agent(name="SLM", tags=["MK"])
+
+
+def get_llm_agent() -> ChatOpenAI:
+    return get_agent(name="LLM", tags=["stream"])
+
+
+def get_vlm_agent() -> ChatOpenAI:
+    return get_agent(name="VLM", tags=["stream"])
+
+
+def get_ocr_agent() -> ChatOpenAI:
+    return get_agent(name="OCR")
+
 
-SLM_CONFIG = {
-    "model_name": os.getenv("SLM_MODEL", "Qwen/Qwen3-14B"),
-    "max_completion_tokens": int(os.getenv("SLM_MAX_TOKENS", 4096)),
-    "temperature": float(os.getenv("SLM_TEMPERATURE", 0.1)),
+def get_svlm_agent() -> ChatOpenAI:
+    return get_agent(name="SVLM")
+
+
+AGENTS = {
+    "SLM": get_mk_agent,
+    "LLM": get_llm_agent,
+    "VLM": get_vlm_agent,
+    "SVLM": get_svlm_agent,
 }
 
-EMBEDDING_MODEL_CONFIG = {
-    "model_name": os.getenv("EMBEDDING_MODEL", "Qwen/Qwen3-Embedding-8B"),
+# Steps that try a small model first when `CASCADE=true`: the small and
+# large agent and the default confidence below which the step escalates,
+# overridable per node with e.g. `SYMPTOM_CHECKER_CASCADE_THRESHOLD`.
+CASCADES = {
+    "ImageClassifier": ("SVLM", "VLM", 0.8),
+    "SymptomFinder": ("SVLM", "VLM", 0.8),
+    "SymptomChecker": ("SLM", "LLM", 0.7),
 }
 
-MK_AGENT = get_agent(**API_CONFIG, **SLM_CONFIG, tag="MK")
-LLM_AGENT = get_agent(**API_CONFIG, **LLM_CONFIG, tag="LLM")
-VLM_AGENT = get_agent(**API_CONFIG, **VLM_CONFIG, tag="VLM")
+
+def timed(node):
+    """Add the node's cumulative wall time to the `timings` update and
+    record the call as a `node` span."""
+
+    @functools.wraps(node)
+    async def wrapper(state: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        with span(node.__name__, kind="node"):
+            update = await node(state)
+        timings = state.get("timings") or {}
+        update["timings"] = {
+            node.__name__:
+            timings.get(node.__name__, 0.0) + time.perf_counter() - start
+        }
+        return update
+
+    return wrapper
+
+
+def _data_url(image: str) -> str:
+    mime = "image/png" if image.startswith("iVBOR") else "image/jpeg"
+    return f"data:{mime};base64,{image}"
+
+
+def _image_message(text: str, *images: str) -> HumanMessage:
+    content: List[Dict[str, Any]] = [{
+        "type": "image_url",
+        "image_url": {
+            "url": _data_url(image)
+        }
+    } for image in images]
+    content.append({"type": "text", "text": text})
+    return HumanMessage(content=content)
+
+
+def _field(text: str, name: str) -> Optional[str]:
+    match = re.search(rf"^\W*{name}\W*:\s*(.+)$", text,
+                      re.IGNORECASE | re.MULTILINE)
+    return match.group(1).strip() if match else None
+
+
+def _drop_field(text: str, name: str) -> str:
+    return re.sub(rf"^\W*{name}\W*:.*$",
+                  "",
+                  text,
+                  flags=re.IGNORECASE | re.MULTILINE).strip()
+
+
+######################################################################
+############################ Model Cascade ###########################
+######################################################################
+def cascade_threshold_variable(node: str) -> str:
+    """`SymptomChecker` -> `SYMPTOM_CHECKER_CASCADE_THRESHOLD`."""
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", node).upper() + "_CASCADE_THRESHOLD"
+
+
+def cascade_threshold(node: str) -> float:
+    return float(os.getenv(cascade_threshold_variable(node),
+                           CASCADES[node][2]))
+
+
+class CascadeAnswer(BaseModel):
+    """Structured reply of a cascaded small model."""
+    answer: str
+    confidence: float
+
+
+@functools.lru_cache(maxsize=None)
+def _structured_agent(name: str) -> Runnable:
+    """Agent `name` answering with a `CascadeAnswer` in `raw`/`parsed`
+    form (`CASCADE_OUTPUT_METHOD`, JSON mode by default)."""
+    method = os.getenv("CASCADE_OUTPUT_METHOD", "json_mode")
+    return AGENTS[name]().with_structured_output(CascadeAnswer,
+                                                 method=method,
+                                                 include_raw=True)
+
+
+def _confidence(answer: CascadeAnswer) -> float:
+    """The confidence as a probability; "85" is read as 85%."""
+    value = answer.confidence
+    if value > 1:
+        value /= 100
+    return min(max(value, 0.0), 1.0)
+
+
+async def _cascade(
+    node: str,
+    make_input: Callable[[str], Any],
+    required: Tuple[str, ...] = ()
+) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """Answer with the node's small model, escalating to the large one when
+    the small model's confidence is under the node's threshold.
+
+    `make_input(suffix)` builds the model input with `suffix` appended to
+    the prompt text. The small model answers with a `CascadeAnswer`; a
+    reply that does not parse, or lacks a field in `required`, escalates
+    and is logged as such. Returns the answer and a `cascade_trace` entry,
+    which is None when `CASCADE` is off and the large model answers
+    directly.
+    """
+    small, large, _ = CASCADES[node]
+    if os.getenv("CASCADE", "false").lower() in ("0", "false"):
+        response = await AGENTS[large]().ainvoke(make_input(""))
+        return response.content, None
+    start = time.perf_counter()
+    threshold = cascade_threshold(node)
+    reply = await _structured_agent(small).ainvoke(
+        make_input(CASCADE_CONFIDENCE_PROMPT))
+    answer: Optional[CascadeAnswer] = reply["parsed"]
+    missing = [
+        name for name in required
+        if answer is not None and not _field(answer.answer, name)
+    ]
+    confidence = _confidence(answer) if answer and not missing else 0.0
+    entry = {
+        "node": node,
+        "model": small,
+        "confidence": confidence,
+        "threshold": threshold,
+        "escalated": confidence < threshold,
+        "cost": call_cost(small, reply["raw"].usage_metadata),
+    }
+    if answer is None:
+        entry["parse_error"] = repr(reply["parsing_error"])
+        logger.warning(f"{node}: unparsable {small} reply "
+                       f"({reply['parsing_error']!r}), escalating to {large}")
+    elif missing:
+        logger.warning(f"{node}: {small} answer lacks {', '.join(missing)}, "
+                       f"escalating to {large}")
+    elif entry["escalated"]:
+        logger.info(f"{node}: {small} confidence {confidence:.2f} < "
+                    f"{threshold:.2f}, escalating to {large}")
+    if entry["escalated"]:
+        response = await AGENTS[large]().ainvoke(make_input(""))
+        entry["model"] = large
+        entry["cost"] += call_cost(large, response.usage_metadata)
+        content = response.content
+    else:
+        content = answer.answer
+    entry["seconds"] = time.perf_counter() - start
+    annotate(cascaded=True, escalated=entry["escalated"], cost=entry["cost"])
+    return content, entry
 
 
 ######################################################################
 #################### Medical Knowledge Retriever #####################
 ######################################################################
-def KnowledgeRetriever(state: MedicalKnowledgeState):
-    pass
+def _normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+@timed
+async def KnowledgeRetriever(state: MedicalKnowledgeState):
+    """Retrieve for the current query, skipping queries and chunks this run
+    has already seen."""
+    from agent.utils.search import retrieve, rerank
+
+    start = time.perf_counter()
+    query = state.get("query") or state.get("medical_recode", "")
+    normalized = _normalize_query(query)
+    iteration = state.get("rag_iterations", 0) + 1
+    memo_hit = not normalized or normalized in state.get("rag_queries", [])
+    documents = []
+    if not memo_hit:
+        seen = {document["id"] for document in state.get("retrieved_docs", [])}
+        documents = [
+            document for document in await retrieve(query)
+            if document["id"] not in seen
+        ]
+        if documents:
+            documents = [{
+                **document, "iteration": iteration
+            } for document in await rerank(query, documents)]
     update = {
-        "references": "Medical knowledge retrieval is not yet implemented.",
+        "query":
+        query,
+        "retrieved_docs":
+        documents,
+        "rag_queries": [] if memo_hit else [normalized],
+        "rag_iterations":
+        iteration,
+        "rag_new_docs":
+        len(documents),
+        "rag_trace": [{
+            "iteration": iteration,
+            "step": "retrieval",
+            "memo_hit": memo_hit,
+            "new_docs": len(documents),
+            "seconds": time.perf_counter() - start,
+        }],
     }
     return update
 
 
-def KnowledgeReasoner(state: MedicalKnowledgeState):
-    pass
+def _context_order(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Documents of all iterations taken in turn, newest iteration first,
+    each in its rerank order. Rerank scores of different queries are not
+    comparable, and this keeps a follow-up query's chunks from being
+    budgeted out by the first iteration's."""
+    iterations: Dict[int, List[Dict[str, Any]]] = {}
+    for document in documents:
+        iterations.setdefault(document.get("iteration", 0),
+                              []).append(document)
+    batches = [iterations[key] for key in sorted(iterations, reverse=True)]
+    return [
+        document for turn in itertools.zip_longest(*batches)
+        for document in turn if document is not None
+    ]
+
+
+@timed
+async def KnowledgeReasoner(state: MedicalKnowledgeState):
+    """Reason over the packed context of everything retrieved so far."""
+    start = time.perf_counter()
+    packed, context = await asyncio.to_thread(
+        pack_context, _context_order(state.get("retrieved_docs", [])))
+    annotate(context_tokens=context["context_tokens"],
+             saved_tokens=context["saved_tokens"])
+    documents = "\n\n".join(document["content"] for document in packed)
+    medical_recode = state.get("medical_recode", "")
+    prompt = KNOWLEDGE_REASONING_PROMPT.format(medical_recode=medical_recode,
+                                               documents=documents or "None")
+    response = await get_mk_agent().ainvoke(prompt)
+    usage = response.usage_metadata or {}
+    tokens = usage.get("total_tokens") or (len(prompt) +
+                                           len(response.content)) // 4
+    follow_up = _field(response.content, "QUERY")
+    references = _drop_field(response.content, "QUERY")
     update = {
-        "call_rag": True,
-        "query": "Medical knowledge reasoning is not yet implemented.",
+        "call_rag":
+        bool(follow_up),
+        "query":
+        follow_up or state.get("query", ""),
+        "references":
+        references,
+        "rag_tokens":
+        state.get("rag_tokens", 0) + tokens,
+        "rag_trace": [{
+            "iteration": state.get("rag_iterations", 0),
+            "step": "reasoning",
+            "tokens": tokens,
+            "context_tokens": context["context_tokens"],
+            "saved_tokens": context["saved_tokens"],
+            "seconds": time.perf_counter() - start,
+        }],
     }
     return update
 
 
-def KnowledgeAgentInternalRouter(state: MedicalKnowledgeState):
-    if True:
-        return "Continue RAG"
-    return "Exit RAG"
+def KnowledgeAgentRetrievalRouter(state: MedicalKnowledgeState):
+    # A follow-up retrieval that found nothing new cannot change the answer.
+    if state.get("rag_iterations", 0) > 1 and not state.get("rag_new_docs"):
+        logger.info(f"Knowledge agent converged after "
+                    f"{state['rag_iterations'] - 1} iterations")
+        return "Exit RAG"
+    return "Reason"
 
 
-def MedicalAgentDiagnosisRouter(state: MedicalKnowledgeState):
-    if True:
-        return "Need Clinical Records"
-    return "No Need"
+def KnowledgeAgentInternalRouter(state: MedicalKnowledgeState):
+    iterations = state.get("rag_iterations", 0)
+    if not state.get("call_rag"):
+        return "Exit RAG"
+    if iterations >= int(os.getenv("RAG_MAX_ITERATIONS", 3)):
+        logger.info(f"Knowledge agent stopped at {iterations} iterations")
+        return "Exit RAG"
+    if state.get("rag_tokens", 0) >= int(os.getenv("RAG_TOKEN_BUDGET", 32000)):
+        logger.info(f"Knowledge agent stopped after spending "
+                    f"{state['rag_tokens']} tokens")
+        return "Exit RAG"
+    return "Continue RAG"
 
 
-def MedicalAgentVerdictRouter(state: MedicalKnowledgeState):
-    if True:
+def MedicalAgentDiagnosisRouter(state: MedicalKnowledgeState):
+    if state.get("medical_recode", "").strip():
         return "Need Medical Knowledge"
     return "No Need"
 
 
-def KnowledgeAgentOutputRouter(state: MedicalKnowledgeState):
-    if 1:
-        return "Medical Knowledge"
-    else:
-        return "elevant Clinical Cases"
-
-
 ######################################################################
 ########################### Medical Agent ############################
 ######################################################################
-def InputProcessor(state: InputProcessorState) -> dict:
-    """Convert image to base64 string."""
-    medical_recode_path: Path = Path(state["medical_recode_path"])
-    medical_image_path: Path = Path(state["medical_image_path"])
-    with open(medical_image_path, "rb") as img_file:
-        medical_image = base64.b64encode(img_file.read()).decode("utf-8")
-    # TODO: OCR for medical_recode_path if it's an image/PDF
+async def _ocr(data: bytes) -> str:
+    image = await asyncio.to_thread(encode_image, data, "OCR")
+    return await _ocr_encoded(image)
+
+
+async def _ocr_encoded(image: str) -> str:
+    response = await get_ocr_agent().ainvoke(
+        [_image_message(OCR_PROMPT, image)])
+    return response.content
+
+
+async def _ocr_page(data: bytes) -> str:
+    """OCR a PDF page already rendered to the OCR profile."""
+    return await _ocr_encoded(base64.b64encode(data).decode("utf-8"))
+
+
+def _ocr_config() -> str:
+    """What OCR text depends on besides the page image."""
+    model = os.getenv("OCR_MODEL", DEFAULT_MODELS["OCR"])
+    return json.dumps(
+        [model, OCR_PROMPT, image_profile("OCR")], sort_keys=True)
+
+
+def _pdf_pages(path: str) -> Iterator[Tuple[Optional[str], Optional[bytes]]]:
+    # Closing this generator closes the page iterator and its process pool.
+    with closing(iter_pdf_pages(path, profile=image_profile("OCR"))) as pages:
+        for page in pages:
+            yield page["text"], page["image"]
+
+
+@timed
+async def InputProcessor(state: InputProcessorState) -> dict:
+    """OCR the clinical record (text, image or PDF) into plain text.
+
+    PDF pages are OCRed concurrently and cached by page image (see
+    `agent.utils.ocr`); each page's text is also sent to the graph's
+    `custom` stream, in page order, as soon as it is ready.
+    """
     medical_recode: str = ""
-    update: dict = {
-        "medical_recode": medical_recode,
-        "medical_image": medical_image
-    }
+    if state.get("medical_recode_path"):
+        medical_recode_path: Path = Path(state["medical_recode_path"])
+        suffix = medical_recode_path.suffix.lower()
+        if suffix in TEXT_SUFFIXES:
+            medical_recode = await asyncio.to_thread(
+                medical_recode_path.read_text, encoding="utf-8")
+        elif suffix == ".pdf":
+            pages = _pdf_pages(str(medical_recode_path))
+            write = get_stream_writer()
+            texts: List[str] = []
+            async for text in ocr_pages(pages, _ocr_page, _ocr_config()):
+                texts.append(text)
+                write({"record_page": len(texts), "text": text})
+            medical_recode = "\n\n".join(texts)
+        else:
+            data = await asyncio.to_thread(medical_recode_path.read_bytes)
+            medical_recode = await ocr_image(data, _ocr, _ocr_config())
+    update: dict = {"medical_recode": medical_recode}
+    return update
+
+
+def roi_enabled() -> bool:
+    """Whether the image agent classifies a coarse image and looks closer
+    at native-resolution crops of the regions it places (`VLM_ROI`)."""
+    return os.getenv("VLM_ROI", "true").lower() not in ("0", "false")
+
+
+def _classifier_profile() -> str:
+    return "VLM_COARSE" if roi_enabled() else "VLM"
+
+
+@timed
+async def ImagePreprocessor(state: ImagePreprocessorState) -> dict:
+    """Resize and encode the medical image for the VLM (cached by hash)."""
+    medical_image = await asyncio.to_thread(encode_image,
+                                            state["medical_image_path"],
+                                            _classifier_profile(),
+                                            reference=True)
+    update: dict = {"medical_image": medical_image}
     return update
 
 
-def ImageClassifier(state: SymptomFinderState):
-    pass
+async def _medical_image(state: SymptomFinderState) -> str:
+    image = await asyncio.to_thread(resolve_image, state["medical_image"])
+    if image is None:
+        # Evicted from the image cache since the run was checkpointed.
+        image = await asyncio.to_thread(encode_image,
+                                        state["medical_image_path"],
+                                        _classifier_profile())
+    return image
+
+
+def _boxes(text: str) -> List[List[int]]:
+    """Valid boxes of the `BOXES` line, at most `ROI_MAX_REGIONS`."""
+    boxes = []
+    for match in BOX_PATTERN.finditer(_field(text, "BOXES") or ""):
+        x1, y1, x2, y2 = (min(int(value), 1000) for value in match.groups())
+        if x2 > x1 and y2 > y1 and [x1, y1, x2, y2] not in boxes:
+            boxes.append([x1, y1, x2, y2])
+    return boxes[:int(os.getenv("ROI_MAX_REGIONS", 4))]
+
+
+@timed
+async def ImageClassifier(state: SymptomFinderState):
+    image = await _medical_image(state)
+    prompt = IMAGE_CLASSIFIER_PROMPT
+    if roi_enabled():
+        prompt += IMAGE_REGIONS_PROMPT.format(
+            max_regions=os.getenv("ROI_MAX_REGIONS", 4))
+    content, cascade = await _cascade(
+        "ImageClassifier",
+        lambda suffix: [_image_message(prompt + suffix, image)],
+        required=("DISEASE", ))
+    reasoning = _field(content, "REASONING") or _drop_field(content, "BOXES")
     update = {
-        "reasoning": "Medical image classification is not yet implemented.",
-        "symptom": "Medical image classification is not yet implemented.",
-        "disease": "Medical image classification is not yet implemented."
+        "reasoning": reasoning,
+        "symptom": _field(content, "SYMPTOM") or "",
+        "disease": _field(content, "DISEASE") or "",
+        "bb": _boxes(content) if roi_enabled() else None,
     }
+    if cascade:
+        update["cascade_trace"] = [cascade]
     return update
 
 
-def SymptomFinder(state: SymptomFinderState):
-    pass
+def _finder_input(prompt: str, images: List[str], boxes: List[List[int]],
+                  suffix: str) -> List[HumanMessage]:
+    if boxes:
+        regions = "\n".join(f"{index}. {box}"
+                            for index, box in enumerate(boxes, 1))
+        prompt += SYMPTOM_FINDER_REGIONS_PROMPT.format(regions=regions)
+    return [_image_message(prompt + suffix, *images)]
+
+
+@timed
+async def SymptomFinder(state: SymptomFinderState):
+    """List findings on crops of the regions the classifier placed, several
+    per request (`VLM_MAX_IMAGES`), or on the full image without regions."""
+    disease = state.get("disease") or "unknown"
+    prompt = SYMPTOM_FINDER_PROMPT.format(disease=disease,
+                                          reasoning=state.get("reasoning", ""))
+    boxes = (state.get("bb") or []) if roi_enabled() else []
+    if boxes:
+        images = await asyncio.to_thread(encode_crops,
+                                         state["medical_image_path"], boxes)
+    elif roi_enabled():
+        # No region placed: look at the whole study in full detail.
+        images = [
+            await asyncio.to_thread(encode_image, state["medical_image_path"],
+                                    "VLM")
+        ]
+    else:
+        images = [await _medical_image(state)]
+    size = max(int(os.getenv("VLM_MAX_IMAGES", 4)), 1)
+    requests = [
+        functools.partial(_finder_input, prompt, images[start:start + size],
+                          boxes[start:start + size])
+        for start in range(0, len(images), size)
+    ]
+    answers = await asyncio.gather(*(_cascade("SymptomFinder", make_input)
+                                     for make_input in requests))
     update = {
-        "symptom": "Medical symptom finding is not yet implemented.",
+        "symptom": "\n".join(content for content, _ in answers),
     }
+    cascades = [cascade for _, cascade in answers if cascade]
+    if cascades:
+        update["cascade_trace"] = cascades
     return update
 
 
-def HumanReviewer(state: SymptomFinderState):
-    pass
+@timed
+async def HumanReviewer(state: SymptomCheckerState):
+    """Park the run until a reviewer resumes it (`human_review` in the
+    configurable, set by `build_app` from `HUMAN_REVIEW`).
+
+    The checkpoint holds the state meanwhile, so no worker waits. Resume
+    with `Command(resume=...)`: a comment string, or a dict that may also
+    correct `symptom` and `disease`.
+    """
+    if not get_config().get("configurable", {}).get("human_review"):
+        return {}
+    review = interrupt({
+        "symptom": state.get("symptom", ""),
+        "disease": state.get("disease", ""),
+        "self_reflection": state.get("self_reflection", ""),
+    })
+    if not isinstance(review, dict):
+        review = {"review": str(review or "")}
     update = {
-        "symptom": "Medical symptom finding is not yet implemented.",
+        key: review[key]
+        for key in ("symptom", "disease", "review") if key in review
     }
     return update
 
 
-def SymptomChecker(state: SymptomCheckerState):
-    pass
+@timed
+async def SymptomChecker(state: SymptomCheckerState):
+    prompt = SYMPTOM_CHECKER_PROMPT.format(
+        symptom=state.get("symptom", ""),
+        disease=state.get("disease", ""),
+        reasoning=state.get("reasoning", ""),
+        medical_recode=state.get("medical_recode") or "None",
+        references=state.get("references") or "None")
+    content, cascade = await _cascade("SymptomChecker",
+                                      lambda suffix: prompt + suffix)
     update = {
-        "self_reflection": "Medical symptom checking is not yet implemented.",
+        "self_reflection": content,
     }
+    if cascade:
+        update["cascade_trace"] = [cascade]
     return update
 
 
-def ReportGenerator(state: SymptomCheckerState):
-    pass
+@timed
+async def ReportGenerator(state: SymptomCheckerState):
+    response = await get_llm_agent().ainvoke(
+        REPORT_GENERATOR_PROMPT.format(
+            symptom=state.get("symptom", ""),
+            disease=state.get("disease", ""),
+            self_reflection=state.get("self_reflection", ""),
+            review=state.get("review") or "None",
+            medical_recode=state.get("medical_recode") or "None"))
     update = {
-        "medical_report": "Medical symptom checking is not yet implemented.",
+        "medical_report": response.content,
     }
+    logger.info("Medical report generated")
     return update
@@ -0,0 +1,77 @@
+OCR_PROMPT = "<image>\n<|grounding|>OCR this image."
+
+KNOWLEDGE_REASONING_PROMPT = """You are a medical knowledge assistant.
+Using the retrieved references, summarise the medical knowledge relevant to
+the clinical record below. If an important question is still unanswered,
+end with one line `QUERY: <search query>`; otherwise do not add it.
+
+Clinical record:
+{medical_recode}
+
+Retrieved references:
+{documents}"""
+
+CHUNK_SUMMARY_PROMPT = """Summarise this section of a medical document in
+a short paragraph. Keep the diseases, findings, criteria, treatments and
+recommendations it covers; leave out examples and references.
+
+{text}"""
+
+MERGE_SUMMARY_PROMPT = """These are summaries of consecutive sections of a
+medical document. Merge them into one short summary of the whole that says
+which diseases, findings and recommendations the document covers.
+
+{text}"""
+
+IMAGE_CLASSIFIER_PROMPT = """Classify this medical image. Give the imaging
+modality and body region, the most likely disease and your reasoning, using
+the lines `REASONING:`, `DISEASE:` and `SYMPTOM:`."""
+
+SYMPTOM_FINDER_PROMPT = """The image was classified as {disease}.
+Reasoning: {reasoning}
+
+List the visible findings that support or contradict this, one per line."""
+
+IMAGE_REGIONS_PROMPT = """
+
+Also give up to {max_regions} regions that deserve a closer look, as
+`BOXES: [x1, y1, x2, y2], ...` with coordinates from 0 to 1000 of the
+image width and height."""
+
+SYMPTOM_FINDER_REGIONS_PROMPT = """
+
+The images are regions of the study cropped at full resolution, in this
+order, as [x1, y1, x2, y2] from 0 to 1000 of the image width and height:
+{regions}"""
+
+SYMPTOM_CHECKER_PROMPT = """Check the image findings against the clinical
+record and the medical references. Point out inconsistencies, missing
+evidence and alternative diagnoses.
+
+Findings: {symptom}
+Suspected disease: {disease}
+Image reasoning: {reasoning}
+
+Clinical record:
+{medical_recode}
+
+Medical references:
+{references}"""
+
+REPORT_GENERATOR_PROMPT = """Write a structured diagnostic report with
+the sections Findings, Impression and Recommendations.
+
+Findings: {symptom}
+Suspected disease: {disease}
+Review notes: {self_reflection}
+Reviewer comments: {review}
+
+Clinical record:
+{medical_recode}"""
+
+CASCADE_CONFIDENCE_PROMPT = """
+
+Reply with one JSON object and nothing else:
+{"answer": "<your complete answer, in the format asked for above>",
+ "confidence": <0.0-1.0, how likely the answer is correct and complete
+ without a review by a larger model>}"""
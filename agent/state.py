@@ -1,4 +1,15 @@
-from typing import TypedDict, List, Dict, Any, Optional
+import operator
+from typing import Annotated, TypedDict, List, Dict, Any, Optional
+
+
+def merge_timings(left: Optional[Dict[str, float]],
+                  right: Optional[Dict[str, float]]) -> Dict[str, float]:
+    """Union of per-node wall times written by parallel branches.
+
+    Nodes write their cumulative time, so a branch handing back timings it
+    was given does not count them twice.
+    """
+    return {**(left or {}), **(right or {})}
 
 
 class MedicalAgentInputState(TypedDict):
@@ -8,29 +19,81 @@ class MedicalAgentInputState(TypedDict):
 
 class MedicalOutputInputState(TypedDict):
     medical_report: str
+    rag_iterations: int
+    rag_trace: Annotated[List[Dict[str, Any]], operator.add]
+    cascade_trace: Annotated[List[Dict[str, Any]], operator.add]
+    timings: Annotated[Dict[str, float], merge_timings]
 
 
 class InputProcessorState(TypedDict):
-    medical_image_path: str
     medical_recode_path: str
     medical_recode: str
+    timings: Annotated[Dict[str, float], merge_timings]
+
+
+class ImagePreprocessorState(TypedDict):
+    medical_image_path: str
+    # A reference into the image cache, not the payload, so checkpoints
+    # stay small; nodes resolve it with `resolve_image`.
     medical_image: str
+    timings: Annotated[Dict[str, float], merge_timings]
 
 
 class SymptomFinderState(TypedDict):
+    medical_image_path: str
     medical_image: str
     reasoning: str
     symptom: str
     disease: str
-    bb: Optional[List[int]]
+    # Regions of interest from the coarse pass, as [x1, y1, x2, y2] from 0
+    # to 1000 of the image size; follow-up passes read crops of them.
+    bb: Optional[List[List[int]]]
+    # One entry per step that ran on the model cascade (`CASCADE=true`).
+    cascade_trace: Annotated[List[Dict[str, Any]], operator.add]
+    timings: Annotated[Dict[str, float], merge_timings]
 
 
 class SymptomCheckerState(TypedDict):
+    medical_recode: str
+    references: str
+    reasoning: str
     symptom: str
     disease: str
+    self_reflection: str
+    review: str
     medical_report: str
+    cascade_trace: Annotated[List[Dict[str, Any]], operator.add]
+    timings: Annotated[Dict[str, float], merge_timings]
 
 
 class MedicalKnowledgeState(TypedDict):
+    medical_recode: str
     query: str
-    retrieved_docs: List[Dict[str, Any]]
+    retrieved_docs: Annotated[List[Dict[str, Any]], operator.add]
+    references: str
+    call_rag: bool
+    # Per-run retrieval memo and loop budget: normalized queries already
+    # searched, iterations and SLM tokens spent, documents the last
+    # retrieval added, and one trace entry per retrieval/reasoning step.
+    rag_queries: Annotated[List[str], operator.add]
+    rag_iterations: int
+    rag_tokens: int
+    rag_new_docs: int
+    rag_trace: Annotated[List[Dict[str, Any]], operator.add]
+    timings: Annotated[Dict[str, float], merge_timings]
+
+
+# Parallel branches of the medical agent; each runs as one subgraph so a
+# short branch never waits on a step of the other.
+class ClinicalRecordState(InputProcessorState, MedicalKnowledgeState):
+    pass
+
+
+class MedicalImageState(ImagePreprocessorState, SymptomFinderState):
+    pass
+
+
+class MedicalAgentState(ClinicalRecordState, MedicalImageState,
+                        SymptomCheckerState):
+    medical_image_path: str
+    medical_recode_path: str
@@ -1,8 +1,37 @@
-from .nrag import AsyncQdrantRAG
-from .search import retrieve, rerank
-from .tools import logger, get_agent, get_embedding_model, image_to_base64, pdf_to_image_list
-
-__all__ = [
-    "logger", "get_agent", "get_embedding_model", "image_to_base64",
-    "pdf_to_image_list", "AsyncQdrantRAG", "retrieve", "rerank"
-]
+import importlib
+
+# Exports are resolved on first attribute access so that importing
+# agent.utils stays cheap and never touches the network.
+_EXPORTS = {
+    "logger": ".tools",
+    "get_agent": ".tools",
+    "get_embedding_model": ".tools",
+    "get_sparse_model": ".tools",
+    "get_response_cache": ".tools",
+    "response_cache_stats": ".tools",
+    "image_to_base64": ".tools",
+    "pdf_to_image_list": ".tools",
+    "iter_pdf_pages": ".pdf",
+    "encode_image": ".image",
+    "ocr_pages": ".ocr",
+    "open_checkpointer": ".checkpoint",
+    "AsyncQdrantRAG": ".nrag",
+    "get_rag": ".nrag",
+    "retrieve": ".search",
+    "rerank": ".search",
+    "get_reranker": ".reranker",
+    "get_gateway": ".gateway",
+    "deadline": ".gateway",
+    "trace_run": ".tracing",
+    "flush_traces": ".tracing",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,507 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import threading
+import numpy as np
+from pathlib import Path
+from loguru import logger
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from langchain_core.caches import BaseCache
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU map with hit/miss counters."""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: str, value: Any):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._data)
+        }
+
+
+class DiskCache:
+    """SQLite blob store with an LRU memory front and size-based eviction.
+
+    Values are raw bytes. When the stored payload exceeds `max_bytes`, the
+    least recently accessed rows are dropped until it is back under 90% of
+    the budget. With `ttl` (seconds), entries older than that read as
+    missing and are purged on access and before eviction.
+    """
+
+    def __init__(self,
+                 path: str | Path,
+                 max_bytes: int = 1 << 30,
+                 memory_size: int = 4096,
+                 ttl: Optional[float] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.memory = LRUCache(memory_size)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS entries ("
+                           "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                           "size INTEGER NOT NULL, accessed REAL NOT NULL, "
+                           "created REAL)")
+        columns = {
+            row[1]
+            for row in self._conn.execute("PRAGMA table_info(entries)")
+        }
+        if "created" not in columns:
+            self._conn.execute("ALTER TABLE entries ADD COLUMN created REAL")
+            self._conn.execute("UPDATE entries SET created = accessed")
+            self._conn.commit()
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)")
+        self._bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def _expired(self, created: Optional[float], now: float) -> bool:
+        return bool(self.ttl) and (created or 0) < now - self.ttl
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        now = time.time()
+        found: Dict[str, bytes] = {}
+        missing: List[str] = []
+        for key in keys:
+            entry = self.memory.get(key)
+            if entry is None or self._expired(entry[1], now):
+                missing.append(key)
+            else:
+                found[key] = entry[0]
+        memory_hits = len(found)
+
+        if missing:
+            with self._lock:
+                for i in range(0, len(missing), 500):
+                    page = missing[i:i + 500]
+                    rows = self._conn.execute(
+                        "SELECT key, value, size, created FROM entries "
+                        f"WHERE key IN ({','.join('?' * len(page))})",
+                        page).fetchall()
+                    fresh, expired = [], []
+                    for key, value, size, created in rows:
+                        if self._expired(created, now):
+                            expired.append((key, ))
+                            self._bytes -= size
+                            self.memory.pop(key)
+                            continue
+                        found[key] = value
+                        fresh.append((now, key))
+                        self.memory.put(key, (value, created))
+                    self._conn.executemany(
+                        "UPDATE entries SET accessed = ? WHERE key = ?", fresh)
+                    self._conn.executemany("DELETE FROM entries WHERE key = ?",
+                                           expired)
+                self._conn.commit()
+
+        self.hits += len(found)
+        self.misses += len(missing) - (len(found) - memory_hits)
+        return found
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items: Iterable[Tuple[str, bytes]]):
+        now = time.time()
+        rows = list({
+            key: (key, value, len(value), now, now)
+            for key, value in items
+        }.values())
+        if not rows:
+            return
+        with self._lock:
+            keys = [row[0] for row in rows]
+            replaced = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM entries WHERE key IN "
+                f"({','.join('?' * len(keys))})", keys).fetchone()[0]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries"
+                "(key, value, size, accessed, created) VALUES (?, ?, ?, ?, ?)",
+                rows)
+            self._bytes += sum(row[2] for row in rows) - replaced
+            if self._bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+        for key, value, _, _, created in rows:
+            self.memory.put(key, (value, created))
+
+    def put(self, key: str, value: bytes):
+        self.put_many([(key, value)])
+
+    def scan(self, prefix: str) -> Iterator[Tuple[str, bytes]]:
+        """Yield unexpired `(key, value)` pairs whose key starts with
+        `prefix`, without touching access times or counters."""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value, created FROM entries "
+                "WHERE key >= ? AND key < ?",
+                (prefix, prefix + "\uffff")).fetchall()
+        for key, value, created in rows:
+            if not self._expired(created, now):
+                yield key, value
+
+    def _evict(self):
+        if self.ttl:
+            cutoff = time.time() - self.ttl
+            expired = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM entries WHERE created < ?",
+                (cutoff, )).fetchone()[0]
+            self._conn.execute("DELETE FROM entries WHERE created < ?",
+                               (cutoff, ))
+            self._bytes -= expired
+        target = int(self.max_bytes * 0.9)
+        cursor = self._conn.execute(
+            "SELECT key, size FROM entries ORDER BY accessed ASC")
+        victims = []
+        for key, size in cursor:
+            if self._bytes <= target:
+                break
+            victims.append((key, ))
+            self._bytes -= size
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+        for (key, ) in victims:
+            self.memory.pop(key)
+        logger.debug(f"Evicted {len(victims)} entries from {self.path}")
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+            self._bytes = 0
+        self.memory.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries = self._conn.execute(
+                "SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "memory_hits": self.memory.hits,
+            "entries": entries,
+            "bytes": self._bytes,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper backed by a content-addressed `DiskCache`.
+
+    Vectors are keyed by (model name, storage dtype, dimensions, SHA-256
+    of the text) so re-embedding an unchanged corpus or a repeated query
+    never reaches the remote model, and rows written under other settings
+    are never decoded.
+    """
+
+    def __init__(self,
+                 embeddings: Embeddings,
+                 model_name: str,
+                 cache: Optional[DiskCache] = None,
+                 dtype: Optional[str] = None,
+                 dimensions: Optional[int] = None):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.dtype = np.dtype(dtype
+                              or os.getenv("EMBEDDING_CACHE_DTYPE", "float16"))
+        self.dimensions = dimensions
+        self.cache = cache or DiskCache(
+            Path(os.getenv("CACHE_DIR", "./cache")) / "embeddings.sqlite",
+            max_bytes=int(os.getenv("EMBEDDING_CACHE_MAX_MB", 2048)) << 20,
+            memory_size=int(os.getenv("EMBEDDING_CACHE_MEMORY", 4096)))
+
+    def _key(self, text: str) -> str:
+        return (f"{self.model_name}:{self.dtype.name}:{self.dimensions}:"
+                f"{hash_text(text)}")
+
+    def _lookup(
+            self,
+            texts: List[str]) -> Tuple[List[Optional[List[float]]], List[int]]:
+        keys = [self._key(text) for text in texts]
+        found = self.cache.get_many(keys)
+        vectors: List[Optional[List[float]]] = []
+        missing: List[int] = []
+        for i, key in enumerate(keys):
+            vector = None
+            if key in found:
+                vector = np.frombuffer(found[key], dtype=self.dtype)
+                if self.dimensions and len(vector) != self.dimensions:
+                    vector = None
+            if vector is not None:
+                vectors.append(vector.astype(np.float32).tolist())
+            else:
+                vectors.append(None)
+                missing.append(i)
+        return vectors, missing
+
+    def _store(self, texts: List[str], vectors: List[List[float]]):
+        self.cache.put_many(
+            (self._key(text), np.asarray(vector, dtype=self.dtype).tobytes())
+            for text, vector in zip(texts, vectors))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors, missing = self._lookup(texts)
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            embedded = self.embeddings.embed_documents(missing_texts)
+            self._store(missing_texts, embedded)
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        vectors, missing = self._lookup([text])
+        if missing:
+            vectors[0] = self.embeddings.embed_query(text)
+            self._store([text], [vectors[0]])
+        return vectors[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors, missing = await asyncio.to_thread(self._lookup, texts)
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            embedded = await self.embeddings.aembed_documents(missing_texts)
+            await asyncio.to_thread(self._store, missing_texts, embedded)
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+        return vectors
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vectors, missing = await asyncio.to_thread(self._lookup, [text])
+        if missing:
+            vectors[0] = await self.embeddings.aembed_query(text)
+            await asyncio.to_thread(self._store, [text], [vectors[0]])
+        return vectors[0]
+
+    def stats(self) -> Dict[str, int]:
+        return self.cache.stats()
+
+
+def _prompt_text(prompt: str) -> Optional[str]:
+    """Text of a serialized chat prompt, or None if it carries images."""
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        return None
+    lines = []
+    for message in messages if isinstance(messages, list) else [messages]:
+        kwargs = message.get("kwargs", {}) if isinstance(message, dict) else {}
+        content = kwargs.get("content", "")
+        role = kwargs.get("type") or (message.get("id") or ["message"])[-1]
+        if isinstance(content, list):
+            parts = []
+            for part in content:
+                if isinstance(part, str):
+                    parts.append(part)
+                elif part.get("type") == "text":
+                    parts.append(part.get("text", ""))
+                else:
+                    return None
+            content = "\n".join(parts)
+        lines.append(f"{role}: {content}")
+    return "\n".join(lines)
+
+
+def _dump_generation(generation: Generation) -> Dict:
+    if isinstance(generation, ChatGeneration):
+        return {
+            "message": message_to_dict(generation.message),
+            "generation_info": generation.generation_info,
+        }
+    return {
+        "text": generation.text,
+        "generation_info": generation.generation_info
+    }
+
+
+def _load_generation(item: Dict) -> Generation:
+    if "message" in item:
+        return ChatGeneration(message=messages_from_dict([item["message"]])[0],
+                              generation_info=item.get("generation_info"))
+    return Generation(text=item["text"],
+                      generation_info=item.get("generation_info"))
+
+
+class ResponseCache(BaseCache):
+    """Chat response cache for one agent, over a shared `DiskCache`.
+
+    Exact hits are keyed by the hash of the model configuration string
+    (model, temperature, max tokens, ...) and the hash of the serialized
+    messages, images included. With `embeddings`, text-only prompts that
+    miss are also matched against earlier prompts of the same configuration
+    by cosine similarity of their embeddings, at `similarity` or above.
+    Hits count the tokens the cached response originally cost as saved.
+    """
+
+    def __init__(self,
+                 name: str,
+                 cache: DiskCache,
+                 embeddings: Optional[Embeddings] = None,
+                 similarity: float = 0.97):
+        self.name = name
+        self.cache = cache
+        self.embeddings = embeddings
+        self.similarity = similarity
+        self.counts = {"hits": 0, "semantic_hits": 0, "misses": 0}
+        self.saved_tokens = {"input_tokens": 0, "output_tokens": 0}
+        self._index: Dict[str, Tuple[List[str], np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _keys(prompt: str, llm_string: str) -> Tuple[str, str]:
+        return hash_text(llm_string)[:32], hash_text(prompt)
+
+    def _semantic_index(self, llm_hash: str) -> Tuple[List[str], np.ndarray]:
+        if llm_hash not in self._index:
+            keys, vectors = [], []
+            for key, value in self.cache.scan(f"sem:{llm_hash}:"):
+                keys.append(f"llm:{llm_hash}:{key.rsplit(':', 1)[1]}")
+                vectors.append(np.frombuffer(value, dtype=np.float16))
+            self._index[llm_hash] = (keys, np.asarray(vectors,
+                                                      dtype=np.float32))
+        return self._index[llm_hash]
+
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        try:
+            vector = np.asarray(self.embeddings.embed_query(text),
+                                dtype=np.float32)
+        except Exception as e:
+            logger.debug(f"Response cache embedding failed: {e}")
+            return None
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _semantic_lookup(self, prompt: str, llm_hash: str) -> Optional[bytes]:
+        text = _prompt_text(prompt)
+        if text is None:
+            return None
+        with self._lock:
+            keys, vectors = self._semantic_index(llm_hash)
+        if not keys:
+            return None
+        vector = self._embed(text)
+        if vector is None:
+            return None
+        scores = vectors @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity:
+            return None
+        return self.cache.get(keys[best])
+
+    def _count_hit(self, generations: List[Generation], semantic: bool):
+        self.counts["semantic_hits" if semantic else "hits"] += 1
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None),
+                            "usage_metadata", None) or {}
+            for key in self.saved_tokens:
+                self.saved_tokens[key] += usage.get(key, 0)
+
+    def lookup(self, prompt: str,
+               llm_string: str) -> Optional[List[Generation]]:
+        llm_hash, prompt_hash = self._keys(prompt, llm_string)
+        value = self.cache.get(f"llm:{llm_hash}:{prompt_hash}")
+        semantic = False
+        if value is None and self.embeddings is not None:
+            value = self._semantic_lookup(prompt, llm_hash)
+            semantic = value is not None
+        if value is None:
+            self.counts["misses"] += 1
+            return None
+        generations = [_load_generation(item) for item in json.loads(value)]
+        self._count_hit(generations, semantic)
+        # Lets callbacks tell a served response from a fresh one.
+        hit = "semantic" if semantic else "exact"
+        for generation in generations:
+            info = generation.generation_info or {}
+            generation.generation_info = {**info, "cache_hit": hit}
+        return generations
+
+    def update(self, prompt: str, llm_string: str,
+               return_val: List[Generation]):
+        llm_hash, prompt_hash = self._keys(prompt, llm_string)
+        items = [(f"llm:{llm_hash}:{prompt_hash}",
+                  json.dumps([
+                      _dump_generation(generation) for generation in return_val
+                  ]).encode("utf-8"))]
+        text = (_prompt_text(prompt) if self.embeddings is not None else None)
+        vector = self._embed(text) if text is not None else None
+        if vector is not None:
+            items.append((f"sem:{llm_hash}:{prompt_hash}",
+                          vector.astype(np.float16).tobytes()))
+            with self._lock:
+                if llm_hash in self._index:
+                    keys, vectors = self._index[llm_hash]
+                    self._index[llm_hash] = (keys + [items[0][0]],
+                                             np.vstack([
+                                                 vectors.reshape(
+                                                     -1, len(vector)), vector
+                                             ]))
+        self.cache.put_many(items)
+
+    def clear(self, **kwargs: Any):
+        self.cache.clear()
+        with self._lock:
+            self._index.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = sum(self.counts.values())
+        hits = self.counts["hits"] + self.counts["semantic_hits"]
+        return {
+            **self.counts,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "saved_tokens": dict(self.saved_tokens),
+        }
@@ -0,0 +1,42 @@
+import os
+import hashlib
+from pathlib import Path
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Optional
+
+if TYPE_CHECKING:
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+
+@asynccontextmanager
+async def open_checkpointer(
+        path: Optional[str] = None) -> AsyncIterator["AsyncSqliteSaver"]:
+    """Open the local SQLite checkpoint store (`CHECKPOINT_DB`).
+
+    The saver is bound to the running event loop, so open it inside the
+    loop that runs the graph and compile the graph with it there.
+    """
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    path = Path(path or os.getenv(
+        "CHECKPOINT_DB",
+        Path(os.getenv("CACHE_DIR", "./cache")) / "checkpoints.sqlite"))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    async with AsyncSqliteSaver.from_conn_string(str(path)) as saver:
+        await saver.setup()
+        yield saver
+
+
+def case_thread_id(case: Dict[str, Any]) -> str:
+    """Stable thread id of a case: its `case_id`, or a hash of its inputs."""
+    if case.get("case_id"):
+        return str(case["case_id"])
+    paths = [
+        str(Path(case[key]).resolve()) if case.get(key) else ""
+        for key in ("medical_image_path", "medical_recode_path")
+    ]
+    return hashlib.sha256("\0".join(paths).encode("utf-8")).hexdigest()[:16]
+
+
+def case_config(case: Dict[str, Any]) -> Dict[str, Any]:
+    return {"configurable": {"thread_id": case_thread_id(case)}}
@@ -1,46 +1,174 @@
 import os
+import numpy as np
+from functools import lru_cache
+from typing import Iterable, List, Sequence, Tuple
 from agent.utils import logger
-from transformers import AutoTokenizer
+from transformers import AutoTokenizer, PreTrainedTokenizerBase
 from huggingface_hub import snapshot_download
+from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+SENTENCE_ENDS = np.array([ord(c) for c in ".!?;。！？；"], dtype=np.uint32)
+WHITESPACE = np.array([ord(c) for c in " \t\n\r\u3000"], dtype=np.uint32)
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(repo_id: str | None = None) -> PreTrainedTokenizerBase:
+    """Load the chunking tokenizer once per process.
+
+    `TOKENIZER` may be a local directory or a hub repo id; hub files are
+    resolved from `CACHE_DIR` first and only downloaded when missing.
+    """
+    repo_id = repo_id or os.getenv("TOKENIZER", "Qwen/Qwen3-14B")
+    if os.path.isdir(repo_id):
+        return AutoTokenizer.from_pretrained(repo_id)
+
+    cache_dir = os.getenv("CACHE_DIR", './cache')
+    download = dict(repo_id=repo_id,
+                    allow_patterns=["*tokenizer*", "vocab.json", "merges.txt"],
+                    cache_dir=cache_dir)
+    try:
+        path = snapshot_download(local_files_only=True, **download)
+    except Exception:
+        logger.info(f"Downloading tokenizer to {cache_dir}")
+        path = snapshot_download(**download)
+    return AutoTokenizer.from_pretrained(path)
+
+
+def _boundary_ranks(text: str, starts: np.ndarray) -> np.ndarray:
+    """Rank each token start as a split point, vectorized over the document.
+
+    0 paragraph break, 1 line break, 2 sentence end, 3 whitespace, 4 other.
+    """
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    codes = np.concatenate([[0, 0], codes, [0, 0]])
+    position = starts + 2
+    prev2, prev, cur, nxt = (codes[position - 2], codes[position - 1],
+                             codes[position], codes[position + 1])
+    newline = ord("\n")
+    space = np.isin(prev, WHITESPACE) | np.isin(cur, WHITESPACE)
+    sentence = np.isin(prev, SENTENCE_ENDS) | (np.isin(prev, WHITESPACE)
+                                               & np.isin(prev2, SENTENCE_ENDS))
+    line = (prev == newline) | (cur == newline)
+    paragraph = ((prev == newline) & (prev2 == newline)) | ((cur == newline) &
+                                                            (nxt == newline))
+    ranks = np.full(len(starts), 4, dtype=np.int8)
+    ranks[space] = 3
+    ranks[sentence] = 2
+    ranks[line] = 1
+    ranks[paragraph] = 0
+    return ranks
+
 
 class RecursiveChunker(RecursiveCharacterTextSplitter):
+    """Split text into chunks of at most `CHUNK_TOKEN_SIZE` tokens.
+
+    `mode="token"` (default) tokenizes a document once with offsets and cuts
+    token windows at the best paragraph/line/sentence/word boundary, so chunk
+    lengths are measured in real tokens rather than estimated, and no
+    instance state is touched per call.
+    `mode="ratio"` keeps the character splitter driven by a chars-per-token
+    estimate.
+    """
 
-    def __init__(self, **kwargs):
-        self._init_tokenizer()
+    def __init__(self, mode: str | None = None, **kwargs):
+        self.mode = mode or os.getenv("CHUNK_MODE", "token")
+        self.tokenizer = get_tokenizer()
         self.chunk_token_size = int(os.getenv("CHUNK_TOKEN_SIZE", 1024))
         self.chunk_token_overlap = int(os.getenv("CHUNK_TOKEN_OVERLAP", 256))
+        # A window may end halfway through, so a larger overlap would stall
+        # the token splitter at one token per chunk.
+        if not 0 <= self.chunk_token_overlap <= self.chunk_token_size // 2:
+            raise ValueError(
+                f"CHUNK_TOKEN_OVERLAP={self.chunk_token_overlap} must be "
+                f"between 0 and half of CHUNK_TOKEN_SIZE="
+                f"{self.chunk_token_size}")
         super().__init__(chunk_size=self.chunk_token_size,
                          chunk_overlap=self.chunk_token_overlap,
                          **kwargs)
 
-    def _init_tokenizer(self):
-        cache_dir = os.getenv("CACHE_DIR", './cache')
-        required_files = [
-            "tokenizer.json", "tokenizer_config.json", "vocab.json",
-            "merges.txt"
-        ]
-        if not all(
-                os.path.exists(os.path.join(cache_dir, f))
-                for f in required_files):
-            logger.info(f"Downloading tokenizer to {cache_dir}")
-            snapshot_download(
-                repo_id=os.getenv("TOKENIZER", "Qwen/Qwen3-14B"),
-                allow_patterns=["*tokenizer*"],
-                cache_dir=cache_dir,
-            )
-        self.tokenizer = AutoTokenizer.from_pretrained(cache_dir)
+    def _encode_offsets(self,
+                        texts: Sequence[str]) -> List[List[Tuple[int, int]]]:
+        encodings = self.tokenizer.backend_tokenizer.encode_batch(
+            list(texts), add_special_tokens=False)
+        return [encoding.offsets for encoding in encodings]
 
-    def split_text(self, text) -> list[str]:
+    def _split_offsets(self, text: str,
+                       offsets: Sequence[Tuple[int, int]]) -> List[str]:
+        size = self.chunk_token_size
+        overlap = self.chunk_token_overlap
+        n_tokens = len(offsets)
+        if n_tokens == 0:
+            return []
+        starts = np.fromiter((offset[0] for offset in offsets),
+                             dtype=np.int64,
+                             count=n_tokens)
+        ranks = _boundary_ranks(text, starts)
+        chunks = []
+        start = 0
+        while start < n_tokens:
+            end = min(start + size, n_tokens)
+            if end < n_tokens:
+                # Latest best-ranked boundary in the second half of the window.
+                low = start + max(size // 2, 1)
+                window = ranks[low:end + 1]
+                end = low + len(window) - 1 - int(np.argmin(window[::-1]))
+            chunk = text[offsets[start][0]:offsets[end - 1][1]].strip()
+            if chunk:
+                chunks.append(chunk)
+            if end >= n_tokens:
+                break
+
+            # Start the overlap on a word boundary where possible.
+            next_start = max(end - overlap, start + 1)
+            words = np.flatnonzero(ranks[next_start:end] <= 3)
+            if len(words):
+                next_start += int(words[0])
+            start = next_start
+        return chunks
+
+    def _split_text_ratio(self, text: str) -> List[str]:
         sample_text = text[:4000] if len(text) > 4000 else text
         tokens = self.tokenizer.encode(sample_text)
-        ratio = len(sample_text) / len(tokens) if len(sample_text) > 0 else 2.8
+        ratio = len(sample_text) / len(tokens) if len(tokens) > 0 else 2.8
+
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=int(self.chunk_token_size * ratio),
+            chunk_overlap=int(self.chunk_token_overlap * ratio),
+            separators=self._separators,
+            keep_separator=self._keep_separator,
+            is_separator_regex=self._is_separator_regex)
+        return splitter.split_text(text)
 
-        char_chunk_size = int(self.chunk_token_size * ratio)
-        char_chunk_overlap = int(self.chunk_token_overlap * ratio)
+    def split_text(self, text) -> list[str]:
+        if self.mode == "ratio":
+            return self._split_text_ratio(text)
+        return self._split_offsets(text, self._encode_offsets([text])[0])
 
-        self._chunk_size = char_chunk_size
-        self._chunk_overlap = char_chunk_overlap
+    def split_documents_parallel(self,
+                                 documents: Iterable[Document],
+                                 batch_size: int = 64) -> List[Document]:
+        """Chunk a corpus, tokenizing each batch of documents in one call.
 
-        return super().split_text(text)
+        The fast tokenizer encodes a batch across all cores in native code,
+        so only the linear boundary search runs in Python.
+        """
+        documents = list(documents)
+        chunks: List[Document] = []
+        for i in range(0, len(documents), batch_size):
+            batch = documents[i:i + batch_size]
+            if self.mode == "ratio":
+                batch_offsets = [None] * len(batch)
+            else:
+                batch_offsets = self._encode_offsets(
+                    [document.page_content for document in batch])
+            for document, offsets in zip(batch, batch_offsets):
+                texts = (self._split_text_ratio(document.page_content)
+                         if offsets is None else self._split_offsets(
+                             document.page_content, offsets))
+                chunks.extend(
+                    Document(page_content=chunk,
+                             metadata={
+                                 **document.metadata, "chunk_index": index
+                             }) for index, chunk in enumerate(texts))
+        return chunks
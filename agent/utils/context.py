@@ -0,0 +1,182 @@
+"""Pack retrieved chunks into a compact, deduplicated prompt context.
+
+`pack_context` runs between retrieval/reranking and the LLM:
+
+1. Near-duplicate chunks are dropped: MinHash signatures over character
+   shingles are computed with numpy for all chunks at once, and a chunk
+   whose estimated Jaccard similarity to a better-ranked one reaches
+   `CONTEXT_DEDUP_THRESHOLD` is skipped.
+2. Chunks of the same file whose text overlaps, as consecutive
+   `RecursiveChunker` chunks do by `CHUNK_TOKEN_OVERLAP` tokens, are
+   merged back into one contiguous span.
+3. Spans are added in rank order while they fit `CONTEXT_TOKEN_BUDGET`
+   tokens of the shared chunking tokenizer.
+
+The returned stats say how many tokens the packed context saved over the
+plain concatenation. Set `CONTEXT_PACKING=false` to skip all three steps;
+the stats then only estimate the tokens, without loading the tokenizer.
+"""
+import os
+import numpy as np
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from loguru import logger
+
+
+def packing_enabled() -> bool:
+    return os.getenv("CONTEXT_PACKING", "true").lower() not in ("0", "false")
+
+
+def _estimate_tokens(texts: List[str]) -> List[int]:
+    return [len(text) // 4 for text in texts]
+
+
+@lru_cache(maxsize=None)
+def _token_counter() -> Callable[[List[str]], List[int]]:
+    try:
+        from .chunker import get_tokenizer
+
+        tokenizer = get_tokenizer().backend_tokenizer
+    except Exception as e:
+        logger.warning(f"Context tokenizer unavailable, estimating: {e!r}")
+        return _estimate_tokens
+    return lambda texts: [
+        len(encoding.ids)
+        for encoding in tokenizer.encode_batch(texts, add_special_tokens=False)
+    ]
+
+
+def count_tokens(texts: List[str]) -> List[int]:
+    return _token_counter()(texts) if texts else []
+
+
+def _shingles(text: str, size: int) -> np.ndarray:
+    """Distinct hashes of the `size`-character shingles of `text`, after
+    lowercasing and collapsing whitespace."""
+    text = " ".join(text.lower().split())
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    if len(codes) < size:
+        codes = np.pad(codes, (0, size - len(codes)))
+    windows = np.lib.stride_tricks.sliding_window_view(codes.astype(np.uint64),
+                                                       size)
+    # Polynomial hash of each window: code points are below 2**21 and the
+    # powers below 2**31, so the sums cannot overflow.
+    powers = np.array(
+        [pow(1_000_003, i, 1 << 31) for i in reversed(range(size))],
+        dtype=np.uint64)
+    return np.unique((windows * powers).sum(axis=1))
+
+
+def minhash_signatures(texts: List[str],
+                       permutations: int = 64,
+                       size: int = 5,
+                       seed: int = 0) -> np.ndarray:
+    """One row of `permutations` MinHash values per text."""
+    rng = np.random.default_rng(seed)
+    # Odd multipliers: multiply-shift hashing with wrap-around is universal.
+    a = rng.integers(1, 1 << 63, permutations, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 1 << 63, permutations, dtype=np.uint64)
+    signatures = np.empty((len(texts), permutations), dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for row, text in enumerate(texts):
+            shingles = _shingles(text, size)
+            hashes = (a[:, None] * shingles[None, :] + b[:, None]) >> 32
+            signatures[row] = hashes.min(axis=1)
+    return signatures
+
+
+def _near_duplicates(texts: List[str], threshold: float) -> List[bool]:
+    """Whether each text is a near duplicate of an earlier one."""
+    signatures = minhash_signatures(
+        texts,
+        permutations=int(os.getenv("CONTEXT_MINHASH_PERMUTATIONS", 64)),
+        size=int(os.getenv("CONTEXT_SHINGLE_SIZE", 5)))
+    similarity = (signatures[:, None, :] == signatures[None, :, :]).mean(-1)
+    duplicates = []
+    kept: List[int] = []
+    for index in range(len(texts)):
+        duplicate = bool(kept) and bool(similarity[index,
+                                                   kept].max() >= threshold)
+        duplicates.append(duplicate)
+        if not duplicate:
+            kept.append(index)
+    return duplicates
+
+
+def _merge_overlap(first: str, second: str, probe: int = 64) -> Optional[str]:
+    """`first` extended by `second` if `second` starts inside `first` with
+    the rest of `first` as its prefix, else None."""
+    head = second[:probe]
+    start = first.find(head)
+    while start != -1:
+        tail = first[start:]
+        if tail.startswith(second):
+            return first
+        if second.startswith(tail):
+            return first + second[len(tail):]
+        start = first.find(head, start + 1)
+    return None
+
+
+def _merge_adjacent(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Merge overlapping chunks of the same file, keeping the best rank."""
+    spans = [dict(document) for document in documents]
+    merged = True
+    while merged:
+        merged = False
+        for i, j in ((i, j) for i in range(len(spans))
+                     for j in range(len(spans)) if i != j):
+            if (spans[i].get("metadata", {}).get("file_stem")
+                    != spans[j].get("metadata", {}).get("file_stem")):
+                continue
+            content = _merge_overlap(spans[i]["content"], spans[j]["content"])
+            if content is None:
+                continue
+            keep, drop = min(i, j), max(i, j)
+            spans[keep]["content"] = content
+            spans[keep]["score"] = max(spans[i].get("score", 0),
+                                       spans[j].get("score", 0))
+            del spans[drop]
+            merged = True
+            break
+    return spans
+
+
+def pack_context(
+    documents: List[Dict[str, Any]],
+    budget: Optional[int] = None
+) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """Deduplicate, merge and budget `documents` (best first); returns the
+    packed documents and token stats."""
+    contents = [document["content"] for document in documents]
+    if not packing_enabled() or not documents:
+        input_tokens = sum(_estimate_tokens(contents))
+        return documents, {
+            "input_tokens": input_tokens,
+            "context_tokens": input_tokens,
+            "saved_tokens": 0,
+        }
+    input_tokens = sum(count_tokens(contents))
+    budget = budget or int(os.getenv("CONTEXT_TOKEN_BUDGET", 6000))
+    threshold = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", 0.8))
+    duplicates = _near_duplicates(contents, threshold)
+    spans = _merge_adjacent([
+        document for document, duplicate in zip(documents, duplicates)
+        if not duplicate
+    ])
+    span_tokens = count_tokens([span["content"] for span in spans])
+    packed, context_tokens = [], 0
+    for span, tokens in zip(spans, span_tokens):
+        if context_tokens + tokens > budget:
+            continue
+        packed.append(span)
+        context_tokens += tokens
+    stats = {
+        "input_tokens": input_tokens,
+        "context_tokens": context_tokens,
+        "saved_tokens": input_tokens - context_tokens,
+        "duplicates": sum(duplicates),
+        "merged": len(documents) - sum(duplicates) - len(spans),
+        "over_budget": len(spans) - len(packed),
+    }
+    return packed, stats
@@ -0,0 +1,413 @@
+"""Shared transport for every remote model call.
+
+Chat agents, the embedding model and the reranker all send their requests
+through one `ModelGateway`, which owns the pooled connections and, per
+model, a concurrency cap, request and token buckets, and jittered retries
+bounded by the caller's deadline.
+
+Limits are configured per agent name, e.g. `LLM_RPM`, `LLM_TPM`,
+`LLM_CONCURRENCY`, `LLM_MAX_RETRIES`, `LLM_TIMEOUT`, `LLM_BURST` (likewise
+`VLM`, `SLM`, `OCR`, `EMBEDDING`, `RERANK`), falling back to the `GATEWAY_*`
+defaults.
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import threading
+import contextvars
+import httpx
+from weakref import WeakKeyDictionary
+from loguru import logger
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, Iterator, Optional
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "model_deadline", default=None)
+
+
+class DeadlineExceeded(httpx.TimeoutException):
+    """The caller's deadline passed before the model answered."""
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """Bound every model call made inside the block, including retries and
+    rate-limit waits, to `seconds` from now. Nested deadlines only tighten,
+    and tasks and threads started inside inherit it."""
+    expires = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(expires if current is
+                          None else min(current, expires))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None without one."""
+    expires = _deadline.get()
+    return None if expires is None else expires - time.monotonic()
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at `per_minute` units per minute.
+
+    At most `burst` of a minute's budget is sent back to back, so no sliding
+    minute sees more than `(1 + burst) * per_minute`. `reserve` debits
+    immediately and returns how long the caller must wait for its share, so
+    waits queue in order and the balance may go negative.
+    """
+
+    def __init__(self, per_minute: float, burst: float = 0.1):
+        self.rate = per_minute / 60
+        self.capacity = max(per_minute * burst, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity,
+                              self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= min(amount, self.capacity)
+            return max(-self.tokens / self.rate, 0.0)
+
+    def refund(self, amount: float):
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class ModelLimits:
+    """Limits and counters for one model."""
+
+    def __init__(self, name: str):
+
+        def setting(key: str, default: Any) -> str:
+            return os.getenv(f"{name}_{key}",
+                             os.getenv(f"GATEWAY_{key}", default))
+
+        self.name = name
+        self.concurrency = int(setting("CONCURRENCY", 8))
+        self.max_retries = int(setting("MAX_RETRIES", 3))
+        self.timeout = float(setting("TIMEOUT", 120))
+        rpm, tpm = float(setting("RPM", 0)), float(setting("TPM", 0))
+        burst = float(setting("BURST", 0.1))
+        self.requests = TokenBucket(rpm, burst) if rpm else None
+        self.tokens = TokenBucket(tpm, burst) if tpm else None
+        self.paused_until = 0.0
+        self.counts = {
+            "requests": 0,
+            "retries": 0,
+            "throttled": 0,
+            "failures": 0,
+            "tokens": 0,
+            "wait_seconds": 0.0,
+        }
+        self._sync_slots = threading.BoundedSemaphore(self.concurrency)
+        self._async_slots = WeakKeyDictionary()
+
+    def async_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        slots = self._async_slots.get(loop)
+        if slots is None:
+            slots = self._async_slots[loop] = asyncio.Semaphore(
+                self.concurrency)
+        return slots
+
+    def reserve(self, tokens: int) -> float:
+        """Debit the buckets and return the wait before sending."""
+        wait = max(self.paused_until - time.monotonic(), 0.0)
+        if self.requests is not None:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.reserve(tokens))
+        self.counts["wait_seconds"] += wait
+        return wait
+
+    def settle(self, estimated: int, used: Optional[int]):
+        """Correct the token bucket once the provider reports usage."""
+        used = estimated if used is None else used
+        self.counts["tokens"] += used
+        if self.tokens is not None and used != estimated:
+            if used > estimated:
+                self.tokens.reserve(used - estimated)
+            else:
+                self.tokens.refund(estimated - used)
+
+    def backoff(self, attempt: int,
+                response: Optional[httpx.Response]) -> float:
+        delay = min(2**attempt, 30) * random.uniform(0.5, 1.0)
+        if response is not None:
+            try:
+                delay = max(delay, float(response.headers["retry-after"]))
+            except (KeyError, ValueError):
+                pass
+            if response.status_code == 429:
+                # Every caller of this model backs off, not just this one.
+                self.counts["throttled"] += 1
+                self.paused_until = max(self.paused_until,
+                                        time.monotonic() + delay)
+        return delay
+
+
+def _estimate_tokens(body: Dict) -> int:
+    """Rough token count of a request body, before the provider's usage."""
+    texts = []
+    for message in body.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            texts.append(content)
+        elif isinstance(content, list):
+            texts.extend(
+                part.get("text", "") for part in content
+                if isinstance(part, dict) and part.get("type") == "text")
+    inputs = body.get("input", [])
+    texts.extend([inputs] if isinstance(inputs, str) else
+                 [item for item in inputs if isinstance(item, str)])
+    texts.append(body.get("query", ""))
+    texts.extend(document for document in body.get("documents", [])
+                 if isinstance(document, str))
+    prompt = sum(len(text) for text in texts) // 3 + 1
+    # Reserve a quarter of the completion budget; the reported usage
+    # settles the difference afterwards.
+    return prompt + int(
+        body.get("max_completion_tokens") or body.get("max_tokens") or 0) // 4
+
+
+def _usage(response: httpx.Response) -> Optional[int]:
+    try:
+        usage = response.json().get("usage") or {}
+    except (ValueError, AttributeError):
+        return None
+    return usage.get("total_tokens")
+
+
+class _Call:
+    """Per-request bookkeeping shared by the sync and async transports."""
+
+    def __init__(self, gateway: "ModelGateway", request: httpx.Request):
+        try:
+            body = json.loads(request.content or b"{}")
+        except ValueError:
+            body = {}
+        self.request = request
+        self.limits = gateway.limits(body.get("model", ""))
+        self.stream = bool(body.get("stream"))
+        self.estimated = _estimate_tokens(body)
+
+    def time_left(self) -> Optional[float]:
+        left = remaining()
+        if left is not None and left <= 0:
+            self.limits.counts["failures"] += 1
+            raise DeadlineExceeded(f"{self.limits.name} deadline exceeded",
+                                   request=self.request)
+        return left
+
+    def prepare(self):
+        """Cap the attempt's timeouts at the time left."""
+        left = self.time_left()
+        timeout = self.limits.timeout if left is None else min(
+            self.limits.timeout, left)
+        self.request.extensions["timeout"] = {
+            "connect": timeout,
+            "read": timeout,
+            "write": timeout,
+            "pool": timeout,
+        }
+
+    def should_retry(self, attempt: int,
+                     response: Optional[httpx.Response]) -> Optional[float]:
+        """Return the delay before the next attempt, or None to give up."""
+        if attempt >= self.limits.max_retries:
+            return None
+        delay = self.limits.backoff(attempt, response)
+        left = remaining()
+        if left is not None and delay >= left:
+            return None
+        self.limits.counts["retries"] += 1
+        return delay
+
+    def finish(self, response: httpx.Response) -> httpx.Response:
+        if response.status_code >= 400:
+            self.limits.counts["failures"] += 1
+        self.limits.settle(
+            self.estimated, None if self.stream or response.status_code != 200
+            else _usage(response))
+        return response
+
+
+class _AsyncTransport(httpx.AsyncBaseTransport):
+
+    def __init__(self, gateway: "ModelGateway"):
+        self.gateway = gateway
+
+    async def _wait(self, call: _Call, delay: float):
+        left = call.time_left()
+        if left is not None and delay >= left:
+            await asyncio.sleep(left)
+            call.time_left()
+        await asyncio.sleep(delay)
+
+    async def handle_async_request(self,
+                                   request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        call = _Call(self.gateway, request)
+        transport = self.gateway.async_transport()
+        async with call.limits.async_slots():
+            attempt = 0
+            while True:
+                await self._wait(call, call.limits.reserve(call.estimated))
+                call.prepare()
+                call.limits.counts["requests"] += 1
+                try:
+                    response = await transport.handle_async_request(request)
+                except (httpx.TimeoutException, httpx.NetworkError) as e:
+                    delay = call.should_retry(attempt, None)
+                    if delay is None:
+                        call.limits.counts["failures"] += 1
+                        raise
+                    logger.warning(f"{call.limits.name} retry {attempt + 1} "
+                                   f"in {delay:.2f}s: {e!r}")
+                else:
+                    if response.status_code not in RETRY_STATUSES:
+                        if call.stream:
+                            return call.finish(response)
+                        content = b"".join(
+                            [chunk async for chunk in response.aiter_raw()])
+                        await response.aclose()
+                        return call.finish(
+                            httpx.Response(response.status_code,
+                                           headers=response.headers,
+                                           content=content,
+                                           request=request,
+                                           extensions=response.extensions))
+                    delay = call.should_retry(attempt, response)
+                    if delay is None:
+                        return call.finish(response)
+                    await response.aclose()
+                    logger.warning(f"{call.limits.name} retry {attempt + 1} "
+                                   f"in {delay:.2f}s: HTTP "
+                                   f"{response.status_code}")
+                await self._wait(call, delay)
+                attempt += 1
+
+
+class _SyncTransport(httpx.BaseTransport):
+
+    def __init__(self, gateway: "ModelGateway"):
+        self.gateway = gateway
+
+    def _wait(self, call: _Call, delay: float):
+        left = call.time_left()
+        if left is not None and delay >= left:
+            time.sleep(left)
+            call.time_left()
+        time.sleep(delay)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        call = _Call(self.gateway, request)
+        with call.limits._sync_slots:
+            attempt = 0
+            while True:
+                self._wait(call, call.limits.reserve(call.estimated))
+                call.prepare()
+                call.limits.counts["requests"] += 1
+                try:
+                    response = self.gateway.sync_transport.handle_request(
+                        request)
+                except (httpx.TimeoutException, httpx.NetworkError) as e:
+                    delay = call.should_retry(attempt, None)
+                    if delay is None:
+                        call.limits.counts["failures"] += 1
+                        raise
+                    logger.warning(f"{call.limits.name} retry {attempt + 1} "
+                                   f"in {delay:.2f}s: {e!r}")
+                else:
+                    if response.status_code not in RETRY_STATUSES:
+                        if call.stream:
+                            return call.finish(response)
+                        content = b"".join(response.iter_raw())
+                        response.close()
+                        return call.finish(
+                            httpx.Response(response.status_code,
+                                           headers=response.headers,
+                                           content=content,
+                                           request=request,
+                                           extensions=response.extensions))
+                    delay = call.should_retry(attempt, response)
+                    if delay is None:
+                        return call.finish(response)
+                    response.close()
+                    logger.warning(f"{call.limits.name} retry {attempt + 1} "
+                                   f"in {delay:.2f}s: HTTP "
+                                   f"{response.status_code}")
+                self._wait(call, delay)
+                attempt += 1
+
+
+class ModelGateway:
+    """Pooled HTTP clients with per-model limits, shared process-wide.
+
+    `sync_client` and `async_client` can be handed to any SDK that accepts
+    an httpx client. The async connection pool is kept per event loop, so
+    the same client works across `asyncio.run` calls and worker threads.
+    """
+
+    def __init__(self):
+        self.max_connections = int(os.getenv("GATEWAY_MAX_CONNECTIONS", 64))
+        self._pool_limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_connections)
+        self._models: Dict[str, ModelLimits] = {}
+        self._names: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._async_transports = WeakKeyDictionary()
+        self.sync_transport = httpx.HTTPTransport(limits=self._pool_limits)
+        timeout = httpx.Timeout(float(os.getenv("GATEWAY_TIMEOUT", 120)))
+        self.sync_client = httpx.Client(transport=_SyncTransport(self),
+                                        timeout=timeout)
+        self.async_client = httpx.AsyncClient(transport=_AsyncTransport(self),
+                                              timeout=timeout)
+
+    def async_transport(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        transport = self._async_transports.get(loop)
+        if transport is None:
+            transport = self._async_transports[
+                loop] = httpx.AsyncHTTPTransport(limits=self._pool_limits)
+        return transport
+
+    def register(self, name: str, model: str):
+        """Apply the `{name}_*` limits to requests for `model`."""
+        with self._lock:
+            self._names[model] = name
+
+    def limits(self, model: str) -> ModelLimits:
+        with self._lock:
+            name = self._names.get(model, "GATEWAY")
+            key = f"{name}:{model}"
+            if key not in self._models:
+                self._models[key] = ModelLimits(name)
+            return self._models[key]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                key: dict(limits.counts)
+                for key, limits in self._models.items()
+            }
+
+
+@lru_cache(maxsize=None)
+def get_gateway() -> ModelGateway:
+    """Return the process-wide model gateway, creating it on first use."""
+    return ModelGateway()
@@ -0,0 +1,237 @@
+"""Image payloads sized for the model that reads them.
+
+VLM and OCR models downsample anything above their effective resolution
+server-side, so sending a 300-dpi scan only costs upload and decode time.
+`encode_image` resizes to the agent's pixel budget, re-encodes in a format
+suited to it (JPEG for the VLM, grayscale PNG for OCR), and caches the
+base64 payload by (profile, file hash) so re-runs skip the work. With
+`reference=True` it returns a short reference into that cache instead of
+the payload, for graph state that is checkpointed; `resolve_image` turns
+it back into base64. `encode_crops` cuts regions of interest out of the
+original at native resolution for follow-up passes, cached by (image
+hash, box).
+
+Profiles are overridable per agent with `{name}_IMAGE_MAX_PIXELS`,
+`{name}_IMAGE_FORMAT`, `{name}_IMAGE_QUALITY`, `{name}_IMAGE_GRAYSCALE`
+and, for crops, `{name}_IMAGE_MARGIN`.
+"""
+import os
+import io
+import json
+import base64
+import math
+import hashlib
+import numpy as np
+from pathlib import Path
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Union
+from .cache import DiskCache, hash_text
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+IMAGE_REF_PREFIX = "image-ref:"
+
+IMAGE_PROFILES: Dict[str, Dict[str, Any]] = {
+    # Qwen-VL default budget: 1280 patches of 28x28 pixels.
+    "VLM": {
+        "max_pixels": 1280 * 28 * 28,
+        "format": "JPEG",
+        "quality": 90,
+        "grayscale": False,
+    },
+    # DeepSeek-OCR "large" mode reads 1280x1280 pages; keep text lossless.
+    "OCR": {
+        "max_pixels": 1280 * 1280,
+        "format": "PNG",
+        "quality": None,
+        "grayscale": True,
+    },
+    # First look at the whole study, enough to place regions of interest.
+    "VLM_COARSE": {
+        "max_pixels": 256 * 28 * 28,
+        "format": "JPEG",
+        "quality": 85,
+        "grayscale": False,
+    },
+    # Regions cut from the original at native resolution, padded by
+    # `margin` of the box size; only crops over the budget are shrunk.
+    "ROI": {
+        "max_pixels": 1280 * 28 * 28,
+        "format": "JPEG",
+        "quality": 90,
+        "grayscale": False,
+        "margin": 0.1,
+    },
+}
+
+
+def image_profile(name: str) -> Dict[str, Any]:
+    profile = dict(IMAGE_PROFILES.get(name, IMAGE_PROFILES["VLM"]))
+    if os.getenv(f"{name}_IMAGE_MAX_PIXELS"):
+        profile["max_pixels"] = int(os.getenv(f"{name}_IMAGE_MAX_PIXELS"))
+    if os.getenv(f"{name}_IMAGE_FORMAT"):
+        profile["format"] = os.getenv(f"{name}_IMAGE_FORMAT").upper()
+    if os.getenv(f"{name}_IMAGE_QUALITY"):
+        profile["quality"] = int(os.getenv(f"{name}_IMAGE_QUALITY"))
+    if os.getenv(f"{name}_IMAGE_GRAYSCALE"):
+        profile["grayscale"] = os.getenv(
+            f"{name}_IMAGE_GRAYSCALE").lower() not in ("0", "false")
+    if os.getenv(f"{name}_IMAGE_MARGIN"):
+        profile["margin"] = float(os.getenv(f"{name}_IMAGE_MARGIN"))
+    return profile
+
+
+@lru_cache(maxsize=None)
+def _image_cache() -> DiskCache:
+    return DiskCache(
+        Path(os.getenv("CACHE_DIR", "./cache")) / "images.sqlite",
+        max_bytes=int(os.getenv("IMAGE_CACHE_MAX_MB", 1024)) << 20,
+        memory_size=int(os.getenv("IMAGE_CACHE_MEMORY", 32)))
+
+
+def _to_8bit(image: "Image.Image") -> "Image.Image":
+    """Stretch 16-bit and float images (e.g. exported DICOM) to 8 bits."""
+    from PIL import Image
+
+    pixels = np.asarray(image, dtype=np.float32)
+    low, high = float(pixels.min()), float(pixels.max())
+    scale = 255.0 / (high - low) if high > low else 0.0
+    return Image.fromarray(((pixels - low) * scale).astype(np.uint8), "L")
+
+
+def resize_image(data: bytes, profile: Dict[str, Any]) -> "Image.Image":
+    """Decode `data` and shrink it to the profile's pixel budget."""
+    from PIL import Image, ImageOps
+
+    image = Image.open(io.BytesIO(data))
+    width, height = image.size
+    scale = min((profile["max_pixels"] / (width * height))**0.5, 1.0)
+    size = (max(round(width * scale), 1), max(round(height * scale), 1))
+    if image.format == "JPEG" and scale < 1.0:
+        # Let the JPEG decoder downscale by a power of two first.
+        image.draft("L" if profile["grayscale"] else "RGB", size)
+    if image.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+        # Rotated by 90 degrees once the EXIF orientation is applied.
+        size = size[::-1]
+    image = _prepare(ImageOps.exif_transpose(image), profile)
+    if image.size != size:
+        image = image.resize(size, Image.LANCZOS, reducing_gap=3.0)
+    return image
+
+
+def _prepare(image: "Image.Image", profile: Dict[str, Any]) -> "Image.Image":
+    if image.mode in ("I", "I;16", "I;16B", "I;16L", "F"):
+        image = _to_8bit(image)
+    if profile["grayscale"]:
+        image = image.convert("L")
+    elif image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    return image
+
+
+def crop_image(image: "Image.Image", box: Sequence[int],
+               profile: Dict[str, Any]) -> "Image.Image":
+    """Cut `box` (x1, y1, x2, y2 from 0 to 1000 of the width and height,
+    as Qwen-VL reports them) out of an oriented full-size image."""
+    from PIL import Image
+
+    width, height = image.size
+    x1, y1, x2, y2 = (value / 1000 for value in box)
+    pad_x = (x2 - x1) * profile.get("margin", 0.0)
+    pad_y = (y2 - y1) * profile.get("margin", 0.0)
+    left = max(math.floor((x1 - pad_x) * width), 0)
+    top = max(math.floor((y1 - pad_y) * height), 0)
+    right = min(math.ceil((x2 + pad_x) * width), width)
+    bottom = min(math.ceil((y2 + pad_y) * height), height)
+    crop = _prepare(image.crop((left, top, right, bottom)), profile)
+    width, height = crop.size
+    scale = min((profile["max_pixels"] / (width * height))**0.5, 1.0)
+    if scale < 1.0:
+        size = (max(round(width * scale), 1), max(round(height * scale), 1))
+        crop = crop.resize(size, Image.LANCZOS, reducing_gap=3.0)
+    return crop
+
+
+def _save(image: "Image.Image", profile: Dict[str, Any]) -> bytes:
+    buffer = io.BytesIO()
+    if profile["format"] == "JPEG":
+        image.save(buffer, format="JPEG", quality=profile["quality"] or 90)
+    else:
+        image.save(buffer, format=profile["format"])
+    return buffer.getvalue()
+
+
+def _read(source: Union[str, Path, bytes]) -> bytes:
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as image_file:
+            return image_file.read()
+    return source
+
+
+def _settings_hash(settings: Dict[str, Any]) -> str:
+    return hash_text(json.dumps(settings, sort_keys=True))[:16]
+
+
+def _cache_enabled() -> bool:
+    return os.getenv("IMAGE_CACHE", "true").lower() not in ("0", "false")
+
+
+def encode_image(source: Union[str, Path, bytes],
+                 profile: str = "VLM",
+                 reference: bool = False) -> str:
+    """Return the base64 payload of an image file or bytes for agent
+    `profile`, resized and re-encoded once and then served from cache."""
+    data = _read(source)
+    settings = image_profile(profile)
+    key = (f"{profile}:{_settings_hash(settings)}:"
+           f"{hashlib.sha256(data).hexdigest()}")
+    use_cache = reference or _cache_enabled()
+    payload = _image_cache().get(key) if use_cache else None
+    if payload is None:
+        payload = base64.b64encode(
+            _save(resize_image(data, settings), settings))
+        if use_cache:
+            _image_cache().put(key, payload)
+    if reference:
+        return IMAGE_REF_PREFIX + key
+    return payload.decode("ascii")
+
+
+def encode_crops(source: Union[str, Path, bytes],
+                 boxes: List[Sequence[int]],
+                 profile: str = "ROI") -> List[str]:
+    """Base64 payloads of the regions `boxes` of an image (see
+    `crop_image`), cached by (image hash, box); the original is decoded
+    once, and only if a crop is not cached."""
+    from PIL import Image, ImageOps
+
+    data = _read(source)
+    settings = image_profile(profile)
+    prefix = (f"{profile}:{_settings_hash(settings)}:"
+              f"{hashlib.sha256(data).hexdigest()}")
+    use_cache = _cache_enabled()
+    payloads: List[Optional[bytes]] = [
+        _image_cache().get(f"{prefix}:{','.join(map(str, box))}")
+        if use_cache else None for box in boxes
+    ]
+    if any(payload is None for payload in payloads):
+        image = ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+        for index, box in enumerate(boxes):
+            if payloads[index] is not None:
+                continue
+            payloads[index] = base64.b64encode(
+                _save(crop_image(image, box, settings), settings))
+            if use_cache:
+                _image_cache().put(f"{prefix}:{','.join(map(str, box))}",
+                                   payloads[index])
+    return [payload.decode("ascii") for payload in payloads]
+
+
+def resolve_image(image: str) -> Optional[str]:
+    """Base64 payload of `image`, which may be a reference from
+    `encode_image`; None if the referenced entry was evicted."""
+    if not image.startswith(IMAGE_REF_PREFIX):
+        return image
+    cached = _image_cache().get(image[len(IMAGE_REF_PREFIX):])
+    return None if cached is None else cached.decode("ascii")
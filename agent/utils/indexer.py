@@ -0,0 +1,251 @@
+"""Incrementally index source documents into the chunk and summary
+collections.
+
+    python -m agent.utils.indexer data/guidelines [--prune] [--no-summaries]
+"""
+import os
+import json
+import asyncio
+import hashlib
+import argparse
+from pathlib import Path
+from loguru import logger
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+from .cache import hash_text
+from .nrag import (AsyncQdrantRAG, get_rag, chunk_collection_name,
+                   summary_collection_name)
+
+SUPPORTED_SUFFIXES = (".pdf", ".txt", ".md")
+
+Summarizer = Callable[[str, List[str]], Awaitable[str]]
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_text(path: Path) -> str:
+    if path.suffix.lower() != ".pdf":
+        return path.read_text(encoding="utf-8")
+
+    from .pdf import iter_pdf_pages
+
+    texts, image_pages = [], 0
+    for page in iter_pdf_pages(str(path)):
+        if page["text"]:
+            texts.append(page["text"])
+        else:
+            image_pages += 1
+    if image_pages:
+        logger.warning(f"Skipped {image_pages} image-only pages in {path}")
+    return "\n\n".join(texts)
+
+
+class IncrementalIndexer:
+    """Re-index only what changed since the last run.
+
+    The manifest records, per file stem, the source file hash, a map of
+    chunk hash -> point id in the chunk collection, and the summary point.
+    Unchanged files are skipped without reading them; for changed files
+    only new chunks are embedded and vanished chunks are deleted. A file
+    whose summary is not written yet is marked `summary_pending` and is
+    indexed again by the next run if that run is cut short.
+    """
+
+    def __init__(self,
+                 rag_client: Optional[AsyncQdrantRAG] = None,
+                 chunker=None,
+                 manifest_path: Optional[str | Path] = None,
+                 summarizer: Optional[Summarizer] = None):
+        self.rag = rag_client or get_rag()
+        self.chunker = chunker
+        self.summarizer = summarizer
+        # Summaries computed by `index_file`, written by `flush_summaries`.
+        self.pending_summaries: Dict[str, Dict] = {}
+        self.manifest_path = Path(manifest_path
+                                  or Path(os.getenv("CACHE_DIR", "./cache")) /
+                                  "manifest" / f"{chunk_collection_name}.json")
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self) -> Dict:
+        if self.manifest_path.exists():
+            with open(self.manifest_path, encoding="utf-8") as file:
+                return json.load(file)
+        return {
+            "chunk_collection": chunk_collection_name,
+            "summary_collection": summary_collection_name,
+            "files": {},
+        }
+
+    def _save_manifest(self):
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self.manifest, file, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _split(self, text: str) -> List[str]:
+        if self.chunker is None:
+            from .chunker import RecursiveChunker
+
+            self.chunker = RecursiveChunker()
+        return self.chunker.split_text(text)
+
+    async def _summarize(self, file_stem: str, source: str, chunks: List[str]):
+        summary = await self.summarizer(file_stem, chunks)
+        self.pending_summaries[file_stem] = {
+            "content": summary,
+            "metadata": {
+                "file_stem": file_stem,
+                "source": source
+            },
+        }
+
+    async def flush_summaries(self) -> int:
+        """Embed and write the summaries of the files indexed since the last
+        flush in one bulk upsert, replacing their previous summaries."""
+        pending, self.pending_summaries = self.pending_summaries, {}
+        changed: Dict[str, Dict] = {}
+        for file_stem, document in pending.items():
+            entry = self.manifest["files"].get(file_stem)
+            point_id = self.rag.generate_qdrant_id(document)
+            if entry is not None and entry.get("summary_id") != point_id:
+                changed[file_stem] = document
+        if changed:
+            await self.rag.add_documents(list(changed.values()),
+                                         summary_collection_name)
+            stale_ids = []
+            for file_stem, document in changed.items():
+                entry = self.manifest["files"][file_stem]
+                if entry.get("summary_id"):
+                    stale_ids.append(entry["summary_id"])
+                entry["summary_id"] = self.rag.generate_qdrant_id(document)
+            await self.rag.delete_points(summary_collection_name, stale_ids)
+        for file_stem in pending:
+            entry = self.manifest["files"].get(file_stem)
+            if entry is not None:
+                entry.pop("summary_pending", None)
+        if pending:
+            self._save_manifest()
+        return len(changed)
+
+    async def index_file(self, path: str | Path) -> Dict[str, int]:
+        path = Path(path)
+        file_stem = path.stem
+        file_hash = hash_file(path)
+        entry = self.manifest["files"].get(file_stem, {})
+        summarized = (entry.get("summary_id")
+                      and not entry.get("summary_pending"))
+        if entry.get("file_hash") == file_hash and (self.summarizer is None
+                                                    or summarized):
+            return {"skipped": 1}
+
+        chunks = self._split(load_text(path))
+        documents: Dict[str, Dict] = {}
+        for chunk in chunks:
+            documents.setdefault(
+                hash_text(chunk), {
+                    "content": chunk,
+                    "metadata": {
+                        "file_stem": file_stem,
+                        "source": path.name
+                    },
+                })
+
+        indexed: Dict[str, str] = entry.get("chunks", {})
+        new_hashes = [h for h in documents if h not in indexed]
+        stale_ids = [
+            point_id for h, point_id in indexed.items() if h not in documents
+        ]
+        await self.rag.add_documents([documents[h] for h in new_hashes],
+                                     chunk_collection_name)
+        await self.rag.delete_points(chunk_collection_name, stale_ids)
+
+        entry.update({
+            "source": str(path),
+            "file_hash": file_hash,
+            "chunks": {
+                h: indexed.get(h) or self.rag.generate_qdrant_id(document)
+                for h, document in documents.items()
+            },
+        })
+        if self.summarizer is not None:
+            # Cleared by `flush_summaries` once the summary is written.
+            entry["summary_pending"] = True
+            await self._summarize(file_stem, path.name, chunks)
+        self.manifest["files"][file_stem] = entry
+        self._save_manifest()
+        logger.info(f"Indexed {path}: +{len(new_hashes)} -{len(stale_ids)} "
+                    f"chunks ({len(documents)} total)")
+        return {
+            "updated": 1,
+            "added": len(new_hashes),
+            "deleted": len(stale_ids),
+        }
+
+    async def remove_file(self, file_stem: str) -> Dict[str, int]:
+        entry = self.manifest["files"].pop(file_stem, None)
+        if entry is None:
+            return {}
+        point_ids = list(entry.get("chunks", {}).values())
+        await self.rag.delete_points(chunk_collection_name, point_ids)
+        if entry.get("summary_id"):
+            await self.rag.delete_points(summary_collection_name,
+                                         [entry["summary_id"]])
+        self._save_manifest()
+        logger.info(f"Removed {file_stem}: -{len(point_ids)} chunks")
+        return {"removed": 1, "deleted": len(point_ids)}
+
+    async def index_paths(self,
+                          paths: Iterable[str | Path],
+                          prune: bool = False) -> Dict[str, int]:
+        """Index files and directories; `prune` drops files no longer seen."""
+        files: List[Path] = []
+        for path in map(Path, paths):
+            if path.is_dir():
+                files.extend(
+                    sorted(p for p in path.rglob("*")
+                           if p.suffix.lower() in SUPPORTED_SUFFIXES))
+            else:
+                files.append(path)
+
+        await self.rag.ensure_collections()
+        totals: Dict[str, int] = {}
+        for file in files:
+            for key, value in (await self.index_file(file)).items():
+                totals[key] = totals.get(key, 0) + value
+        totals["summaries"] = await self.flush_summaries()
+        if prune:
+            seen = {file.stem for file in files}
+            for file_stem in list(self.manifest["files"]):
+                if file_stem not in seen:
+                    for key, value in (await
+                                       self.remove_file(file_stem)).items():
+                        totals[key] = totals.get(key, 0) + value
+        logger.info(f"Incremental indexing finished: {totals}")
+        return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Incrementally index documents into "
+        f"{chunk_collection_name}")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--prune",
+                        action="store_true",
+                        help="remove indexed files missing from the paths")
+    parser.add_argument("--no-summaries",
+                        action="store_true",
+                        help="index chunks only, without document summaries")
+    args = parser.parse_args()
+    summarizer = None
+    if not args.no_summaries:
+        from .summarizer import MapReduceSummarizer
+
+        summarizer = MapReduceSummarizer()
+    indexer = IncrementalIndexer(summarizer=summarizer)
+    asyncio.run(indexer.index_paths(args.paths, args.prune))
@@ -0,0 +1,384 @@
+"""In-process vector store: a memory-mapped float32 matrix per collection,
+searched by vectorized brute force with optional IVF partitioning.
+
+Selected with `RAG=lrag`; no server is needed. Each collection lives in
+`LOCAL_RAG_DIR/<collection>/` as `vectors.f32` (row-major, grown by
+doubling), `points.sqlite` (id, file stem and payload per row) and, once
+trained, `ivf.npy` (centroids).
+"""
+import os
+import json
+import shutil
+import sqlite3
+import asyncio
+import threading
+import numpy as np
+from pathlib import Path
+from loguru import logger
+from typing import Dict, List, Optional, Tuple
+from .store import SparseVector, VectorStore
+
+
+class LocalCollection:
+    """One collection; all methods are blocking and thread-safe."""
+
+    def __init__(self,
+                 path: Path,
+                 size: Optional[int] = None,
+                 normalize: bool = True):
+        path.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.normalize = normalize
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(path / "points.sqlite",
+                                  check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta "
+                        "(key TEXT PRIMARY KEY, value TEXT)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS points "
+                        "(row INTEGER PRIMARY KEY, id TEXT UNIQUE, "
+                        "file_stem TEXT, payload TEXT)")
+        stored = self.db.execute(
+            "SELECT value FROM meta WHERE key = 'size'").fetchone()
+        if stored is None:
+            if size is None:
+                raise ValueError(f"Collection {path.name} not found")
+            self.db.execute("INSERT INTO meta VALUES ('size', ?)", (size, ))
+            self.db.commit()
+        elif size is not None and int(stored[0]) != size:
+            raise ValueError(f"Collection {path.name} has vector size "
+                             f"{stored[0]}, not {size}")
+        self.size = int(stored[0]) if stored else size
+
+        self.vectors_path = path / "vectors.f32"
+        self.vectors_path.touch()
+        self.capacity = self.vectors_path.stat().st_size // (4 * self.size)
+        self.vectors = self._map()
+
+        self.rows: Dict[str, int] = {}
+        self.stem_codes: Dict[str, int] = {}
+        self.stems = np.full(self.capacity, -1, dtype=np.int32)
+        self.live = np.zeros(self.capacity, dtype=bool)
+        for row, point_id, file_stem in self.db.execute(
+                "SELECT row, id, file_stem FROM points"):
+            self.rows[point_id] = row
+            self.stems[row] = self._stem_code(file_stem)
+            self.live[row] = True
+        self.n_rows = max(self.rows.values(), default=-1) + 1
+        self.free = np.flatnonzero(~self.live[:self.n_rows]).tolist()
+
+        self.centroids: Optional[np.ndarray] = None
+        self.assignments = np.full(self.capacity, -1, dtype=np.int32)
+        self.trained_rows = 0
+        ivf_path = path / "ivf.npy"
+        if ivf_path.exists():
+            self.centroids = np.load(ivf_path)
+            self._assign(np.arange(self.n_rows))
+            self.trained_rows = len(self.rows)
+
+    def _map(self) -> Optional[np.memmap]:
+        if self.capacity == 0:
+            return None
+        return np.memmap(self.vectors_path,
+                         dtype=np.float32,
+                         mode="r+",
+                         shape=(self.capacity, self.size))
+
+    def _stem_code(self, file_stem: Optional[str]) -> int:
+        if file_stem is None:
+            return -1
+        return self.stem_codes.setdefault(file_stem, len(self.stem_codes))
+
+    def _reserve(self, count: int):
+        needed = self.n_rows + count
+        if needed <= self.capacity:
+            return
+        capacity = max(needed, 2 * self.capacity, 1024)
+        if self.vectors is not None:
+            self.vectors.flush()
+            del self.vectors
+        with open(self.vectors_path, "r+b") as file:
+            file.truncate(capacity * self.size * 4)
+        grow = capacity - self.capacity
+        self.stems = np.concatenate(
+            [self.stems, np.full(grow, -1, dtype=np.int32)])
+        self.live = np.concatenate([self.live, np.zeros(grow, dtype=bool)])
+        self.assignments = np.concatenate(
+            [self.assignments,
+             np.full(grow, -1, dtype=np.int32)])
+        self.capacity = capacity
+        self.vectors = self._map()
+
+    def _prepare(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if self.normalize:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms == 0, 1, norms)
+        return vectors
+
+    def upsert(self, ids: List[str], vectors: List[List[float]],
+               payloads: List[Dict]):
+        points = dict(zip(ids, zip(vectors, payloads)))
+        if not points:
+            return
+        with self.lock:
+            new = [
+                point_id for point_id in points if point_id not in self.rows
+            ]
+            self._reserve(max(len(new) - len(self.free), 0))
+            rows = []
+            for point_id in points:
+                row = self.rows.get(point_id)
+                if row is None:
+                    row = self.free.pop() if self.free else self.n_rows
+                    self.n_rows = max(self.n_rows, row + 1)
+                    self.rows[point_id] = row
+                rows.append(row)
+
+            rows = np.asarray(rows)
+            self.vectors[rows] = self._prepare(
+                [vector for vector, _ in points.values()])
+            self.vectors.flush()
+            file_stems = [
+                payload.get("metadata", {}).get("file_stem")
+                for _, payload in points.values()
+            ]
+            self.stems[rows] = [self._stem_code(stem) for stem in file_stems]
+            self.live[rows] = True
+            if self.centroids is not None:
+                self._assign(rows)
+            self.db.executemany(
+                "INSERT OR REPLACE INTO points VALUES (?, ?, ?, ?)",
+                [(int(row), point_id, file_stem,
+                  json.dumps(payload, ensure_ascii=False))
+                 for row, point_id, file_stem, (
+                     _,
+                     payload) in zip(rows, points, file_stems, points.values())
+                 ])
+            self.db.commit()
+
+    def delete(self, ids: List[str]):
+        with self.lock:
+            rows = [self.rows.pop(i) for i in ids if i in self.rows]
+            if not rows:
+                return
+            self.live[rows] = False
+            self.free.extend(rows)
+            self.db.executemany("DELETE FROM points WHERE row = ?",
+                                [(row, ) for row in rows])
+            self.db.commit()
+
+    def _assign(self, rows: np.ndarray, block: int = 65536):
+        for i in range(0, len(rows), block):
+            chunk = rows[i:i + block]
+            self.assignments[chunk] = np.argmax(
+                self.vectors[chunk] @ self.centroids.T, axis=1)
+
+    def train_ivf(self, n_lists: int, iterations: int = 10, seed: int = 0):
+        """Spherical k-means over a sample of live rows."""
+        with self.lock:
+            live_rows = np.flatnonzero(self.live[:self.n_rows])
+            rng = np.random.default_rng(seed)
+            sample = np.sort(
+                rng.choice(live_rows,
+                           min(len(live_rows), n_lists * 64),
+                           replace=False))
+            data = np.asarray(self.vectors[sample])
+            centroids = data[rng.choice(len(data), n_lists, replace=False)]
+            for _ in range(iterations):
+                labels = np.argmax(data @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, data)
+                counts = np.bincount(labels, minlength=n_lists)
+                empty = counts == 0
+                sums[empty] = data[rng.choice(len(data), int(empty.sum()))]
+                centroids = sums / np.linalg.norm(sums, axis=1, keepdims=True)
+            self.centroids = centroids.astype(np.float32)
+            np.save(self.path / "ivf.npy", self.centroids)
+            self._assign(np.arange(self.n_rows))
+            self.trained_rows = len(live_rows)
+            logger.info(f"Trained IVF with {n_lists} lists on "
+                        f"{len(sample)}/{len(live_rows)} points of "
+                        f"{self.path.name}")
+
+    def _candidates(self, query: np.ndarray, file_stems: List[Optional[str]],
+                    n_probes: int) -> np.ndarray:
+        live = self.live[:self.n_rows]
+        if None not in file_stems:
+            # Filtered searches are exact over the stems' own rows; probing
+            # lists could miss a small file entirely.
+            codes = [self.stem_codes.get(stem, -2) for stem in file_stems]
+            return np.flatnonzero(live
+                                  & np.isin(self.stems[:self.n_rows], codes))
+        if self.centroids is None:
+            return np.flatnonzero(live)
+        lists = np.argsort(-(self.centroids @ query))[:n_probes]
+        return np.flatnonzero(live
+                              & np.isin(self.assignments[:self.n_rows], lists))
+
+    def _payloads(self, rows: List[int]) -> Dict[int, Tuple[str, Dict]]:
+        found = {}
+        for i in range(0, len(rows), 900):
+            batch = rows[i:i + 900]
+            for row, point_id, payload in self.db.execute(
+                    "SELECT row, id, payload FROM points WHERE row IN "
+                    f"({','.join('?' * len(batch))})", batch):
+                found[row] = (point_id, json.loads(payload))
+        return found
+
+    def search_batch(self, query_vector: List[float], limit: int,
+                     file_stems: List[Optional[str]],
+                     n_probes: int) -> List[List[Dict]]:
+        query = self._prepare(query_vector)[0]
+        with self.lock:
+            rows = self._candidates(query, file_stems, n_probes)
+            scores = (np.asarray(self.vectors[rows]) @ query
+                      if len(rows) else np.zeros(0, dtype=np.float32))
+            stems = self.stems[rows]
+            hits = []
+            for file_stem in file_stems:
+                if file_stem is None:
+                    index = np.arange(len(rows))
+                else:
+                    index = np.flatnonzero(
+                        stems == self.stem_codes.get(file_stem, -2))
+                if len(index) > limit:
+                    top = np.argpartition(-scores[index], limit - 1)[:limit]
+                    index = index[top]
+                index = index[np.argsort(-scores[index], kind="stable")]
+                hits.append([(int(rows[i]), float(scores[i])) for i in index])
+            payloads = self._payloads(
+                sorted({row
+                        for batch in hits
+                        for row, _ in batch}))
+
+        results = []
+        for batch in hits:
+            results.append([{
+                "id": payloads[row][0],
+                "content": payloads[row][1].get("content", ""),
+                "metadata": payloads[row][1].get("metadata", {}),
+                "score": score,
+            } for row, score in batch])
+        return results
+
+    def close(self):
+        with self.lock:
+            if self.vectors is not None:
+                self.vectors.flush()
+            self.db.close()
+
+
+class LocalStore(VectorStore):
+    """Embedded backend for dev, CI and edge deployments.
+
+    Brute force is exact and scans every live row. With `LOCAL_RAG_IVF_LISTS`
+    set, unfiltered searches over collections of at least
+    `LOCAL_RAG_IVF_MIN_POINTS` points only score the rows of the
+    `LOCAL_RAG_IVF_PROBES` nearest k-means lists; the lists are trained on
+    first search and retrained once the collection doubles. Sparse vectors
+    are not stored, so hybrid retrieval falls back to dense search.
+    """
+
+    def __init__(self,
+                 path: Optional[str | Path] = None,
+                 distance: str = "COSINE",
+                 ivf_lists: Optional[int] = None,
+                 ivf_probes: Optional[int] = None,
+                 ivf_min_points: Optional[int] = None):
+        if distance not in ("COSINE", "DOT"):
+            raise ValueError(f"Local store does not support {distance}")
+        self.path = Path(path or os.getenv("LOCAL_RAG_DIR")
+                         or Path(os.getenv("CACHE_DIR", "./cache")) / "lrag")
+        self.normalize = distance == "COSINE"
+        self.ivf_lists = int(
+            os.getenv("LOCAL_RAG_IVF_LISTS", 0) if ivf_lists is
+            None else ivf_lists)
+        self.ivf_probes = ivf_probes or int(
+            os.getenv("LOCAL_RAG_IVF_PROBES", 8))
+        self.ivf_min_points = int(
+            os.getenv("LOCAL_RAG_IVF_MIN_POINTS", 20000) if ivf_min_points is
+            None else ivf_min_points)
+        self._collections: Dict[str, LocalCollection] = {}
+        # Collections are opened from worker threads as well as the loop.
+        self._lock = threading.Lock()
+
+    def _collection(self,
+                    collection_name: str,
+                    size: Optional[int] = None) -> LocalCollection:
+        with self._lock:
+            collection = self._collections.get(collection_name)
+            if collection is None:
+                if size is None and not (self.path / collection_name /
+                                         "points.sqlite").exists():
+                    raise ValueError(f"Collection {collection_name} not found")
+                collection = LocalCollection(self.path / collection_name, size,
+                                             self.normalize)
+                self._collections[collection_name] = collection
+            return collection
+
+    async def create_collection(self,
+                                collection_name: str,
+                                size: int,
+                                payload_indexes: Optional[List[str]] = None):
+        # File stems are always indexed; other payload indexes are no-ops.
+        exists = (self.path / collection_name / "points.sqlite").exists()
+        await asyncio.to_thread(self._collection, collection_name, size)
+        if exists:
+            logger.info(f"Collection {collection_name} already exists")
+        else:
+            logger.info(f"Created collection: {collection_name}")
+
+    async def upsert(self,
+                     collection_name: str,
+                     ids: List[str],
+                     vectors: List[List[float]],
+                     payloads: List[Dict],
+                     sparse_vectors: Optional[List[SparseVector]] = None):
+        await asyncio.to_thread(
+            self._collection(collection_name).upsert, ids, vectors, payloads)
+
+    def _maybe_train(self, collection: LocalCollection):
+        with collection.lock:
+            n_points = len(collection.rows)
+            if (self.ivf_lists and n_points >= self.ivf_min_points
+                    and n_points >= 2 * collection.trained_rows):
+                collection.train_ivf(self.ivf_lists)
+
+    def _search_batch(self, collection_name: str, query_vector: List[float],
+                      limit: int,
+                      file_stems: List[Optional[str]]) -> List[List[Dict]]:
+        collection = self._collection(collection_name)
+        if None in file_stems:
+            self._maybe_train(collection)
+        return collection.search_batch(query_vector, limit, file_stems,
+                                       self.ivf_probes)
+
+    async def search_batch(
+        self,
+        collection_name: str,
+        query_vector: List[float],
+        limit: int,
+        file_stems: List[Optional[str]],
+        sparse_vector: Optional[SparseVector] = None,
+    ) -> List[List[Dict]]:
+        return await asyncio.to_thread(self._search_batch, collection_name,
+                                       query_vector, limit, file_stems)
+
+    async def delete(self, collection_name: str, ids: List[str]):
+        await asyncio.to_thread(self._collection(collection_name).delete, ids)
+
+    async def delete_collection(self, collection_name: str):
+        with self._lock:
+            collection = self._collections.pop(collection_name, None)
+        if collection is not None:
+            collection.close()
+        await asyncio.to_thread(shutil.rmtree, self.path / collection_name,
+                                True)
+
+    async def close(self):
+        with self._lock:
+            collections = list(self._collections.values())
+            self._collections.clear()
+        for collection in collections:
+            collection.close()
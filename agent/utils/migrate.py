@@ -0,0 +1,105 @@
+"""Move per-document `{RAG}_{file_stem}_{MODE}` collections into the shared
+chunk collection used by `retrieve`.
+
+    python -m agent.utils.migrate [--delete-source] [--page-size 256]
+"""
+import os
+import re
+import asyncio
+import argparse
+from loguru import logger
+from typing import Dict
+from qdrant_client.http import models
+from .store import QdrantStore
+from .nrag import AsyncQdrantRAG, chunk_collection_name, mode, rag
+
+
+async def migrate_collection(qdrant_rag: AsyncQdrantRAG,
+                             source: str,
+                             target: str,
+                             file_stem: str,
+                             page_size: int = 256) -> int:
+    moved = 0
+    offset = None
+    while True:
+        records, offset = await qdrant_rag.store.client.scroll(
+            collection_name=source,
+            limit=page_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True)
+        points = []
+        for record in records:
+            payload = record.payload or {}
+            document = {
+                "content": payload.get("content", ""),
+                "metadata": dict(payload.get("metadata", {})),
+            }
+            point_id = record.id
+            if document["metadata"].get("file_stem") != file_stem:
+                # Ids hash content + metadata, so tag the stem and re-derive
+                # the id to keep identical chunks from different files apart.
+                document["metadata"]["file_stem"] = file_stem
+                point_id = qdrant_rag.generate_qdrant_id(document)
+            points.append(
+                models.PointStruct(id=point_id,
+                                   vector=qdrant_rag.prepare_vector(
+                                       record.vector),
+                                   payload=document))
+        if points:
+            await qdrant_rag.store.client.upsert(collection_name=target,
+                                                 points=points)
+            moved += len(points)
+        if offset is None:
+            return moved
+
+
+async def migrate(delete_source: bool = False,
+                  page_size: int = 256) -> Dict[str, int]:
+    qdrant_rag = AsyncQdrantRAG()
+    await qdrant_rag.create_collection(chunk_collection_name,
+                                       payload_indexes=["metadata.file_stem"])
+    pattern = re.compile(rf"{re.escape(rag)}_(.+)_{re.escape(mode)}")
+    collections = await qdrant_rag.store.client.get_collections()
+
+    moved: Dict[str, int] = {}
+    for collection in collections.collections:
+        match = pattern.fullmatch(collection.name)
+        if match is None or collection.name == chunk_collection_name:
+            continue
+        file_stem = match.group(1)
+        count = await migrate_collection(qdrant_rag, collection.name,
+                                         chunk_collection_name, file_stem,
+                                         page_size)
+        moved[collection.name] = count
+        logger.info(f"Moved {count} points from {collection.name} to "
+                    f"{chunk_collection_name}")
+
+        if delete_source:
+            migrated = await qdrant_rag.store.client.count(
+                collection_name=chunk_collection_name,
+                count_filter=QdrantStore.file_stem_filter(file_stem),
+                exact=True)
+            if migrated.count >= count:
+                await qdrant_rag.delete_collection(collection.name)
+            else:
+                logger.error(f"Kept {collection.name}: only "
+                             f"{migrated.count}/{count} points migrated")
+
+    await qdrant_rag.close()
+    return moved
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Move per-document chunk collections into "
+        f"{chunk_collection_name}")
+    parser.add_argument("--delete-source",
+                        action="store_true",
+                        help="drop each source collection once migrated")
+    parser.add_argument("--page-size",
+                        type=int,
+                        default=int(os.getenv("QDRANT_UPSERT_BATCH_SIZE",
+                                              256)))
+    args = parser.parse_args()
+    asyncio.run(migrate(args.delete_source, args.page_size))
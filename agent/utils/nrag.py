@@ -1,28 +1,97 @@
 import os
 import json
+import time
 import hashlib
 import asyncio
+import numpy as np
 from loguru import logger
-from typing import List, Dict
-from .tools import get_embedding_model
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple
+from .tools import get_embedding_model, get_sparse_model
+from .store import SparseVector, VectorStore, QdrantStore
+from .tracing import span
 
-from qdrant_client.http import models
-from qdrant_client import AsyncQdrantClient
-from qdrant_client.http.models import Distance, VectorParams
+mode = os.getenv("MODE", "dev")
+rag = os.getenv("RAG", "nrag").upper()
+summary_collection_name = os.getenv("QDRANT_COLLECTION",
+                                    "medical_document_summaries")
+chunk_collection_name = os.getenv("QDRANT_CHUNK_COLLECTION",
+                                  f"{rag}_chunks_{mode}")
+
+# Storage/recall trade-offs for new collections, selected by QDRANT_PROFILE.
+# `dimensions` keeps the leading Matryoshka dimensions of the embedding and
+# re-normalizes them; quantized profiles keep compressed vectors in RAM and
+# rescore the oversampled candidates against the on-disk originals.
+# Quantization and HNSW settings only apply to the Qdrant backend.
+COLLECTION_PROFILES: Dict[str, Dict] = {
+    "default": {},
+    "scalar": {
+        "quantization": "scalar",
+        "on_disk": True,
+        "oversampling": 2.0,
+    },
+    "binary": {
+        "quantization": "binary",
+        "on_disk": True,
+        "oversampling": 4.0,
+    },
+    "compact": {
+        "quantization": "scalar",
+        "on_disk": True,
+        "oversampling": 2.0,
+        "dimensions": 1024,
+    },
+    "tiny": {
+        "quantization": "binary",
+        "on_disk": True,
+        "oversampling": 4.0,
+        "dimensions": 1024,
+        "hnsw_m": 8,
+    },
+}
+
+
+def create_store(profile: Dict, distance: str, hybrid: bool) -> VectorStore:
+    """Pick the vector store backend from the `RAG` env var."""
+    if rag == "LRAG":
+        from .lrag import LocalStore
+
+        if hybrid:
+            logger.warning("Hybrid retrieval needs the Qdrant backend; "
+                           "searching dense vectors only")
+        return LocalStore(distance=distance)
+    return QdrantStore(profile,
+                       distance,
+                       hybrid=hybrid,
+                       sparse_idf="bm25" in os.getenv("SPARSE_MODEL",
+                                                      "Qdrant/bm25").lower())
 
 
 class AsyncQdrantRAG:
 
-    def __init__(self):
-        self.client = AsyncQdrantClient(host=os.getenv("QDRANT_HOST",
-                                                       "localhost"),
-                                        port=int(os.getenv(
-                                            "QDRANT_PORT", 6333)))
+    def __init__(self,
+                 profile: Optional[str] = None,
+                 store: Optional[VectorStore] = None,
+                 hybrid: Optional[bool] = None):
         self.vector_size = int(os.getenv("QDRENT_VECTOR_SIZE", 4096))
-        self.distance = getattr(Distance, os.getenv("QDRANT_DISTANCE",
-                                                    "COSINE"))
-        self.embedding_model = get_embedding_model()
-        self._init_summary_collection()
+        self.distance = os.getenv("QDRANT_DISTANCE", "COSINE")
+        self.embedding_model = get_embedding_model(
+            os.getenv("EMBEDDING_MODEL", "Qwen/Qwen3-Embedding-8B"))
+        self.embed_batch_size = int(os.getenv("EMBEDDING_BATCH_SIZE", 32))
+        self.embed_concurrency = int(os.getenv("EMBEDDING_CONCURRENCY", 4))
+        self.upsert_batch_size = int(os.getenv("QDRANT_UPSERT_BATCH_SIZE",
+                                               256))
+        self.top_k = int(os.getenv("QDRANT_TOP_K", 5))
+        self.profile_name = profile or os.getenv("QDRANT_PROFILE", "default")
+        self.profile = COLLECTION_PROFILES[self.profile_name]
+        self.dimensions = min(self.profile.get("dimensions", self.vector_size),
+                              self.vector_size)
+        if hybrid is None:
+            hybrid = os.getenv("QDRANT_HYBRID",
+                               "false").lower() in ("1", "true")
+        self.store = store or create_store(self.profile, self.distance, hybrid)
+        self.hybrid = self.store.hybrid
+        self._collections_ready = False
 
     def generate_qdrant_id(self, document: Dict) -> str:
         content_to_hash = document.get("content", "") + json.dumps(
@@ -32,50 +101,198 @@ class AsyncQdrantRAG:
         logger.debug(f"Generated Qdrant ID: {content_hash} for document")
         return content_hash[:32]
 
-    async def create_collection(self, collection_name: str):
+    def prepare_vector(self, vector: List[float]) -> List[float]:
+        """Truncate to the profile's leading dimensions and re-normalize."""
+        if len(vector) <= self.dimensions:
+            return vector
+        truncated = np.asarray(vector[:self.dimensions], dtype=np.float32)
+        norm = np.linalg.norm(truncated)
+        return (truncated / norm if norm else truncated).tolist()
+
+    async def create_collection(self,
+                                collection_name: str,
+                                payload_indexes: Optional[List[str]] = None):
         try:
-            collections = await self.client.get_collections()
-            collection_names = [c.name for c in collections.collections]
-
-            if collection_name not in collection_names:
-                await self.client.create_collection(
-                    collection_name=collection_name,
-                    vectors_config=VectorParams(size=self.vector_size,
-                                                distance=self.distance))
-                logger.info(f"Created collection: {collection_name}")
-            else:
-                logger.info(f"Collection {collection_name} already exists")
+            await self.store.create_collection(collection_name,
+                                               self.dimensions,
+                                               payload_indexes)
         except Exception as e:
             logger.error(f"Error creating collection: {e}")
             raise
 
-    def _init_summary_collection(self):
-        collection_name = os.getenv("QDRANT_COLLECTION",
-                                    "medical_document_summaries")
-        asyncio.run(self.create_collection(collection_name))
+    async def ensure_collections(self):
+        """Create the summary and chunk collections once per client.
+
+        Call it as a warm-up before serving; it is a no-op afterwards.
+        """
+        if self._collections_ready:
+            return
+        await self.create_collection(summary_collection_name)
+        await self.create_collection(chunk_collection_name,
+                                     payload_indexes=["metadata.file_stem"])
+        self._collections_ready = True
+
+    def _to_point(
+        self, document: Dict, embedding: List[float],
+        sparse_vector: Optional[SparseVector]
+    ) -> Tuple[str, List[float], Dict, Optional[SparseVector]]:
+        return (self.generate_qdrant_id(document),
+                self.prepare_vector(embedding), {
+                    "content": document.get("content", ""),
+                    "metadata": document.get("metadata", {}),
+                }, sparse_vector)
+
+    async def _upsert(self, collection_name: str,
+                      points: List[Tuple[str, List[float], Dict,
+                                         Optional[SparseVector]]]):
+        ids, vectors, payloads, sparse_vectors = map(list, zip(*points))
+        await self.store.upsert(collection_name, ids, vectors, payloads,
+                                sparse_vectors if self.hybrid else None)
+
+    def _embed_sparse(self, texts: List[str]) -> List[SparseVector]:
+        return [(embedding.indices.tolist(), embedding.values.tolist())
+                for embedding in get_sparse_model().embed(texts)]
+
+    async def _embed_batch(
+        self,
+        batch_id: int,
+        documents: List[Dict],
+        semaphore: asyncio.Semaphore,
+    ) -> Tuple[List[Dict], List[List[float]], List[Optional[SparseVector]]]:
+        texts = [document.get("content", "") for document in documents]
+        async with semaphore:
+            start = time.perf_counter()
+            if self.hybrid:
+                # The sparse encoder runs locally while the dense request
+                # is in flight.
+                embeddings, sparse_vectors = await asyncio.gather(
+                    self.embedding_model.aembed_documents(texts),
+                    asyncio.to_thread(self._embed_sparse, texts))
+            else:
+                embeddings = await self.embedding_model.aembed_documents(texts)
+                sparse_vectors = [None] * len(texts)
+            elapsed = time.perf_counter() - start
+        logger.info(
+            f"Embedded batch {batch_id} ({len(documents)} docs) in "
+            f"{elapsed:.2f}s, {len(documents) / max(elapsed, 1e-9):.1f} docs/s"
+        )
+        return documents, embeddings, sparse_vectors
 
     async def add_documents(
         self,
         documents: List[Dict],
         collection_name: str,
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
     ):
-        points = []
-        for document in documents:
-            embedding = self.embedding_model.embed_query(
-                document.get("content", ""))
-            point = models.PointStruct(id=self.generate_qdrant_id(document),
-                                       vector=embedding,
-                                       payload={
-                                           "content":
-                                           document.get("content", ""),
-                                           "metadata":
-                                           document.get("metadata", {}),
-                                       })
-            points.append(point)
-
-        await self.client.upsert(collection_name=collection_name,
-                                 points=points)
-        logger.info(f"Added {len(documents)} documents to collection")
+        """Embed documents in concurrent batches and upsert them in pages.
+
+        At most `concurrency` embedding requests of `batch_size` documents
+        are in flight; finished batches are upserted as soon as a page of
+        `QDRANT_UPSERT_BATCH_SIZE` points is ready, so embeddings are never
+        held for the whole corpus.
+        """
+        batch_size = batch_size or self.embed_batch_size
+        semaphore = asyncio.Semaphore(concurrency or self.embed_concurrency)
+        start = time.perf_counter()
+        tasks = [
+            asyncio.create_task(
+                self._embed_batch(batch_id, documents[i:i + batch_size],
+                                  semaphore))
+            for batch_id, i in enumerate(range(0, len(documents), batch_size))
+        ]
+
+        points: List[Tuple[str, List[float], Dict,
+                           Optional[SparseVector]]] = []
+        try:
+            for task in asyncio.as_completed(tasks):
+                batch, embeddings, sparse_vectors = await task
+                points.extend(
+                    self._to_point(document, embedding, sparse_vector)
+                    for document, embedding, sparse_vector in zip(
+                        batch, embeddings, sparse_vectors))
+                while len(points) >= self.upsert_batch_size:
+                    page = points[:self.upsert_batch_size]
+                    points = points[self.upsert_batch_size:]
+                    await self._upsert(collection_name, page)
+            if points:
+                await self._upsert(collection_name, points)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        elapsed = time.perf_counter() - start
+        logger.info(f"Added {len(documents)} documents to collection "
+                    f"{collection_name} in {elapsed:.2f}s "
+                    f"({len(documents) / max(elapsed, 1e-9):.1f} docs/s)")
+
+    async def embed_query(self, query: str) -> List[float]:
+        return await self.embedding_model.aembed_query(query)
+
+    async def encode_query(
+            self, query: str) -> Tuple[List[float], Optional[SparseVector]]:
+        """Dense query vector, plus the sparse one in hybrid mode."""
+
+        def embed_sparse() -> SparseVector:
+            embedding = next(iter(get_sparse_model().query_embed(query)))
+            return embedding.indices.tolist(), embedding.values.tolist()
+
+        with span("encode_query", kind="embedding", hybrid=self.hybrid):
+            if not self.hybrid:
+                return await self.embed_query(query), None
+            return await asyncio.gather(self.embed_query(query),
+                                        asyncio.to_thread(embed_sparse))
+
+    async def search_by_vector(
+        self,
+        collection_name: str,
+        query_vector: List[float],
+        limit: Optional[int] = None,
+        file_stem: Optional[str] = None,
+        sparse_vector: Optional[SparseVector] = None,
+    ) -> List[Dict]:
+        with span("search", kind="search",
+                  collection=collection_name) as current:
+            try:
+                results = await self.store.search(
+                    collection_name, self.prepare_vector(query_vector), limit
+                    or self.top_k, file_stem, sparse_vector)
+            except Exception as e:
+                logger.error(f"Search error: {e}")
+                if current:
+                    current.fail(e)
+                return []
+            if current:
+                current.set(hits=len(results))
+            return results
+
+    async def search_batch(
+        self,
+        collection_name: str,
+        query_vector: List[float],
+        file_stems: List[str],
+        limit: Optional[int] = None,
+        sparse_vector: Optional[SparseVector] = None,
+    ) -> List[List[Dict]]:
+        """Run one top-k search per file stem in a single batch request."""
+        if not file_stems:
+            return []
+        with span("search_batch",
+                  kind="search",
+                  collection=collection_name,
+                  searches=len(file_stems)) as current:
+            try:
+                results = await self.store.search_batch(
+                    collection_name, self.prepare_vector(query_vector), limit
+                    or self.top_k, file_stems, sparse_vector)
+            except Exception as e:
+                logger.error(f"Batch search error: {e}")
+                if current:
+                    current.fail(e)
+                return []
+            if current:
+                current.set(hits=sum(len(hits) for hits in results))
+            return results
 
     async def search(
         self,
@@ -83,38 +300,35 @@ class AsyncQdrantRAG:
         query: str,
     ) -> List[Dict]:
         try:
-            query_embedding = self.embedding_model.embed_query(query)
-            results = await self.client.search(
-                collection_name=collection_name,
-                query_vector=query_embedding,
-                limit=int(os.getenv("QDRANT_TOP_K", 5)),
-                with_payload=True)
-            formatted_results = []
-            for result in results:
-                formatted_results.append({
-                    "id":
-                    result.id,
-                    "content":
-                    result.payload.get("content", ""),
-                    "metadata":
-                    result.payload.get("metadata", {}),
-                    "score":
-                    result.score,
-                })
-
-            return formatted_results
-
+            query_vector, sparse_vector = await self.encode_query(query)
         except Exception as e:
             logger.error(f"Search error: {e}")
             return []
+        return await self.search_by_vector(collection_name,
+                                           query_vector,
+                                           sparse_vector=sparse_vector)
+
+    async def delete_points(self, collection_name: str, point_ids: List[str]):
+        for i in range(0, len(point_ids), self.upsert_batch_size):
+            await self.store.delete(collection_name,
+                                    point_ids[i:i + self.upsert_batch_size])
+        if point_ids:
+            logger.info(f"Deleted {len(point_ids)} points from collection "
+                        f"{collection_name}")
 
     async def delete_collection(self, collection_name: str):
         try:
-            await self.client.delete_collection(collection_name)
+            await self.store.delete_collection(collection_name)
             logger.info(f"Deleted collection: {collection_name}")
         except Exception as e:
             logger.error(f"Error deleting collection: {e}")
 
     async def close(self):
-        """Close the client connection"""
-        await self.client.close()
+        """Close the store connection"""
+        await self.store.close()
+
+
+@lru_cache(maxsize=None)
+def get_rag() -> AsyncQdrantRAG:
+    """Return the process-wide RAG client, creating it on first use."""
+    return AsyncQdrantRAG()
@@ -0,0 +1,99 @@
+"""OCR of clinical record pages: concurrent, in page order and cached.
+
+`ocr_pages` OCRs the image pages of a record with at most
+`OCR_CONCURRENCY` pages in flight and yields the text of each page, in
+page order, as soon as it and every page before it are done. OCR text is
+cached on disk by the hash of the page image and the OCR configuration
+(model, prompt and image profile), so re-running a case, or a case that
+shares pages with an earlier one, makes no OCR call for them. Set
+`OCR_CACHE=false` to always call the model.
+"""
+import os
+import asyncio
+import hashlib
+import threading
+from pathlib import Path
+from collections import deque
+from functools import lru_cache
+from typing import (AsyncIterator, Awaitable, Callable, Deque, Iterable,
+                    Optional, Tuple)
+from .cache import DiskCache, hash_text
+from .tracing import annotate, span
+
+# (text layer, page image): pages with a text layer need no OCR.
+Page = Tuple[Optional[str], Optional[bytes]]
+
+
+@lru_cache(maxsize=None)
+def _ocr_cache() -> DiskCache:
+    return DiskCache(Path(os.getenv("CACHE_DIR", "./cache")) / "ocr.sqlite",
+                     max_bytes=int(os.getenv("OCR_CACHE_MAX_MB", 256)) << 20)
+
+
+def _cache_enabled() -> bool:
+    return os.getenv("OCR_CACHE", "true").lower() not in ("0", "false")
+
+
+async def ocr_image(data: bytes, ocr: Callable[[bytes], Awaitable[str]],
+                    config: str) -> str:
+    """OCR text of one page image, from the cache when `config` (a string
+    identifying the OCR setup) has already read the same image."""
+    with span("ocr", kind="ocr", bytes=len(data)):
+        if not _cache_enabled():
+            return await ocr(data)
+        key = f"{hash_text(config)[:16]}:{hashlib.sha256(data).hexdigest()}"
+        cached = await asyncio.to_thread(_ocr_cache().get, key)
+        annotate(cached=cached is not None)
+        if cached is not None:
+            return cached.decode("utf-8")
+        text = await ocr(data)
+        await asyncio.to_thread(_ocr_cache().put, key, text.encode("utf-8"))
+        return text
+
+
+async def ocr_pages(pages: Iterable[Page],
+                    ocr: Callable[[bytes], Awaitable[str]],
+                    config: str,
+                    concurrency: Optional[int] = None) -> AsyncIterator[str]:
+    """Yield the text of each page in page order.
+
+    `pages` is consumed from a worker thread, so it may be a blocking
+    generator such as one over `iter_pdf_pages`. At most `concurrency`
+    pages are held at once, which bounds both the OCR calls in flight and
+    the page images in memory. `pages` is closed when this generator
+    ends, early or not, which shuts down its process pool.
+    """
+    concurrency = max(concurrency or int(os.getenv("OCR_CONCURRENCY", 4)), 1)
+    iterator = iter(pages)
+    # A cancelled `to_thread` leaves `next` running, and closing a running
+    # generator raises; the lock makes the close wait for it.
+    lock = threading.Lock()
+
+    def fetch() -> Optional[Page]:
+        with lock:
+            return next(iterator, None)
+
+    def close():
+        with lock:
+            if hasattr(iterator, "close"):
+                iterator.close()
+
+    pending: Deque[asyncio.Future] = deque()
+    try:
+        while page := await asyncio.to_thread(fetch):
+            text, image = page
+            if image is None:
+                future = asyncio.get_running_loop().create_future()
+                future.set_result(text or "")
+            else:
+                future = asyncio.ensure_future(ocr_image(image, ocr, config))
+            pending.append(future)
+            while pending and (pending[0].done()
+                               or len(pending) >= concurrency):
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        for future in pending:
+            future.cancel()
+        await asyncio.to_thread(close)
@@ -0,0 +1,98 @@
+import os
+import base64
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Deque, Dict, Iterator, Optional, Tuple, Union
+
+
+def _render_page(
+        pdf_path: str,
+        page_number: int,
+        dpi: int,
+        image_format: str,
+        profile: Optional[Dict[str, Any]] = None) -> Union[str, bytes]:
+    import pymupdf
+
+    with pymupdf.open(pdf_path) as document:
+        page = document[page_number]
+        if profile is None:
+            pixmap = page.get_pixmap(dpi=dpi)
+            image_bytes = pixmap.tobytes(image_format)
+            return base64.b64encode(image_bytes).decode('utf-8')
+        # Render straight at the profile's pixel budget, in its colors.
+        zoom = min(dpi / 72,
+                   (profile["max_pixels"] / abs(page.rect))**0.5 * 0.999)
+        pixmap = page.get_pixmap(
+            matrix=pymupdf.Matrix(zoom, zoom),
+            colorspace=pymupdf.csGRAY if profile["grayscale"] else None)
+        return pixmap.tobytes(profile["format"].lower(),
+                              jpg_quality=profile["quality"] or 95)
+
+
+def _page_result(
+    entry: Tuple[int, Optional[str], Optional[Future]]
+) -> Dict[str, Union[int, str, bytes, None]]:
+    page_number, text, future = entry
+    return {
+        "page": page_number,
+        "text": text,
+        "image": future.result() if future else None,
+    }
+
+
+def iter_pdf_pages(
+    pdf_path: str,
+    dpi: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+    workers: Optional[int] = None,
+    min_text_chars: Optional[int] = None,
+    image_format: Optional[str] = None,
+    first_page: int = 0,
+    last_page: Optional[int] = None,
+    profile: Optional[Dict[str, Any]] = None,
+) -> Iterator[Dict[str, Union[int, str, bytes, None]]]:
+    """Yield `{"page", "text", "image"}` for each page, in page order.
+
+    Pages with a text layer of at least `min_text_chars` characters are
+    returned as text straight from PyMuPDF. Image-only pages are rasterized
+    and base64-encoded in a process pool and returned as `image` for OCR.
+    With an image `profile` (see `agent.utils.image`), they are instead
+    rendered once at its pixel budget, colors and format, at most `dpi`,
+    and returned as encoded bytes ready for the model.
+    At most `max_in_flight` pages are held at once, which bounds peak memory
+    regardless of document length.
+    """
+    import pymupdf
+
+    dpi = dpi or int(os.getenv("PDF_DPI", 300))
+    max_in_flight = max_in_flight or int(os.getenv("PDF_MAX_IN_FLIGHT", 8))
+    workers = workers or int(os.getenv("PDF_WORKERS", os.cpu_count() or 1))
+    if min_text_chars is None:
+        min_text_chars = int(os.getenv("PDF_MIN_TEXT_CHARS", 32))
+    image_format = image_format or os.getenv("PDF_IMAGE_FORMAT", "png")
+
+    pending: Deque[Tuple[int, Optional[str], Optional[Future]]] = deque()
+
+    def ready() -> bool:
+        _, _, future = pending[0]
+        return (len(pending) >= max_in_flight or future is None
+                or future.done())
+
+    with pymupdf.open(pdf_path) as document, ProcessPoolExecutor(
+            max_workers=min(workers, max_in_flight)) as pool:
+        last_page = document.page_count if last_page is None else min(
+            last_page, document.page_count)
+        for page_number in range(first_page, last_page):
+            text = document[page_number].get_text().strip()
+            if len(text) >= min_text_chars:
+                pending.append((page_number, text, None))
+            else:
+                pending.append(
+                    (page_number, None,
+                     pool.submit(_render_page, pdf_path, page_number, dpi,
+                                 image_format, profile)))
+            while pending and ready():
+                yield _page_result(pending.popleft())
+
+        while pending:
+            yield _page_result(pending.popleft())
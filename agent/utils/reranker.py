@@ -0,0 +1,115 @@
+import os
+import asyncio
+from loguru import logger
+from functools import lru_cache
+from typing import Dict, List, Optional
+from .cache import LRUCache, hash_text
+from .gateway import get_gateway
+from .tracing import annotate, span
+
+
+class AsyncReranker:
+    """Rerank client with a score cache, sent through the model gateway.
+
+    Candidate lists longer than `batch_size` are split into parallel requests;
+    the gateway caps how many are in flight (`RERANK_CONCURRENCY`) and owns
+    the pooled connections, rate limits and retries. Cross-encoder relevance
+    scores are absolute per (query, document) pair, so the batches merge by
+    score and each pair is cached under (query hash, document hash).
+    """
+
+    def __init__(self,
+                 base_url: Optional[str] = None,
+                 model: Optional[str] = None,
+                 batch_size: Optional[int] = None):
+        base_url = base_url or os.getenv("BASE_URL",
+                                         "https://api.siliconflow.cn/v1")
+        self.url = f"{base_url.rstrip('/')}/rerank"
+        self.model = model or os.getenv("RERANK_MODEL",
+                                        "Qwen/Qwen3-Reranker-8B")
+        self.batch_size = batch_size or int(os.getenv("RERANK_BATCH_SIZE", 32))
+        self.cache = LRUCache(int(os.getenv("RERANK_CACHE_SIZE", 10000)))
+        self.headers = {"Content-Type": "application/json"}
+        if os.getenv("API_KEY"):
+            self.headers["Authorization"] = f"Bearer {os.getenv('API_KEY')}"
+        self.gateway = get_gateway()
+        self.gateway.register("RERANK", self.model)
+
+    async def _score_batch(self, query: str,
+                           documents: List[str]) -> List[float]:
+        payload = {
+            "model": self.model,
+            "query": query,
+            "documents": documents,
+            "top_n": len(documents),
+            "return_documents": False,
+        }
+        response = await self.gateway.async_client.post(self.url,
+                                                        json=payload,
+                                                        headers=self.headers)
+        if response.status_code != 200:
+            logger.info(f"Reranking error: {response.text}")
+            response.raise_for_status()
+        scores = [0.0] * len(documents)
+        for result in response.json().get("results", []):
+            scores[result["index"]] = result["relevance_score"]
+        return scores
+
+    async def score(self, query: str, documents: List[str]) -> List[float]:
+        query_hash = hash_text(query)
+        keys = [
+            f"{query_hash}:{hash_text(document)}" for document in documents
+        ]
+        scores: List[Optional[float]] = [self.cache.get(key) for key in keys]
+
+        pending: Dict[str, str] = {}
+        for key, document, score in zip(keys, documents, scores):
+            if score is None:
+                pending.setdefault(key, document)
+        annotate(cached=len(keys) - len(pending))
+        if pending:
+            pending_keys = list(pending)
+            batches = [
+                pending_keys[i:i + self.batch_size]
+                for i in range(0, len(pending_keys), self.batch_size)
+            ]
+            annotate(batches=len(batches))
+            batch_scores = await asyncio.gather(*[
+                self._score_batch(query, [pending[key] for key in batch])
+                for batch in batches
+            ])
+            fresh: Dict[str, float] = {}
+            for batch, values in zip(batches, batch_scores):
+                for key, value in zip(batch, values):
+                    fresh[key] = value
+                    self.cache.put(key, value)
+            scores = [
+                fresh[key] if score is None else score
+                for key, score in zip(keys, scores)
+            ]
+        return scores
+
+    async def rerank(self,
+                     query: str,
+                     documents: List[Dict],
+                     top_n: Optional[int] = None) -> List[Dict]:
+        if not documents:
+            return []
+        top_n = top_n or int(os.getenv("RERANK_TOP_N", 5))
+        with span("rerank",
+                  kind="rerank",
+                  model=self.model,
+                  documents=len(documents),
+                  top_n=top_n):
+            scores = await self.score(
+                query, [document["content"] for document in documents])
+        order = sorted(range(len(documents)),
+                       key=lambda i: scores[i],
+                       reverse=True)
+        return [documents[i] for i in order[:top_n]]
+
+
+@lru_cache(maxsize=None)
+def get_reranker() -> AsyncReranker:
+    """Return the process-wide rerank client, creating it on first use."""
+    return AsyncReranker()
@@ -0,0 +1,293 @@
+import os
+from abc import ABC, abstractmethod
+from loguru import logger
+from typing import Dict, List, Optional, Tuple
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http import models
+from qdrant_client.http.models import Distance, VectorParams
+
+# (indices, values) of a sparse lexical vector such as BM25.
+SparseVector = Tuple[List[int], List[float]]
+SPARSE_VECTOR_NAME = "sparse"
+
+
+class VectorStore(ABC):
+    """Storage primitives behind `AsyncQdrantRAG`.
+
+    Points are `(id, vector, payload)` with payloads shaped as
+    `{"content", "metadata"}`; searches may be restricted to one
+    `metadata.file_stem`. Results are dicts with `id` (str), `content`,
+    `metadata` and `score`, best first. Stores without hybrid support
+    ignore sparse vectors and search the dense vectors only.
+    """
+
+    hybrid = False
+
+    @abstractmethod
+    async def create_collection(self,
+                                collection_name: str,
+                                size: int,
+                                payload_indexes: Optional[List[str]] = None):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def upsert(self,
+                     collection_name: str,
+                     ids: List[str],
+                     vectors: List[List[float]],
+                     payloads: List[Dict],
+                     sparse_vectors: Optional[List[SparseVector]] = None):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def search_batch(
+        self,
+        collection_name: str,
+        query_vector: List[float],
+        limit: int,
+        file_stems: List[Optional[str]],
+        sparse_vector: Optional[SparseVector] = None,
+    ) -> List[List[Dict]]:
+        """Run one top-k search per file stem (None searches everything)."""
+        raise NotImplementedError
+
+    async def search(
+            self,
+            collection_name: str,
+            query_vector: List[float],
+            limit: int,
+            file_stem: Optional[str] = None,
+            sparse_vector: Optional[SparseVector] = None) -> List[Dict]:
+        return (await self.search_batch(collection_name, query_vector, limit,
+                                        [file_stem], sparse_vector))[0]
+
+    @abstractmethod
+    async def delete(self, collection_name: str, ids: List[str]):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete_collection(self, collection_name: str):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class QdrantStore(VectorStore):
+    """Qdrant server backend, configured by the collection profile.
+
+    With `hybrid`, points also carry a named sparse vector and searches that
+    pass one prefetch the dense and sparse top `prefetch_limit` candidates
+    and fuse them with reciprocal rank fusion, all in one request.
+    """
+
+    def __init__(self,
+                 profile: Dict,
+                 distance: str = "COSINE",
+                 client: Optional[AsyncQdrantClient] = None,
+                 hybrid: bool = False,
+                 sparse_idf: bool = True,
+                 prefetch_limit: Optional[int] = None):
+        self.client = client or AsyncQdrantClient(
+            host=os.getenv("QDRANT_HOST", "localhost"),
+            port=int(os.getenv("QDRANT_PORT", 6333)))
+        self.profile = profile
+        self.distance = getattr(Distance, distance)
+        self.search_params = self._search_params()
+        self.hybrid = hybrid
+        self.sparse_idf = sparse_idf
+        self.prefetch_limit = prefetch_limit or int(
+            os.getenv("QDRANT_PREFETCH_LIMIT", 20))
+
+    def _quantization_config(self) -> Optional[models.QuantizationConfig]:
+        quantization = self.profile.get("quantization")
+        if quantization == "scalar":
+            return models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(
+                    type=models.ScalarType.INT8,
+                    quantile=0.99,
+                    always_ram=True))
+        if quantization == "binary":
+            return models.BinaryQuantization(
+                binary=models.BinaryQuantizationConfig(always_ram=True))
+        return None
+
+    def _search_params(self) -> Optional[models.SearchParams]:
+        if not self.profile.get("quantization") and not self.profile.get(
+                "hnsw_ef"):
+            return None
+        quantization = None
+        if self.profile.get("quantization"):
+            quantization = models.QuantizationSearchParams(
+                rescore=self.profile.get("rescore", True),
+                oversampling=self.profile.get("oversampling"))
+        return models.SearchParams(hnsw_ef=self.profile.get("hnsw_ef"),
+                                   quantization=quantization)
+
+    @staticmethod
+    def file_stem_filter(file_stem: Optional[str]) -> Optional[models.Filter]:
+        if file_stem is None:
+            return None
+        return models.Filter(must=[
+            models.FieldCondition(key="metadata.file_stem",
+                                  match=models.MatchValue(value=file_stem))
+        ])
+
+    def _sparse_config(self) -> Dict[str, models.SparseVectorParams]:
+        # BM25 vectors hold term frequencies; Qdrant applies the IDF.
+        return {
+            SPARSE_VECTOR_NAME:
+            models.SparseVectorParams(
+                modifier=models.Modifier.IDF if self.sparse_idf else None)
+        }
+
+    def _query(self, query_vector: List[float], limit: int,
+               file_stem: Optional[str],
+               sparse_vector: Optional[SparseVector]) -> Dict:
+        query_filter = self.file_stem_filter(file_stem)
+        if not self.hybrid or sparse_vector is None:
+            return dict(query=query_vector,
+                        filter=query_filter,
+                        limit=limit,
+                        params=self.search_params)
+        indices, values = sparse_vector
+        prefetch_limit = max(limit, self.prefetch_limit)
+        return dict(prefetch=[
+            models.Prefetch(query=query_vector,
+                            filter=query_filter,
+                            limit=prefetch_limit,
+                            params=self.search_params),
+            models.Prefetch(query=models.SparseVector(indices=indices,
+                                                      values=values),
+                            using=SPARSE_VECTOR_NAME,
+                            filter=query_filter,
+                            limit=prefetch_limit),
+        ],
+                    query=models.FusionQuery(fusion=models.Fusion.RRF),
+                    limit=limit)
+
+    @staticmethod
+    def _format_results(results: List[models.ScoredPoint]) -> List[Dict]:
+        formatted_results = []
+        for result in results:
+            formatted_results.append({
+                "id":
+                str(result.id),
+                "content":
+                result.payload.get("content", ""),
+                "metadata":
+                result.payload.get("metadata", {}),
+                "score":
+                result.score,
+            })
+        return formatted_results
+
+    async def create_collection(self,
+                                collection_name: str,
+                                size: int,
+                                payload_indexes: Optional[List[str]] = None):
+        collections = await self.client.get_collections()
+        collection_names = [c.name for c in collections.collections]
+
+        if collection_name not in collection_names:
+            hnsw_config = None
+            if self.profile.keys() & {"hnsw_m", "hnsw_ef_construct"}:
+                hnsw_config = models.HnswConfigDiff(
+                    m=self.profile.get("hnsw_m"),
+                    ef_construct=self.profile.get("hnsw_ef_construct"))
+            await self.client.create_collection(
+                collection_name=collection_name,
+                vectors_config=VectorParams(
+                    size=size,
+                    distance=self.distance,
+                    on_disk=self.profile.get("on_disk")),
+                hnsw_config=hnsw_config,
+                quantization_config=self._quantization_config(),
+                sparse_vectors_config=self._sparse_config()
+                if self.hybrid else None)
+            logger.info(f"Created collection: {collection_name}")
+        else:
+            logger.info(f"Collection {collection_name} already exists")
+            if self.hybrid:
+                info = await self.client.get_collection(collection_name)
+                if SPARSE_VECTOR_NAME not in (info.config.params.sparse_vectors
+                                              or {}):
+                    # Existing points stay dense-only until re-indexed.
+                    await self.client.update_collection(
+                        collection_name=collection_name,
+                        sparse_vectors_config=self._sparse_config())
+                    logger.info(f"Added sparse vectors to {collection_name}")
+        for field_name in payload_indexes or []:
+            await self.client.create_payload_index(
+                collection_name=collection_name,
+                field_name=field_name,
+                field_schema=models.PayloadSchemaType.KEYWORD)
+
+    async def upsert(self,
+                     collection_name: str,
+                     ids: List[str],
+                     vectors: List[List[float]],
+                     payloads: List[Dict],
+                     sparse_vectors: Optional[List[SparseVector]] = None):
+        if self.hybrid and sparse_vectors is not None:
+            vectors = [{
+                "":
+                vector,
+                SPARSE_VECTOR_NAME:
+                models.SparseVector(indices=indices, values=values)
+            } for vector, (indices, values) in zip(vectors, sparse_vectors)]
+        await self.client.upsert(
+            collection_name=collection_name,
+            points=[
+                models.PointStruct(id=point_id, vector=vector, payload=payload)
+                for point_id, vector, payload in zip(ids, vectors, payloads)
+            ])
+
+    async def search(
+            self,
+            collection_name: str,
+            query_vector: List[float],
+            limit: int,
+            file_stem: Optional[str] = None,
+            sparse_vector: Optional[SparseVector] = None) -> List[Dict]:
+        query = self._query(query_vector, limit, file_stem, sparse_vector)
+        query_filter = query.pop("filter", None)
+        search_params = query.pop("params", None)
+        response = await self.client.query_points(
+            collection_name=collection_name,
+            query_filter=query_filter,
+            search_params=search_params,
+            with_payload=True,
+            **query)
+        return self._format_results(response.points)
+
+    async def search_batch(
+        self,
+        collection_name: str,
+        query_vector: List[float],
+        limit: int,
+        file_stems: List[Optional[str]],
+        sparse_vector: Optional[SparseVector] = None,
+    ) -> List[List[Dict]]:
+        requests = [
+            models.QueryRequest(with_payload=True,
+                                **self._query(query_vector, limit, file_stem,
+                                              sparse_vector))
+            for file_stem in file_stems
+        ]
+        responses = await self.client.query_batch_points(
+            collection_name=collection_name, requests=requests)
+        return [
+            self._format_results(response.points) for response in responses
+        ]
+
+    async def delete(self, collection_name: str, ids: List[str]):
+        await self.client.delete(
+            collection_name=collection_name,
+            points_selector=models.PointIdsList(points=ids))
+
+    async def delete_collection(self, collection_name: str):
+        await self.client.delete_collection(collection_name)
+
+    async def close(self):
+        await self.client.close()
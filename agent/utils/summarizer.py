@@ -0,0 +1,104 @@
+"""Map-reduce summaries of long documents for the summary collection.
+
+`MapReduceSummarizer` summarizes every chunk on the SLM, at most
+`SUMMARY_CONCURRENCY` calls at once, then merges consecutive summaries in
+groups of up to `SUMMARY_MERGE_TOKENS` tokens, level by level, until one
+summary is left. Chunk and merge summaries are cached on disk by the hash
+of their input and the model and prompt, so after an edit only the
+changed chunks and the merges above them are recomputed. It is the
+`summarizer` of `IncrementalIndexer`.
+"""
+import os
+import json
+import asyncio
+from pathlib import Path
+from functools import lru_cache
+from typing import List, Optional
+from loguru import logger
+from agent.prompt import CHUNK_SUMMARY_PROMPT, MERGE_SUMMARY_PROMPT
+from .cache import DiskCache, hash_text
+from .tools import DEFAULT_MODELS, get_agent
+
+
+@lru_cache(maxsize=None)
+def _summary_cache() -> DiskCache:
+    return DiskCache(
+        Path(os.getenv("CACHE_DIR", "./cache")) / "summaries.sqlite",
+        max_bytes=int(os.getenv("SUMMARY_CACHE_MAX_MB", 256)) << 20)
+
+
+class MapReduceSummarizer:
+    """`Summarizer` of a document from its chunks, in chunk order."""
+
+    def __init__(self,
+                 agent: str = "SLM",
+                 concurrency: Optional[int] = None,
+                 merge_tokens: Optional[int] = None):
+        self.agent = agent
+        self.semaphore = asyncio.Semaphore(
+            concurrency or int(os.getenv("SUMMARY_CONCURRENCY", 8)))
+        self.merge_tokens = merge_tokens or int(
+            os.getenv("SUMMARY_MERGE_TOKENS", 6000))
+        self.use_cache = os.getenv("SUMMARY_CACHE",
+                                   "true").lower() not in ("0", "false")
+        self.counts = {"calls": 0, "cached": 0}
+
+    def _key(self, prompt: str, text: str) -> str:
+        model = os.getenv(f"{self.agent}_MODEL", DEFAULT_MODELS[self.agent])
+        config = hash_text(json.dumps([model, prompt]))[:16]
+        return f"{config}:{hash_text(text)}"
+
+    async def _summarize(self, prompt: str, text: str) -> str:
+        key = self._key(prompt, text)
+        if self.use_cache:
+            cached = await asyncio.to_thread(_summary_cache().get, key)
+            if cached is not None:
+                self.counts["cached"] += 1
+                return cached.decode("utf-8")
+        model = get_agent(self.agent)
+        async with self.semaphore:
+            response = await model.ainvoke(prompt.format(text=text))
+        self.counts["calls"] += 1
+        if self.use_cache:
+            await asyncio.to_thread(_summary_cache().put, key,
+                                    response.content.encode("utf-8"))
+        return response.content
+
+    def _groups(self, summaries: List[str]) -> List[List[str]]:
+        """Consecutive summaries packed up to `merge_tokens`, at least two
+        per group so every level shrinks."""
+        from .chunker import get_tokenizer
+
+        encodings = get_tokenizer().backend_tokenizer.encode_batch(
+            summaries, add_special_tokens=False)
+        groups: List[List[str]] = [[]]
+        tokens = 0
+        for summary, encoding in zip(summaries, encodings):
+            if (len(groups[-1]) >= 2
+                    and tokens + len(encoding.ids) > self.merge_tokens):
+                groups.append([])
+                tokens = 0
+            groups[-1].append(summary)
+            tokens += len(encoding.ids)
+        if len(groups) > 1 and len(groups[-1]) == 1:
+            groups[-2].extend(groups.pop())
+        return groups
+
+    async def __call__(self, file_stem: str, chunks: List[str]) -> str:
+        if not chunks:
+            return ""
+        calls, cached = self.counts["calls"], self.counts["cached"]
+        summaries = await asyncio.gather(
+            *(self._summarize(CHUNK_SUMMARY_PROMPT, chunk)
+              for chunk in chunks))
+        levels = 0
+        while len(summaries) > 1:
+            levels += 1
+            summaries = await asyncio.gather(
+                *(self._summarize(MERGE_SUMMARY_PROMPT, "\n\n".join(group))
+                  for group in self._groups(summaries)))
+        logger.info(f"Summarized {file_stem}: {len(chunks)} chunks, "
+                    f"{levels} merge levels, "
+                    f"{self.counts['calls'] - calls} calls, "
+                    f"{self.counts['cached'] - cached} cached")
+        return summaries[0]
@@ -2,42 +2,205 @@ import os
 import io
 import sys
 import base64
-from PIL import Image
 from pathlib import Path
 from loguru import logger
 from datetime import datetime
-from typing import Union, List
-from pydantic import SecretStr
-from pdf2image import convert_from_path
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, Optional, Union, List, Tuple
 
+# Model SDKs and imaging libraries take seconds to import, so they are only
+# loaded by the factories below on first use.
+if TYPE_CHECKING:
+    from PIL import Image
+    from langchain_core.embeddings import Embeddings
+    from langchain_openai import ChatOpenAI
+    from fastembed import SparseTextEmbedding
+    from .cache import DiskCache, ResponseCache
+
+DEFAULT_MODELS = {
+    "LLM": "Qwen/Qwen3-235B-A22B-Instruct-2507",
+    "VLM": "Qwen/Qwen3-VL-235B-A22B-Instruct",
+    "SLM": "Qwen/Qwen3-14B",
+    "SVLM": "Qwen/Qwen3-VL-8B-Instruct",
+    "OCR": "deepseek-ai/DeepSeek-OCR",
+}
+
+# Sampling defaults per agent when `{name}_MAX_TOKENS`, `{name}_TEMPERATURE`
+# or `{name}_TOP_P` are unset.
+DEFAULT_SETTINGS = {
+    "LLM": {
+        "max_tokens": 16384,
+        "temperature": 0.3,
+        "top_p": 0.7
+    },
+    "VLM": {
+        "max_tokens": 16384,
+        "temperature": 0.3,
+        "top_p": 0.7
+    },
+    "SLM": {
+        "max_tokens": 4096,
+        "temperature": 0.1
+    },
+    "SVLM": {
+        "max_tokens": 4096,
+        "temperature": 0.1
+    },
+    "OCR": {
+        "max_tokens": 4096,
+        "temperature": 0.0
+    },
+}
+
+
+@lru_cache(maxsize=None)
+def _build_agent(name: str, tags: Tuple[str, ...]) -> "ChatOpenAI":
+    from pydantic import SecretStr
+    from langchain_openai import ChatOpenAI
+    from .gateway import get_gateway
+    from .tracing import model_call_tracer, tracing_enabled
 
-def get_agent(name: str, tags: list[str] | None = None) -> ChatOpenAI:
     base_url = os.getenv("MODEL_URL", "https://api.siliconflow.cn/v1")
     api_key = SecretStr(os.getenv("API_KEY", ""))
-    model_name = os.getenv(f"{name}_MODEL", "")
-    temperature = float(os.getenv(f"{name}_TEMPERATURE", 0.3))
-    max_completion_tokens = int(os.getenv(f"{name}_MAX_TOKENS", 16384))
+    model_name = os.getenv(f"{name}_MODEL", DEFAULT_MODELS.get(name, ""))
+    defaults = DEFAULT_SETTINGS.get(name, {})
+    temperature = float(
+        os.getenv(f"{name}_TEMPERATURE", defaults.get("temperature", 0.3)))
+    max_completion_tokens = int(
+        os.getenv(f"{name}_MAX_TOKENS", defaults.get("max_tokens", 16384)))
+    top_p = os.getenv(f"{name}_TOP_P", defaults.get("top_p"))
+    gateway = get_gateway()
+    gateway.register(name, model_name)
     model = ChatOpenAI(
         model=model_name,
         base_url=base_url,
         api_key=api_key,
         temperature=temperature,
         max_completion_tokens=max_completion_tokens,
-        tags=tags,
+        top_p=float(top_p) if top_p else None,
+        tags=list(tags) or None,
+        metadata={"agent": name},
+        cache=(get_response_cache(name)
+               if _enabled("LLM_CACHE", "false") else None),
+        callbacks=[model_call_tracer()] if tracing_enabled() else None,
+        # Retries, rate limits and deadlines are handled by the gateway.
+        http_client=gateway.sync_client,
+        http_async_client=gateway.async_client,
+        max_retries=0,
     )
+    logger.debug(f"Initialized {name} agent: {model_name}")
     return model
 
 
+def get_agent(name: str, tags: list[str] | None = None) -> "ChatOpenAI":
+    """Return the shared chat client for `name`, building it on first use."""
+    return _build_agent(name, tuple(tags or ()))
+
+
+def model_price(name: str) -> Tuple[float, float]:
+    """Input and output price per million tokens of agent `name`, from
+    `{name}_PRICE=input,output`; zero when unset."""
+    try:
+        input_price, output_price = (
+            float(price)
+            for price in os.getenv(f"{name}_PRICE", "").split(","))
+    except ValueError:
+        return 0.0, 0.0
+    return input_price, output_price
+
+
+def call_cost(name: str, usage: Optional[Dict[str, int]]) -> float:
+    """Cost of one call of agent `name` from its `usage_metadata`."""
+    input_price, output_price = model_price(name)
+    usage = usage or {}
+    return (usage.get("input_tokens", 0) * input_price +
+            usage.get("output_tokens", 0) * output_price) / 1e6
+
+
+def _enabled(variable: str, default: str = "true") -> bool:
+    return os.getenv(variable, default).lower() not in ("0", "false")
+
+
+@lru_cache(maxsize=None)
+def _response_store() -> "DiskCache":
+    from .cache import DiskCache
+
+    return DiskCache(
+        Path(os.getenv("CACHE_DIR", "./cache")) / "responses.sqlite",
+        max_bytes=int(os.getenv("LLM_CACHE_MAX_MB", 512)) << 20,
+        memory_size=int(os.getenv("LLM_CACHE_MEMORY", 256)),
+        ttl=float(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600)) or None)
+
+
+_response_caches: Dict[str, "ResponseCache"] = {}
+
+
+def get_response_cache(name: str) -> "ResponseCache":
+    """Return the response cache of agent `name`.
+
+    Only used with `LLM_CACHE=true`. All agents share one store; `LLM_CACHE_SEMANTIC=true` also reuses
+    answers to near-identical text-only prompts (cosine similarity of at
+    least `LLM_CACHE_SIMILARITY`).
+    """
+    if name not in _response_caches:
+        from .cache import ResponseCache
+
+        embeddings = None
+        if _enabled("LLM_CACHE_SEMANTIC", "false"):
+            embeddings = get_embedding_model(
+                os.getenv("EMBEDDING_MODEL", "Qwen/Qwen3-Embedding-8B"))
+        _response_caches[name] = ResponseCache(
+            name,
+            _response_store(),
+            embeddings,
+            similarity=float(os.getenv("LLM_CACHE_SIMILARITY", 0.97)))
+    return _response_caches[name]
+
+
+def response_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Hit rates and saved tokens per agent since process start."""
+    return {name: cache.stats() for name, cache in _response_caches.items()}
+
+
+@lru_cache(maxsize=None)
 def get_embedding_model(
-        model_name: str = "Qwen/Qwen3-Embedding-8B") -> OpenAIEmbeddings:
+        model_name: str = "Qwen/Qwen3-Embedding-8B") -> "Embeddings":
+    from pydantic import SecretStr
+    from langchain_openai import OpenAIEmbeddings
+    from .cache import CachedEmbeddings
+    from .gateway import get_gateway
 
+    gateway = get_gateway()
+    gateway.register("EMBEDDING", model_name)
     embedding_model = OpenAIEmbeddings(
         model=model_name,
         base_url=os.getenv("MODEL_URL", "https://api.siliconflow.cn/v1"),
         api_key=SecretStr(os.getenv("API_KEY", "")),
+        http_client=gateway.sync_client,
+        http_async_client=gateway.async_client,
+        max_retries=0,
     )
-    return embedding_model
+    if not _enabled("EMBEDDING_CACHE"):
+        return embedding_model
+    return CachedEmbeddings(embedding_model,
+                            model_name,
+                            dimensions=int(
+                                os.getenv("QDRENT_VECTOR_SIZE", 4096)))
+
+
+@lru_cache(maxsize=None)
+def get_sparse_model(model_name: str = None) -> "SparseTextEmbedding":
+    """Local sparse encoder for hybrid retrieval (BM25 by default).
+
+    `SPARSE_MODEL_PATH` points at pre-downloaded model files for hosts
+    without hub access.
+    """
+    from fastembed import SparseTextEmbedding
+
+    return SparseTextEmbedding(
+        model_name or os.getenv("SPARSE_MODEL", "Qdrant/bm25"),
+        cache_dir=os.getenv("CACHE_DIR", "./cache"),
+        specific_model_path=os.getenv("SPARSE_MODEL_PATH"))
 
 
 def get_logger(module_name: str = "medical_agent"):
@@ -70,8 +233,10 @@ def get_logger(module_name: str = "medical_agent"):
 
 
 def image_to_base64(
-    image_input: Union[str, Image.Image, List[Image.Image]]
+    image_input: Union[str, "Image.Image", List["Image.Image"]]
 ) -> Union[str, List[str]]:
+    from PIL import Image
+
     if isinstance(image_input, str):
         with open(image_input, "rb") as image_file:
             binary_data = image_file.read()
@@ -104,6 +269,8 @@ def image_to_base64(
         )
 
 
-def pdf_to_image_list(pdf_path: str, dpi: int = 300) -> List[Image.Image]:
+def pdf_to_image_list(pdf_path: str, dpi: int = 300) -> List["Image.Image"]:
+    from pdf2image import convert_from_path
+
     images = convert_from_path(pdf_path, dpi=dpi)
     return images
@@ -0,0 +1,305 @@
+"""Spans for graph nodes, model calls, vector searches and reranks.
+
+Every span is written as one JSON line to `TRACE_FILE` (default
+`log/traces.jsonl`) using OpenTelemetry field names: `trace_id`,
+`span_id`, `parent_span_id`, `name`, `kind`, `start_time_unix_nano`,
+`end_time_unix_nano`, `attributes` and `status`. Ended spans are put on
+an in-process queue and serialized and written by a daemon thread, so the
+event loop only builds a dict per span (loguru's `enqueue` would add a
+pipe write per record).
+
+`trace_run` opens a new trace for one case. When it closes, its span
+carries a `rollup` of all its child spans: count, time, cascade
+escalations and context tokens saved per node, calls, tokens, cost
+(`{agent}_PRICE`) and cache hits per model, and count and time of
+searches, reranks and OCR pages; the totals are also logged as one line
+per case. A model call answered from the response cache (`LLM_CACHE`) is
+tagged `cache_hit` and `cache` (`exact` or `semantic`) and reports no
+tokens or cost. A node that parks the run for review (LangGraph's
+`GraphInterrupt`) ends with status `INTERRUPTED`, not as an error. Set
+`TRACING=false` to turn spans off.
+"""
+import os
+import json
+import time
+import queue
+import atexit
+import threading
+import contextvars
+from pathlib import Path
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, Iterator, Optional
+from uuid import UUID
+from loguru import logger
+from langchain_core.callbacks import AsyncCallbackHandler
+from langgraph.errors import GraphBubbleUp
+from .tools import call_cost
+
+# Numeric span attributes summed into the rollup of the run.
+ROLLUP_FIELDS = ("prompt_tokens", "completion_tokens", "cost", "cache_hit",
+                 "hits", "cached", "cascaded", "escalated", "saved_tokens")
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "current_span", default=None)
+
+
+def tracing_enabled() -> bool:
+    return os.getenv("TRACING", "true").lower() not in ("0", "false")
+
+
+class _SpanWriter(threading.Thread):
+    """Daemon thread appending queued spans to a JSONL file."""
+
+    def __init__(self, path: Path):
+        super().__init__(name="span-writer", daemon=True)
+        self.path = path
+        self.queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+
+    def run(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as file:
+            while True:
+                item = self.queue.get()
+                if isinstance(item, threading.Event):
+                    file.flush()
+                    item.set()
+                    continue
+                try:
+                    file.write(
+                        json.dumps(item, ensure_ascii=False, default=str))
+                    file.write("\n")
+                except Exception as e:
+                    logger.debug(f"Dropped span {item.get('name')}: {e}")
+                if self.queue.empty():
+                    file.flush()
+
+    def flush(self, timeout: float = 5.0):
+        done = threading.Event()
+        self.queue.put(done)
+        done.wait(timeout)
+
+
+@lru_cache(maxsize=None)
+def _writer() -> _SpanWriter:
+    writer = _SpanWriter(Path(os.getenv("TRACE_FILE", "log/traces.jsonl")))
+    writer.start()
+    atexit.register(writer.flush)
+    return writer
+
+
+def flush_traces():
+    """Wait until every span emitted so far has been written."""
+    if _writer.cache_info().currsize:
+        _writer().flush()
+
+
+class Span:
+
+    def __init__(self,
+                 name: str,
+                 kind: str,
+                 parent: Optional["Span"] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.kind = kind
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.rollup = parent.rollup if parent else None
+        self.attributes = dict(attributes or {})
+        self.status = "OK"
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter_ns()
+
+    def set(self, **attributes: Any):
+        self.attributes.update(attributes)
+
+    def fail(self, error: BaseException):
+        self.status = "ERROR"
+        self.attributes["error"] = repr(error)
+
+    def interrupt(self, signal: GraphBubbleUp):
+        """End as control flow (an interrupt or a parent command), not as
+        an error."""
+        self.status = "INTERRUPTED"
+        self.attributes["interrupt"] = type(signal).__name__
+
+    def _add_to_rollup(self, duration_ms: float):
+        if self.rollup is None or self.kind == "run":
+            return
+        groups = self.rollup.setdefault(self.kind, {})
+        group = groups.setdefault(self.name, {"count": 0, "duration_ms": 0.0})
+        group["count"] += 1
+        group["duration_ms"] += duration_ms
+        for field in ROLLUP_FIELDS:
+            value = self.attributes.get(field)
+            if isinstance(value, (bool, int, float)):
+                group[field] = group.get(field, 0) + value
+        if self.status == "ERROR":
+            group["errors"] = group.get("errors", 0) + 1
+        elif self.status == "INTERRUPTED":
+            group["interrupted"] = group.get("interrupted", 0) + 1
+
+    def end(self):
+        duration = time.perf_counter_ns() - self._start
+        self._add_to_rollup(duration / 1e6)
+        _writer().queue.put({
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.start_ns + duration,
+            "duration_ms": duration / 1e6,
+            "attributes": self.attributes,
+            "status": self.status,
+        })
+
+
+@contextmanager
+def span(name: str,
+         kind: str = "internal",
+         **attributes: Any) -> Iterator[Optional[Span]]:
+    """Time the block as a child of the current span; yields None when
+    tracing is off."""
+    if not tracing_enabled():
+        yield None
+        return
+    current = Span(name, kind, _current.get(), attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except GraphBubbleUp as e:
+        current.interrupt(e)
+        raise
+    except BaseException as e:
+        current.fail(e)
+        raise
+    finally:
+        _current.reset(token)
+        current.end()
+
+
+def _run_totals(rollup: Dict[str, Any]) -> Dict[str, Any]:
+    models = rollup.get("model", {}).values()
+    nodes = rollup.get("node", {}).values()
+    return {
+        "model_calls":
+        sum(group["count"] for group in models),
+        "tokens":
+        sum(
+            group.get("prompt_tokens", 0) + group.get("completion_tokens", 0)
+            for group in models),
+        "cost":
+        sum(group.get("cost", 0.0) for group in models),
+        "cache_hits":
+        sum(group.get("cache_hit", 0) for group in models),
+        "cascaded":
+        sum(group.get("cascaded", 0) for group in nodes),
+        "escalated":
+        sum(group.get("escalated", 0) for group in nodes),
+        "saved_tokens":
+        sum(group.get("saved_tokens", 0) for group in nodes),
+    }
+
+
+def _run_summary(root: Span) -> str:
+    totals = root.attributes
+    summary = (f"Run {root.name} {totals.get('case_id', root.trace_id)}: "
+               f"{(time.perf_counter_ns() - root._start) / 1e9:.2f}s, "
+               f"{totals['model_calls']} model calls, "
+               f"{totals['tokens']} tokens, cost {totals['cost']:.4f}")
+    if totals["cascaded"]:
+        summary += (f", escalated {totals['escalated']}/"
+                    f"{totals['cascaded']} cascaded steps")
+    if totals["saved_tokens"]:
+        summary += f", {totals['saved_tokens']} context tokens saved"
+    if totals["cache_hits"]:
+        summary += f", {totals['cache_hits']} served from the response cache"
+    return summary
+
+
+@contextmanager
+def trace_run(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Open a new trace whose span ends with the rollup of the run."""
+    if not tracing_enabled():
+        yield None
+        return
+    root = Span(name, "run", None, attributes)
+    root.rollup = {}
+    token = _current.set(root)
+    try:
+        yield root
+    except GraphBubbleUp as e:
+        root.interrupt(e)
+        raise
+    except BaseException as e:
+        root.fail(e)
+        raise
+    finally:
+        try:
+            _current.reset(token)
+        except ValueError:
+            pass  # closed from another context, e.g. a finalized generator
+        root.set(rollup=root.rollup, **_run_totals(root.rollup))
+        logger.info(_run_summary(root))
+        root.end()
+
+
+def annotate(**attributes: Any):
+    """Add attributes to the current span, if any."""
+    current = _current.get()
+    if current is not None:
+        current.set(**attributes)
+
+
+class ModelCallTracer(AsyncCallbackHandler):
+    """Chat model callback recording one `model` span per call."""
+
+    def __init__(self):
+        self.spans: Dict[UUID, Span] = {}
+
+    async def on_chat_model_start(self, serialized: Any, messages: Any, *,
+                                  run_id: UUID, **kwargs: Any):
+        metadata = kwargs.get("metadata") or {}
+        tags = kwargs.get("tags") or []
+        attributes = {
+            "agent": metadata.get("agent"),
+            "agent_tags": [tag for tag in tags if not tag.startswith("seq:")],
+            "node": metadata.get("langgraph_node"),
+        }
+        model = metadata.get("ls_model_name") or "chat"
+        self.spans[run_id] = Span(model, "model", _current.get(), attributes)
+
+    async def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any):
+        current = self.spans.pop(run_id, None)
+        if current is None:
+            return
+        generation = response.generations[0][0]
+        message = getattr(generation, "message", None)
+        usage = getattr(message, "usage_metadata", None) or {}
+        # "exact" or "semantic" when the response cache served the answer.
+        cache = (generation.generation_info or {}).get("cache_hit")
+        if cache:
+            # Cached usage is what the original call cost, not this one.
+            usage = {}
+            current.set(cache=cache)
+        current.set(prompt_tokens=usage.get("input_tokens", 0),
+                    completion_tokens=usage.get("output_tokens", 0),
+                    cost=call_cost(current.attributes.get("agent"), usage),
+                    cache_hit=bool(cache))
+        current.end()
+
+    async def on_llm_error(self, error: BaseException, *, run_id: UUID,
+                           **kwargs: Any):
+        current = self.spans.pop(run_id, None)
+        if current is not None:
+            current.fail(error)
+            current.end()
+
+
+@lru_cache(maxsize=None)
+def model_call_tracer() -> ModelCallTracer:
+    return ModelCallTracer()
@@ -1,13 +1,22 @@
 # TODO: this is a demo workflow, please modify it according to your needs
+import os
+from typing import Any, Dict, Optional
+from loguru import logger
 from langgraph.graph import StateGraph
 from langgraph.graph import START, END
-from agent.state import (MedicalAgentInputState, MedicalKnowledgeState)
+from langgraph.types import Command
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from agent.state import (MedicalAgentInputState, MedicalOutputInputState,
+                         MedicalAgentState, MedicalKnowledgeState,
+                         ClinicalRecordState, MedicalImageState)
 from agent.node import (KnowledgeRetriever, KnowledgeReasoner, InputProcessor,
-                        ImageClassifier, SymptomFinder, HumanReviewer,
-                        SymptomChecker, ReportGenerator,
+                        ImagePreprocessor, ImageClassifier, SymptomFinder,
+                        HumanReviewer, SymptomChecker, ReportGenerator,
+                        KnowledgeAgentRetrievalRouter,
                         KnowledgeAgentInternalRouter,
-                        MedicalAgentDiagnosisRouter, MedicalAgentVerdictRouter,
-                        KnowledgeAgentOutputRouter)
+                        MedicalAgentDiagnosisRouter)
+from agent.utils.checkpoint import case_config
+from agent.utils.tracing import trace_run
 
 ######################################################################
 #################### Medical Knowledge Retriever #####################
@@ -19,50 +28,128 @@ MedicalKnowledgeRetriever.add_node("Knowledge Retrieval", KnowledgeRetriever)
 MedicalKnowledgeRetriever.add_node("Knowledge Reasoning", KnowledgeReasoner)
 
 MedicalKnowledgeRetriever.add_edge(START, "Knowledge Retrieval")
-MedicalKnowledgeRetriever.add_edge("Knowledge Retrieval",
-                                   "Knowledge Reasoning")
+MedicalKnowledgeRetriever.add_conditional_edges(
+    "Knowledge Retrieval", KnowledgeAgentRetrievalRouter, {
+        "Reason": "Knowledge Reasoning",
+        "Exit RAG": END
+    })
 MedicalKnowledgeRetriever.add_conditional_edges(
     "Knowledge Reasoning", KnowledgeAgentInternalRouter, {
         "Continue RAG": "Knowledge Retrieval",
         "Exit RAG": END
     })
-MedicalKnowledgeRetriever.add_edge("Knowledge Retrieval", END)
 
 MedicalKnowledgeRetriever = MedicalKnowledgeRetriever.compile()
 
 ######################################################################
-########################### Medical Agent ############################
+####################### Parallel Agent Branches ######################
 ######################################################################
 
-app = StateGraph(MedicalAgentInputState)
-app.add_node("Input Processor", InputProcessor)
-app.add_node("Medical Knowledge Agent", MedicalKnowledgeRetriever)
-app.add_node("Image Classifier", ImageClassifier)
-app.add_node("Symptom Finder", SymptomFinder)
-app.add_node("Human Reviewer", HumanReviewer)
-app.add_node("Symptom Checker", SymptomChecker)
-app.add_node("Report Generator", ReportGenerator)
-
-app.add_edge(START, "Input Processor")
-app.add_conditional_edges(
+# Each branch is one subgraph, so it runs as a single task of the parent
+# step: the image branch does not wait for a slow knowledge loop step by
+# step, and the two meet only at "Symptom Checker".
+ClinicalRecordAgent = StateGraph(ClinicalRecordState)
+ClinicalRecordAgent.add_node("Input Processor", InputProcessor)
+ClinicalRecordAgent.add_node("Medical Knowledge Agent",
+                             MedicalKnowledgeRetriever)
+
+ClinicalRecordAgent.add_edge(START, "Input Processor")
+ClinicalRecordAgent.add_conditional_edges(
     "Input Processor", MedicalAgentDiagnosisRouter, {
         "Need Medical Knowledge": "Medical Knowledge Agent",
-        "No Need": "Image Classifier"
-    })
-app.add_edge("Image Classifier", "Symptom Finder")
-app.add_conditional_edges(
-    "Symptom Finder", MedicalAgentVerdictRouter, {
-        "Need Clinical Records": "Medical Knowledge Agent",
-        "No Need": "Symptom Checker"
+        "No Need": END
     })
-app.add_conditional_edges("Medical Knowledge Agent",
-                          KnowledgeAgentOutputRouter, {
-                              "Medical Knowledge": "Image Classifier",
-                              "Clinical Records": "Symptom Checker"
-                          })
-app.add_edge("Symptom Checker", "Human Reviewer")
-app.add_edge("Human Reviewer", "Report Generator")
-app.add_edge("Report Generator", END)
-
-app = app.compile()
-print(app.get_graph(xray=True).draw_mermaid())
+ClinicalRecordAgent.add_edge("Medical Knowledge Agent", END)
+
+ClinicalRecordAgent = ClinicalRecordAgent.compile()
+
+MedicalImageAgent = StateGraph(MedicalImageState)
+MedicalImageAgent.add_node("Image Preprocessor", ImagePreprocessor)
+MedicalImageAgent.add_node("Image Classifier", ImageClassifier)
+MedicalImageAgent.add_node("Symptom Finder", SymptomFinder)
+
+MedicalImageAgent.add_edge(START, "Image Preprocessor")
+MedicalImageAgent.add_edge("Image Preprocessor", "Image Classifier")
+MedicalImageAgent.add_edge("Image Classifier", "Symptom Finder")
+MedicalImageAgent.add_edge("Symptom Finder", END)
+
+MedicalImageAgent = MedicalImageAgent.compile()
+
+######################################################################
+########################### Medical Agent ############################
+######################################################################
+
+MedicalAgent = StateGraph(MedicalAgentState,
+                          input_schema=MedicalAgentInputState,
+                          output_schema=MedicalOutputInputState)
+MedicalAgent.add_node("Clinical Record Agent", ClinicalRecordAgent)
+MedicalAgent.add_node("Medical Image Agent", MedicalImageAgent)
+MedicalAgent.add_node("Human Reviewer", HumanReviewer)
+MedicalAgent.add_node("Symptom Checker", SymptomChecker)
+MedicalAgent.add_node("Report Generator", ReportGenerator)
+
+MedicalAgent.add_edge(START, "Clinical Record Agent")
+MedicalAgent.add_edge(START, "Medical Image Agent")
+MedicalAgent.add_edge(["Clinical Record Agent", "Medical Image Agent"],
+                      "Symptom Checker")
+MedicalAgent.add_edge("Symptom Checker", "Human Reviewer")
+MedicalAgent.add_edge("Human Reviewer", "Report Generator")
+MedicalAgent.add_edge("Report Generator", END)
+
+
+def build_app(checkpointer: Optional[BaseCheckpointSaver] = None):
+    """Compile the medical agent, persisting every step to `checkpointer`
+    (see `agent.utils.checkpoint.open_checkpointer`).
+
+    "Human Reviewer" parks runs only if `HUMAN_REVIEW` is true, which is
+    the default with a checkpointer. Without one, runs cannot be parked or
+    resumed, so review defaults to off.
+    """
+    review = os.getenv("HUMAN_REVIEW", "true" if checkpointer else "false")
+    return MedicalAgent.compile(checkpointer=checkpointer).with_config(
+        configurable={"human_review": review.lower() not in ("0", "false")})
+
+
+app = build_app()
+
+
+def _output(values: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        key: values[key]
+        for key in MedicalOutputInputState.__annotations__ if key in values
+    }
+
+
+async def run_case(graph, case: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a case on its own thread, resuming from the last checkpoint.
+
+    A finished case returns its stored output without calling any model.
+    A case parked at "Human Reviewer" returns its state with the pending
+    review under `__interrupt__`; continue it with `resume_case`.
+    """
+    config = case_config(case)
+    thread_id = config["configurable"]["thread_id"]
+    with trace_run("case", case_id=thread_id):
+        snapshot = await graph.aget_state(config)
+        if not snapshot.values:
+            return await graph.ainvoke(case, config)
+        if not snapshot.next:
+            return _output(snapshot.values)
+        if snapshot.interrupts:
+            output = _output(snapshot.values)
+            output["__interrupt__"] = snapshot.interrupts
+            return output
+        logger.info(f"Resuming case {thread_id} at {', '.join(snapshot.next)}")
+        return await graph.ainvoke(None, config)
+
+
+async def resume_case(graph, case: Dict[str, Any],
+                      review: Any) -> Dict[str, Any]:
+    """Answer the pending review of a parked case and finish the run."""
+    config = case_config(case)
+    with trace_run("case", case_id=config["configurable"]["thread_id"]):
+        return await graph.ainvoke(Command(resume=review), config)
+
+
+if __name__ == "__main__":
+    print(app.get_graph(xray=True).draw_mermaid())
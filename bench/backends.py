@@ -0,0 +1,163 @@
+"""Check that the local vector store returns what Qdrant returns.
+
+    python -m bench.backends --n 5000 --dims 256
+    python -m bench.backends --qdrant-url http://localhost:6333 --ivf 64
+
+Runs the same create / upsert / overwrite / filtered batch search / delete
+sequence against `QdrantStore` (in-process Qdrant by default, which is
+exact) and `LocalStore`, compares ids and scores query by query, and then
+reports IVF recall@k and latency against the exact local search.
+"""
+import time
+import uuid
+import asyncio
+import argparse
+import tempfile
+import statistics
+import numpy as np
+from typing import Dict, List
+from qdrant_client import AsyncQdrantClient
+from agent.utils.lrag import LocalStore
+from agent.utils.store import QdrantStore, VectorStore
+
+COLLECTION = "bench_backends"
+
+
+def point_id(index: int) -> str:
+    return uuid.UUID(int=index + 1).hex
+
+
+def canonical(results: List[Dict]) -> List[str]:
+    return [uuid.UUID(result["id"]).hex for result in results]
+
+
+def payload(index: int, n_files: int) -> Dict:
+    return {
+        "content": f"chunk {index}",
+        "metadata": {
+            "file_stem": f"file_{index % n_files}"
+        },
+    }
+
+
+async def run_suite(store: VectorStore, corpus: np.ndarray,
+                    queries: np.ndarray, args) -> List[List[List[str]]]:
+    n = len(corpus)
+    stems = [None] + [f"file_{i}" for i in range(args.files)] + ["missing"]
+    await store.delete_collection(COLLECTION)
+    await store.create_collection(COLLECTION, corpus.shape[1],
+                                  ["metadata.file_stem"])
+    for i in range(0, n, 512):
+        indexes = range(i, min(i + 512, n))
+        await store.upsert(COLLECTION, [point_id(j) for j in indexes],
+                           corpus[i:i + 512].tolist(),
+                           [payload(j, args.files) for j in indexes])
+    # Overwrite a slice with new vectors, then delete another.
+    rng = np.random.default_rng(1)
+    overwrite = np.arange(0, n, 7)
+    await store.upsert(
+        COLLECTION, [point_id(j) for j in overwrite],
+        rng.standard_normal((len(overwrite), corpus.shape[1])).tolist(),
+        [payload(j, args.files) for j in overwrite])
+    await store.delete(COLLECTION, [point_id(j) for j in range(0, n, 11)])
+
+    runs = []
+    for query in queries:
+        batch = await store.search_batch(COLLECTION, query.tolist(), args.k,
+                                         stems)
+        runs.append(batch)
+    return runs
+
+
+def compare(expected, actual, tolerance: float) -> int:
+    mismatches = 0
+    for query_index, (want, got) in enumerate(zip(expected, actual)):
+        for stem_index, (a, b) in enumerate(zip(want, got)):
+            scores_a = np.array([r["score"] for r in a])
+            scores_b = np.array([r["score"] for r in b])
+            same = (canonical(a) == canonical(b) and len(a) == len(b)
+                    and np.allclose(scores_a, scores_b, atol=tolerance))
+            if not same:
+                mismatches += 1
+                if mismatches <= 5:
+                    print(f"query {query_index} filter {stem_index}: "
+                          f"{canonical(a)[:3]} vs {canonical(b)[:3]}")
+    return mismatches
+
+
+async def ivf_report(corpus: np.ndarray, queries: np.ndarray, args, path: str):
+    exact = LocalStore(path=path, ivf_lists=0)
+    ivf = LocalStore(path=path,
+                     ivf_lists=args.ivf,
+                     ivf_probes=args.probes,
+                     ivf_min_points=0)
+    for name, store in (("exact", exact), ("ivf", ivf)):
+        latencies, results = [], []
+        for query in queries:
+            start = time.perf_counter()
+            results.append(await store.search(COLLECTION, query.tolist(),
+                                              args.k))
+            latencies.append(time.perf_counter() - start)
+        if name == "exact":
+            truth = [set(canonical(r)) for r in results]
+        recall = statistics.mean(
+            len(set(canonical(r)) & t) / max(len(t), 1)
+            for r, t in zip(results, truth))
+        latencies.sort()
+        # The first IVF query trains the lists; report steady-state latency.
+        print(f"{name:<6} recall@{args.k} {recall:.3f}  "
+              f"p50 {statistics.median(latencies[1:]) * 1000:7.2f}ms  "
+              f"max {latencies[-1] * 1000:7.2f}ms")
+        await store.close()
+
+
+async def main(args):
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((32, args.dims))
+    corpus = centers[rng.integers(0, 32, args.n)] + rng.standard_normal(
+        (args.n, args.dims))
+    queries = corpus[rng.integers(0, args.n,
+                                  args.queries)] + rng.standard_normal(
+                                      (args.queries, args.dims))
+
+    client = (AsyncQdrantClient(url=args.qdrant_url)
+              if args.qdrant_url else AsyncQdrantClient(":memory:"))
+    qdrant = QdrantStore({}, client=client)
+    with tempfile.TemporaryDirectory() as path:
+        local = LocalStore(path=path, ivf_lists=0)
+        timings = {}
+        results = {}
+        for name, store in (("qdrant", qdrant), ("local", local)):
+            start = time.perf_counter()
+            results[name] = await run_suite(store, corpus, queries, args)
+            timings[name] = time.perf_counter() - start
+        mismatches = compare(results["qdrant"], results["local"],
+                             args.tolerance)
+        total = args.queries * (args.files + 2)
+        print(f"parity: {total - mismatches}/{total} searches match  "
+              f"(qdrant {timings['qdrant']:.2f}s, "
+              f"local {timings['local']:.2f}s)")
+        await local.close()
+        await qdrant.delete_collection(COLLECTION)
+        await qdrant.close()
+        if args.ivf:
+            await ivf_report(corpus, queries, args, path)
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=5000)
+    parser.add_argument("--dims", type=int, default=256)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--tolerance", type=float, default=1e-4)
+    parser.add_argument("--ivf",
+                        type=int,
+                        default=0,
+                        help="also report recall of N IVF lists")
+    parser.add_argument("--probes", type=int, default=8)
+    parser.add_argument("--qdrant-url")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,104 @@
+"""Latency, cost and escalation rate of the model cascade per threshold.
+
+    python -m bench.cascade --cases 20 --thresholds 0.3 0.6 0.9
+
+Runs the graph against the mock model server with `CASCADE=false` (every
+cascaded step on the large model) and then with the cascade on at each
+threshold, applied to every cascaded node. The mock serves the small
+models faster than the large ones and answers their structured requests
+with a confidence that varies by input, so the escalation rate follows
+the threshold.
+Cost is per case, over all model calls, at the `PRICES` below; compare the
+rates with the accuracy you measure on real cases before picking
+thresholds.
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+from typing import Dict, List
+from bench.mock_server import start_mock_server
+from bench.workflow import make_cases
+
+# Per million tokens (input, output), roughly SiliconFlow list prices.
+PRICES = {"SLM": "0.5,2", "SVLM": "0.5,2", "LLM": "2.5,10", "VLM": "2.5,10"}
+
+
+async def run(name: str, cases: List[Dict[str, str]]):
+    from agent.node import CASCADES
+    from agent.workflow import app
+    from agent.utils.tracing import trace_run
+
+    latencies, costs, steps, escalated = [], [], 0, 0
+    for case in cases:
+        start = time.perf_counter()
+        with trace_run("case") as root:
+            result = await app.ainvoke(case)
+        latencies.append(time.perf_counter() - start)
+        costs.append(root.attributes["cost"])
+        for entry in result.get("cascade_trace", []):
+            steps += 1
+            escalated += entry["escalated"]
+    rate = f"{escalated / steps:6.0%}" if steps else "     -"
+    print(f"{name:<16} p50 "
+          f"{statistics.median(latencies) * 1000:8.1f}ms  "
+          f"escalated {rate} of {len(CASCADES)} steps  "
+          f"cost {statistics.mean(costs) * 1000:8.4f} per 1k cases")
+
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ.update({
+            "API_KEY": os.getenv("API_KEY", "mock"),
+            "RAG": "lrag",
+            "LOCAL_RAG_DIR": str(Path(directory) / "lrag"),
+            "CACHE_DIR": directory,
+            "TRACE_FILE": str(Path(directory) / "traces.jsonl"),
+            "LLM_CACHE": "false",
+            "EMBEDDING_CACHE": "false",
+            "HUMAN_REVIEW": "false",
+        })
+        os.environ.update({
+            f"{name}_PRICE": price
+            for name, price in PRICES.items()
+        })
+        from agent.utils.tools import DEFAULT_MODELS
+
+        large = {
+            os.getenv(f"{name}_MODEL", DEFAULT_MODELS[name]):
+            args.large_latency_ms
+            for name in ("LLM", "VLM")
+        }
+        server, base_url = start_mock_server(latency_ms=args.small_latency_ms,
+                                             per_item_ms=args.per_token_ms,
+                                             model_latency_ms=large)
+        os.environ.update({"MODEL_URL": base_url, "BASE_URL": base_url})
+        from agent.node import CASCADES, cascade_threshold_variable
+        from agent.utils.nrag import get_rag
+
+        await get_rag().ensure_collections()
+        cases = make_cases(Path(directory), args.cases)
+        os.environ["CASCADE"] = "false"
+        await run("large only", cases)
+        os.environ["CASCADE"] = "true"
+        for threshold in args.thresholds:
+            for node in CASCADES:
+                os.environ[cascade_threshold_variable(node)] = str(threshold)
+            await run(f"threshold {threshold:.2f}", cases)
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", type=int, default=20)
+    parser.add_argument("--thresholds",
+                        type=float,
+                        nargs="+",
+                        default=[0.3, 0.6, 0.9])
+    parser.add_argument("--small-latency-ms", type=float, default=100)
+    parser.add_argument("--large-latency-ms", type=float, default=400)
+    parser.add_argument("--per-token-ms", type=float, default=2)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,98 @@
+"""Tokens saved and time spent packing retrieved context.
+
+    python -m bench.context --queries 50 --budget 6000
+
+Chunks synthetic guidelines with `RecursiveChunker`, one of them a lightly
+edited copy of another, and builds retrieval results the way `retrieve`
+does: runs of consecutive, overlapping chunks from several documents in
+one ranked list. Compares the plain concatenation that reached the
+prompt before with `pack_context`. Uses the tokenizer configured by
+`TOKENIZER`.
+"""
+import time
+import random
+import argparse
+import statistics
+from typing import Dict, List
+
+TERMS = ("fever", "cough", "dyspnea", "opacity", "effusion", "nodule",
+         "metformin", "insulin", "eGFR", "HbA1c", "troponin", "CRP", "lobe",
+         "ventricle", "stenosis", "infarction", "antibiotic", "dose", "mg",
+         "daily", "contraindicated", "recommended", "first-line", "screening",
+         "follow-up", "imaging", "biopsy", "patients", "adults", "children")
+
+
+def make_guideline(rng: random.Random, paragraphs: int) -> str:
+    return "\n\n".join(" ".join(" ".join(
+        rng.choice(TERMS) if rng.random() < 0.7 else str(rng.randint(1, 500))
+        for _ in range(rng.randint(8, 20))) + "."
+                                for _ in range(rng.randint(3, 6)))
+                       for _ in range(paragraphs))
+
+
+def make_results(files: Dict[str, List[str]], rng: random.Random,
+                 runs: int) -> List[Dict]:
+    results = []
+    for file_stem, chunks in files.items():
+        for _ in range(runs):
+            start = rng.randrange(len(chunks))
+            for index in range(start,
+                               min(start + rng.randint(1, 3), len(chunks))):
+                results.append({
+                    "id": f"{file_stem}-{index}",
+                    "content": chunks[index],
+                    "metadata": {
+                        "file_stem": file_stem
+                    },
+                    "score": rng.random(),
+                })
+    unique = {result["id"]: result for result in results}
+    return sorted(unique.values(),
+                  key=lambda result: result["score"],
+                  reverse=True)
+
+
+def main(args):
+    from agent.utils.chunker import RecursiveChunker
+    from agent.utils.context import pack_context
+
+    chunker = RecursiveChunker()
+    rng = random.Random(0)
+    files = {
+        f"guideline_{index}":
+        chunker.split_text(make_guideline(rng, args.paragraphs))
+        for index in range(args.documents)
+    }
+    # A later edition of the first guideline with a few words changed.
+    files["guideline_0_rev"] = [
+        chunk.replace("fever", "high fever", 1)
+        for chunk in files["guideline_0"]
+    ]
+    totals: Dict[str, List[float]] = {}
+    for _ in range(args.queries):
+        results = make_results(files, rng, args.runs)
+        start = time.perf_counter()
+        _, stats = pack_context(results, args.budget)
+        stats["ms"] = (time.perf_counter() - start) * 1000
+        stats["chunks"] = len(results)
+        for key, value in stats.items():
+            totals.setdefault(key, []).append(value)
+    saved = sum(totals["saved_tokens"]) / sum(totals["input_tokens"])
+    print(f"{args.queries} queries, "
+          f"{statistics.mean(totals['chunks']):.1f} chunks each, "
+          f"budget {args.budget}")
+    for key in ("input_tokens", "context_tokens", "saved_tokens", "duplicates",
+                "merged", "over_budget", "ms"):
+        print(f"{key:<16} mean {statistics.mean(totals[key]):9.1f}  "
+              f"max {max(totals[key]):9.1f}")
+    print(f"saved {saved:.0%} of context tokens")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--documents", type=int, default=4)
+    parser.add_argument("--paragraphs", type=int, default=120)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--budget", type=int, default=6000)
+    main(parser.parse_args())
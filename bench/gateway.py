@@ -0,0 +1,96 @@
+"""Load-test chat calls against a throttling mock provider.
+
+    python -m bench.gateway --requests 200 --provider-rpm 300
+
+Fires `--requests` concurrent chat completions at the local mock server,
+which answers 429 with `Retry-After` once over `--provider-rpm`. Compares
+the SDK's own client (built-in retries, no client-side limits) with the
+model gateway pacing requests at `--gateway-rpm` (default 90% of the
+provider's, leaving room for the gateway's burst) under a concurrency cap,
+and reports throughput, provider 429s, failures and p50/p95 latency.
+"""
+import os
+import time
+import asyncio
+import argparse
+import statistics
+from typing import List, Optional
+from pydantic import SecretStr
+from langchain_openai import ChatOpenAI
+from agent.utils.gateway import ModelGateway
+from bench.mock_server import start_mock_server
+
+MODEL = "mock-chat"
+
+
+def build_model(base_url: str,
+                gateway: Optional[ModelGateway] = None) -> ChatOpenAI:
+    options = {}
+    if gateway is not None:
+        gateway.register("LLM", MODEL)
+        options = dict(http_client=gateway.sync_client,
+                       http_async_client=gateway.async_client,
+                       max_retries=0)
+    return ChatOpenAI(model=MODEL,
+                      base_url=base_url,
+                      api_key=SecretStr("mock"),
+                      max_completion_tokens=64,
+                      **options)
+
+
+async def run(name: str, model: ChatOpenAI, server, requests: int):
+    stats = server.RequestHandlerClass.stats
+    before = dict(stats)
+    latencies: List[float] = []
+    failures = 0
+
+    async def call(index: int):
+        nonlocal failures
+        begin = time.perf_counter()
+        try:
+            await model.ainvoke(f"Summarise case {index}: fever and cough.")
+        except Exception:
+            failures += 1
+        else:
+            latencies.append(time.perf_counter() - begin)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(call(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    p50 = statistics.median(latencies) if latencies else float("nan")
+    p95 = latencies[int(0.95 * (len(latencies) - 1))] if latencies else p50
+    print(f"{name:<10} ok {len(latencies):4d}  failed {failures:4d}  "
+          f"429s {stats['throttled'] - before['throttled']:5d}  "
+          f"sent {stats['requests'] - before['requests']:5d}  "
+          f"{len(latencies) / elapsed:6.1f} req/s  "
+          f"p50 {p50 * 1000:8.1f}ms  p95 {p95 * 1000:8.1f}ms")
+
+
+async def main(args):
+    server, base_url = start_mock_server(latency_ms=args.latency_ms,
+                                         per_item_ms=1,
+                                         rpm=args.provider_rpm)
+    await run("sdk", build_model(base_url), server, args.requests)
+    # Let the provider's window drain so both runs start from the same state.
+    await asyncio.sleep(60 if args.provider_rpm else 0)
+
+    os.environ["LLM_RPM"] = str(args.gateway_rpm or 0.9 * args.provider_rpm)
+    os.environ["LLM_CONCURRENCY"] = str(args.concurrency)
+    gateway = ModelGateway()
+    await run("gateway", build_model(base_url, gateway), server, args.requests)
+    print(gateway.stats())
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--provider-rpm", type=int, default=300)
+    parser.add_argument("--gateway-rpm",
+                        type=int,
+                        default=0,
+                        help="defaults to 90%% of the provider rpm")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    asyncio.run(main(parser.parse_args()))
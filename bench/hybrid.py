@@ -0,0 +1,113 @@
+"""Compare dense-only and hybrid (dense + BM25, RRF) retrieval offline.
+
+    python -m bench.hybrid
+    python -m bench.hybrid --corpus corpus.jsonl --queries queries.jsonl --k 1 3 5 10
+
+The corpus is JSONL with `id`, `file_stem` and `content`; queries are JSONL
+with `query` and `relevant` (corpus ids). Both modes index the same points
+into an in-process Qdrant, so only model calls leave the machine: dense
+vectors come from the configured embedding model and are served from the
+embedding cache on later runs. The default fixture stresses exact clinical
+terms (drug names, ICD-10 codes, lab abbreviations).
+"""
+import json
+import time
+import asyncio
+import argparse
+import statistics
+from pathlib import Path
+from typing import Dict, List
+from qdrant_client import AsyncQdrantClient
+from agent.utils.nrag import AsyncQdrantRAG
+from agent.utils.store import QdrantStore
+
+FIXTURES = Path(__file__).parent / "fixtures"
+COLLECTION = "bench_hybrid"
+
+
+def read_jsonl(path: str) -> List[Dict]:
+    with open(path, encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+async def evaluate(hybrid: bool, corpus: List[Dict], queries: List[Dict],
+                   ks: List[int], client: AsyncQdrantClient) -> Dict:
+    rag_client = AsyncQdrantRAG(store=QdrantStore({},
+                                                  client=client,
+                                                  hybrid=hybrid),
+                                hybrid=hybrid)
+    await rag_client.store.delete_collection(COLLECTION)
+    await rag_client.create_collection(COLLECTION)
+    await rag_client.add_documents([{
+        "content": document["content"],
+        "metadata": {
+            "file_stem": document["file_stem"],
+            "doc_id": document["id"]
+        },
+    } for document in corpus], COLLECTION)
+
+    limit = max(ks)
+    recalls = {k: [] for k in ks}
+    reciprocal_ranks, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        query_vector, sparse_vector = await rag_client.encode_query(
+            query["query"])
+        results = await rag_client.search_by_vector(
+            COLLECTION, query_vector, limit, sparse_vector=sparse_vector)
+        latencies.append(time.perf_counter() - start)
+
+        ranked = [result["metadata"]["doc_id"] for result in results]
+        relevant = set(query["relevant"])
+        for k in ks:
+            recalls[k].append(len(relevant & set(ranked[:k])) / len(relevant))
+        rank = next(
+            (i + 1 for i, doc_id in enumerate(ranked) if doc_id in relevant),
+            None)
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+    await rag_client.store.delete_collection(COLLECTION)
+    latencies.sort()
+    return {
+        "recall": {
+            k: statistics.mean(values)
+            for k, values in recalls.items()
+        },
+        "mrr": statistics.mean(reciprocal_ranks),
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(0.95 * (len(latencies) - 1))],
+    }
+
+
+async def main(args):
+    corpus = read_jsonl(args.corpus)
+    queries = read_jsonl(args.queries)
+    client = AsyncQdrantClient(":memory:")
+    reports = {}
+    for name, hybrid in (("dense", False), ("hybrid", True)):
+        reports[name] = report = await evaluate(hybrid, corpus, queries,
+                                                args.k, client)
+        recall = "  ".join(f"R@{k} {value:.3f}"
+                           for k, value in report["recall"].items())
+        print(f"{name:<7} {recall}  MRR {report['mrr']:.3f}  "
+              f"p50 {report['p50'] * 1000:6.2f}ms  "
+              f"p95 {report['p95'] * 1000:6.2f}ms")
+    await client.close()
+
+    # Smallest candidate count at which hybrid matches dense recall at the
+    # largest k, i.e. how many fewer documents need to go to the reranker.
+    target = reports["dense"]["recall"][max(args.k)]
+    for k, value in reports["hybrid"]["recall"].items():
+        if value >= target:
+            print(f"hybrid reaches dense R@{max(args.k)} ({target:.3f}) "
+                  f"with {k} candidates")
+            break
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus",
+                        default=str(FIXTURES / "clinical_corpus.jsonl"))
+    parser.add_argument("--queries",
+                        default=str(FIXTURES / "clinical_queries.jsonl"))
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10])
+    asyncio.run(main(parser.parse_args()))
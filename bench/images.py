@@ -0,0 +1,103 @@
+"""Payload size and encode time of model images per agent profile.
+
+    python -m bench.images
+    python -m bench.images --images scan.png xray.png --repeat 5
+
+Compares sending the file as-is (`image_to_base64(path)`, what the VLM
+received before) and a lossless PNG re-encode (`image_to_base64(image)`,
+what rasterized PDF pages went through) with `encode_image` for the VLM
+and OCR profiles, cold and served from the image cache. Without
+`--images`, synthetic inputs stand in for an exported X-ray, a camera
+photo and a 300-dpi scanned record.
+"""
+import os
+import time
+import argparse
+import tempfile
+import statistics
+import numpy as np
+from pathlib import Path
+from typing import Callable, List
+
+
+def make_images(directory: Path) -> List[Path]:
+    from PIL import Image, ImageDraw
+
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:3000, 0:3000]
+    body = np.exp(-((x - 1500)**2 + (y - 1600)**2) / (2 * 900.0**2))
+    ribs = 0.15 * (np.sin(y / 40.0) > 0.6) * body
+    xray = 65535 * np.clip(body + ribs + rng.normal(0, 0.02, body.shape), 0, 1)
+    xray_path = directory / "xray_16bit.png"
+    Image.fromarray(xray.astype(np.uint16)).save(xray_path)
+
+    photo = np.stack([
+        np.clip(
+            np.linspace(40, 220, 4000)[None, :] +
+            rng.normal(0, 6, (3000, 4000)) + offset, 0, 255)
+        for offset in (0, 20, -20)
+    ],
+                     axis=-1).astype(np.uint8)
+    photo_path = directory / "photo.jpg"
+    Image.fromarray(photo).save(photo_path, quality=95)
+
+    scan = Image.new("L", (2480, 3508), 255)
+    draw = ImageDraw.Draw(scan)
+    for line in range(90):
+        draw.text((180, 200 + line * 34),
+                  f"{line:02d} Patient presents with fever, cough and "
+                  f"dyspnea; CRP 48 mg/L, WBC 12.1 x10^9/L, SpO2 93%.",
+                  fill=0)
+    scan_path = directory / "scan_300dpi.png"
+    scan.save(scan_path)
+    return [xray_path, photo_path, scan_path]
+
+
+def measure(function: Callable[[], str], repeat: int):
+    timings, payload = [], ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        payload = function()
+        timings.append(time.perf_counter() - start)
+    return len(payload), statistics.median(timings)
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["CACHE_DIR"] = directory
+        from PIL import Image
+        from agent.utils.tools import image_to_base64
+        from agent.utils.image import encode_image
+
+        paths = ([Path(path) for path in args.images]
+                 if args.images else make_images(Path(directory)))
+        for path in paths:
+            with Image.open(path) as image:
+                print(f"\n{path.name}: {image.size[0]}x{image.size[1]} "
+                      f"{image.mode}, {path.stat().st_size / 1024:.0f} KB")
+            os.environ["IMAGE_CACHE"] = "false"
+            rows = [
+                ("raw file", lambda: image_to_base64(str(path))),
+                ("lossless PNG", lambda: image_to_base64(Image.open(path))),
+                ("VLM profile", lambda: encode_image(path, "VLM")),
+                ("OCR profile", lambda: encode_image(path, "OCR")),
+            ]
+            results = [(name, *measure(function, args.repeat))
+                       for name, function in rows]
+            os.environ["IMAGE_CACHE"] = "true"
+            for profile in ("VLM", "OCR"):
+                encode_image(path, profile)
+                results.append((f"{profile} profile, cached", *measure(
+                    lambda: encode_image(path, profile), args.repeat)))
+            baseline = results[0][1]
+            for name, size, seconds in results:
+                print(f"  {name:<22} {size / 1024:9.0f} KB base64 "
+                      f"({size / baseline:6.1%})  "
+                      f"{seconds * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", nargs="*")
+    parser.add_argument("--repeat", type=int, default=3)
+    main(parser.parse_args())
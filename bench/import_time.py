@@ -0,0 +1,42 @@
+"""Measure cold-start import time of the agent packages.
+
+    python -m bench.import_time --runs 5
+
+Each statement is timed in a fresh interpreter, so the numbers cover module
+loading and any import-time side effects but not interpreter start-up.
+"""
+import sys
+import argparse
+import statistics
+import subprocess
+
+STATEMENTS = [
+    "import agent.utils",
+    "from agent.utils import logger",
+    "from agent.utils import retrieve, rerank",
+    "import agent.workflow",
+]
+
+TIMER = ("import time; start = time.perf_counter(); {statement}; "
+         "print(time.perf_counter() - start)")
+
+
+def measure(statement: str, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c",
+             TIMER.format(statement=statement)],
+            capture_output=True,
+            text=True,
+            check=True).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    for statement in STATEMENTS:
+        print(f"{statement:<44} {measure(statement, args.runs) * 1000:9.1f}ms")
@@ -0,0 +1,102 @@
+"""Incremental indexing: cold, unchanged, one edit, an interrupted run.
+
+    python -m bench.indexer --documents 8 --paragraphs 60
+
+Indexes synthetic guidelines into the in-process store with summaries from
+the mock model server, each run with a fresh `IncrementalIndexer` as a new
+process would. Then two files are edited and the summarizer raises on the
+second, after the first was indexed but before its summary was written;
+the next run must summarize the first again instead of skipping it with
+its stale summary. Uses the tokenizer configured by
+`TOKENIZER`.
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+from typing import List
+from bench.chunker import make_corpus
+from bench.mock_server import start_mock_server
+
+
+class FailingSummarizer:
+    """Summarizer that raises on `file_stem`, like a crash mid-run."""
+
+    def __init__(self, summarizer, file_stem: str):
+        self.summarizer = summarizer
+        self.file_stem = file_stem
+
+    async def __call__(self, file_stem: str, chunks: List[str]) -> str:
+        if file_stem == self.file_stem:
+            raise RuntimeError(f"summarizer failed on {file_stem}")
+        return await self.summarizer(file_stem, chunks)
+
+
+async def run(name: str, summarizer, paths: List[str], manifest_path: Path):
+    from agent.utils.indexer import IncrementalIndexer
+
+    indexer = IncrementalIndexer(manifest_path=manifest_path,
+                                 summarizer=summarizer)
+    start = time.perf_counter()
+    try:
+        totals = await indexer.index_paths(paths)
+    except RuntimeError as e:
+        totals = {"error": str(e)}
+    print(f"{name:<16} {(time.perf_counter() - start) * 1000:8.1f}ms  "
+          f"{totals}")
+    return indexer
+
+
+async def main(args):
+    server, base_url = start_mock_server(latency_ms=args.latency_ms,
+                                         per_item_ms=args.per_token_ms)
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ.update({
+            "MODEL_URL": base_url,
+            "BASE_URL": base_url,
+            "API_KEY": os.getenv("API_KEY", "mock"),
+            "RAG": "lrag",
+            "LOCAL_RAG_DIR": str(Path(directory) / "lrag"),
+            "CACHE_DIR": directory,
+            "LLM_CACHE": "false",
+            "EMBEDDING_CACHE": "false",
+        })
+        from agent.utils.summarizer import MapReduceSummarizer
+
+        docs = Path(directory) / "docs"
+        docs.mkdir()
+        for document in make_corpus(args.documents, args.paragraphs):
+            path = docs / f"{document.metadata['file_stem']}.txt"
+            path.write_text(document.page_content, encoding="utf-8")
+        manifest_path = Path(directory) / "manifest.json"
+        summarizer = MapReduceSummarizer()
+        paths = [str(docs)]
+        await run("cold", summarizer, paths, manifest_path)
+        await run("unchanged", summarizer, paths, manifest_path)
+        edited = docs / "doc0.txt"
+        with open(edited, "a", encoding="utf-8") as file:
+            file.write("\n\nRevised: first-line therapy changed.\n")
+        indexer = await run("one edit", summarizer, paths, manifest_path)
+        summary_id = indexer.manifest["files"]["doc0"]["summary_id"]
+        for path in (edited, docs / "doc1.txt"):
+            with open(path, "a", encoding="utf-8") as file:
+                file.write("\n\nRevised again: dose lowered.\n")
+        await run("interrupted", FailingSummarizer(summarizer, "doc1"), paths,
+                  manifest_path)
+        indexer = await run("after crash", summarizer, paths, manifest_path)
+        entry = indexer.manifest["files"]["doc0"]
+        print(f"doc0 summary replaced after the crash: "
+              f"{entry['summary_id'] != summary_id}, pending: "
+              f"{entry.get('summary_pending', False)}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=8)
+    parser.add_argument("--paragraphs", type=int, default=60)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--per-token-ms", type=float, default=1)
+    asyncio.run(main(parser.parse_args()))
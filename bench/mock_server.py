@@ -0,0 +1,352 @@
+"""Local stand-in for the remote model endpoints, for offline benchmarks.
+
+    python -m bench.mock_server --port 8900 --latency-ms 50 --rpm 600
+
+Then point `BASE_URL` and `MODEL_URL` at http://127.0.0.1:8900/v1. Serves
+OpenAI-compatible `/chat/completions` (plain and SSE streaming) and
+`/embeddings`, plus `/rerank`. With `--rpm`, requests over the per-minute
+budget get a 429 with `Retry-After`, like a throttling provider. With
+`--image-token-ms`, chat requests also pay a prefill cost per 28x28 image
+patch, which is what makes larger image payloads slower on a real VLM.
+"""
+import io
+import re
+import json
+import base64
+import math
+import time
+import hashlib
+import argparse
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _tokens(text: str) -> set:
+    return set(re.findall(r"\w+", text.lower()))
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.05
+    per_item_latency = 0.001
+    image_token_latency = 0.0
+    completion_tokens = 32
+    dimensions = 4096
+    rpm = 0
+    model_latency: Dict[str, float] = {}
+    # Replaced per server by start_mock_server.
+    window: Deque[float] = deque()
+    stats: Dict[str, int] = {}
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _throttled(self) -> float:
+        """Seconds to wait if this request is over the rpm budget, else 0."""
+        with self.lock:
+            self.stats["requests"] = self.stats.get("requests", 0) + 1
+            if not self.rpm:
+                return 0.0
+            now = time.monotonic()
+            while self.window and self.window[0] <= now - 60:
+                self.window.popleft()
+            if len(self.window) >= self.rpm:
+                self.stats["throttled"] = self.stats.get("throttled", 0) + 1
+                return self.window[0] + 60 - now
+            self.window.append(now)
+            return 0.0
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        path = self.path.rstrip("/")
+        retry_after = self._throttled()
+        if retry_after:
+            data = b'{"error": "rate limited"}'
+            self.send_response(429)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Retry-After", f"{retry_after:.2f}")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        elif path.endswith("/rerank"):
+            self._send_json(200, self.rerank(payload))
+        elif path.endswith("/embeddings"):
+            self._send_json(200, self.embeddings(payload))
+        elif path.endswith("/chat/completions"):
+            if payload.get("stream"):
+                self.stream_chat(payload)
+            else:
+                self._send_json(200, self.chat(payload))
+        else:
+            self._send_json(404, {"error": f"unknown endpoint {self.path}"})
+
+    @staticmethod
+    def _prompt(payload: dict) -> str:
+        texts = []
+        for message in payload.get("messages", []):
+            content = message.get("content")
+            if isinstance(content, list):
+                content = " ".join(
+                    part.get("text", "") for part in content
+                    if isinstance(part, dict))
+            texts.append(content or "")
+        return "\n".join(texts)
+
+    def _image_tokens(self, payload: dict) -> int:
+        """Qwen-VL style count: one token per 28x28 patch of every image."""
+        from PIL import Image
+
+        tokens, size = 0, 0
+        for message in payload.get("messages", []):
+            content = message.get("content")
+            for part in content if isinstance(content, list) else []:
+                url = (part.get("image_url") or {}).get("url", "")
+                if url.startswith("data:"):
+                    data = base64.b64decode(url.split(",", 1)[1])
+                    width, height = Image.open(io.BytesIO(data)).size
+                    tokens += math.ceil(width * height / (28 * 28))
+                    size += len(url)
+        if tokens:
+            with self.lock:
+                for key, value in (("image_tokens", tokens), ("image_bytes",
+                                                              size)):
+                    self.stats[key] = self.stats.get(key, 0) + value
+        return tokens
+
+    def _answer(self, payload: dict) -> Tuple[list, dict, float]:
+        """Completion tokens, usage and prefill seconds for a request."""
+        prompt = self._prompt(payload)
+        image_tokens = self._image_tokens(payload)
+        words = (re.findall(r"\w+", prompt) or ["ok"])[-8:]
+        limit = payload.get("max_completion_tokens") or payload.get(
+            "max_tokens") or self.completion_tokens
+        tokens = [
+            words[i % len(words)]
+            for i in range(min(self.completion_tokens, limit))
+        ]
+        structured = bool(payload.get("response_format"))
+        if structured:
+            # Answer like a cascaded small model: fill the labelled lines
+            # the prompt asks for.
+            for label in dict.fromkeys(re.findall(r"`([A-Z]+):", prompt)):
+                if label != "BOXES":
+                    tokens += [f"\n{label}:", words[-1]]
+        if "`BOXES:" in prompt:
+            # One to three regions of a fifth of the image, placed by input.
+            messages = json.dumps(payload.get("messages"), sort_keys=True)
+            digest = hashlib.sha256(messages.encode("utf-8")).digest()
+            boxes = [
+                f"[{x * 3}, {y * 3}, {x * 3 + 200}, {y * 3 + 200}]"
+                for x, y in zip(digest[1:1 + digest[0] % 3 + 1], digest[4:])
+            ]
+            tokens += ["\nBOXES:", ", ".join(boxes)]
+        usage = {
+            "prompt_tokens": len(prompt) // 4 + 1 + image_tokens,
+            "completion_tokens": len(tokens),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + len(tokens)
+        if structured:
+            # JSON mode: the answer and a confidence that varies by input,
+            # sent as one piece.
+            messages = json.dumps(payload.get("messages"), sort_keys=True)
+            digest = hashlib.sha256(messages.encode("utf-8")).digest()
+            confidence = int.from_bytes(digest[:4], "big") / 2**32
+            tokens = [
+                json.dumps({
+                    "answer": " ".join(tokens),
+                    "confidence": round(confidence, 2)
+                })
+            ]
+        prefill = self.image_token_latency * image_tokens
+        return tokens, usage, prefill
+
+    def _chat_latency(self, payload: dict) -> float:
+        return self.model_latency.get(payload.get("model"), self.latency)
+
+    def chat(self, payload: dict) -> dict:
+        tokens, usage, prefill = self._answer(payload)
+        time.sleep(
+            self._chat_latency(payload) + prefill +
+            self.per_item_latency * usage["completion_tokens"])
+        return {
+            "id":
+            f"chatcmpl-{time.time_ns()}",
+            "object":
+            "chat.completion",
+            "created":
+            int(time.time()),
+            "model":
+            payload.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {
+                    "role": "assistant",
+                    "content": " ".join(tokens)
+                },
+                "finish_reason": "stop",
+            }],
+            "usage":
+            usage,
+        }
+
+    def stream_chat(self, payload: dict):
+        tokens, usage, prefill = self._answer(payload)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        base = {
+            "id": f"chatcmpl-{time.time_ns()}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": payload.get("model", "mock"),
+        }
+
+        def send(choices: list, **extra):
+            chunk = {**base, "choices": choices, **extra}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+
+        time.sleep(self._chat_latency(payload) + prefill)
+        for index, token in enumerate(tokens):
+            send([{
+                "index": 0,
+                "delta": {
+                    "role": "assistant",
+                    "content": token if index == 0 else f" {token}"
+                },
+                "finish_reason": None,
+            }])
+            time.sleep(self.per_item_latency)
+        send([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            send([], usage=usage)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def embeddings(self, payload: dict) -> dict:
+        inputs = payload.get("input", [])
+        inputs = [inputs] if isinstance(inputs, (str, int)) else inputs
+        dimensions = payload.get("dimensions") or self.dimensions
+        time.sleep(self.latency + self.per_item_latency * len(inputs))
+        data = []
+        for index, text in enumerate(inputs):
+            seed = hashlib.sha256(json.dumps(text).encode()).digest()
+            values = [((seed[i % 32] ^ (i * 131 % 251)) / 255.0) - 0.5
+                      for i in range(dimensions)]
+            norm = math.sqrt(sum(v * v for v in values)) or 1.0
+            data.append({
+                "object": "embedding",
+                "index": index,
+                "embedding": [round(v / norm, 6) for v in values],
+            })
+        tokens = sum(len(str(text)) // 4 + 1 for text in inputs)
+        return {
+            "object": "list",
+            "data": data,
+            "model": payload.get("model", "mock"),
+            "usage": {
+                "prompt_tokens": tokens,
+                "total_tokens": tokens
+            },
+        }
+
+    def rerank(self, payload: dict) -> dict:
+        documents = payload.get("documents", [])
+        time.sleep(self.latency + self.per_item_latency * len(documents))
+        query = _tokens(payload.get("query", ""))
+        results = []
+        for index, document in enumerate(documents):
+            words = _tokens(document)
+            overlap = len(query & words)
+            score = overlap / math.sqrt(max(len(query) * len(words), 1))
+            results.append({"index": index, "relevance_score": score})
+        results.sort(key=lambda result: result["relevance_score"],
+                     reverse=True)
+        top_n = payload.get("top_n") or len(results)
+        return {"results": results[:top_n]}
+
+
+def start_mock_server(
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_ms: float = 50,
+        per_item_ms: float = 1,
+        rpm: int = 0,
+        completion_tokens: int = 32,
+        dimensions: int = 4096,
+        model_latency_ms: Optional[Dict[str, float]] = None,
+        image_token_ms: float = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Serve the mock endpoints from a daemon thread, return the base URL.
+
+    `model_latency_ms` overrides the chat latency for the named models;
+    `image_token_ms` is the prefill time per image patch of a chat request.
+
+    Request and 429 counts, and the image tokens and bytes of chat
+    requests, are in `server.RequestHandlerClass.stats`.
+    """
+    handler = type(
+        "Handler", (MockHandler, ), {
+            "latency": latency_ms / 1000,
+            "per_item_latency": per_item_ms / 1000,
+            "image_token_latency": image_token_ms / 1000,
+            "rpm": rpm,
+            "completion_tokens": completion_tokens,
+            "dimensions": dimensions,
+            "model_latency": {
+                model: latency / 1000
+                for model, latency in (model_latency_ms or {}).items()
+            },
+            "window": deque(),
+            "stats": {
+                "requests": 0,
+                "throttled": 0,
+                "image_tokens": 0,
+                "image_bytes": 0
+            },
+            "lock": threading.Lock(),
+        })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock model endpoints")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--per-item-ms", type=float, default=1)
+    parser.add_argument("--rpm", type=int, default=0)
+    parser.add_argument("--completion-tokens", type=int, default=32)
+    parser.add_argument("--dimensions", type=int, default=4096)
+    parser.add_argument("--image-token-ms", type=float, default=0)
+    args = parser.parse_args()
+    server, base_url = start_mock_server(args.host,
+                                         args.port,
+                                         args.latency_ms,
+                                         args.per_item_ms,
+                                         args.rpm,
+                                         args.completion_tokens,
+                                         args.dimensions,
+                                         image_token_ms=args.image_token_ms)
+    print(f"Mock server listening on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,80 @@
+"""OCR stage latency: serial vs concurrent pages, cold vs cached.
+
+    python -m bench.ocr --pages 12 --scanned-ratio 1.0 --concurrency 1 4 8
+
+Runs `InputProcessor` on a synthetic PDF record against the mock model
+server, once per `--concurrency` with an empty OCR cache and then once
+more with the cache warm. Reports the time to the first page on the
+graph's `custom` stream, which is when a consumer can start on the text,
+and the time to the whole record, plus the OCR calls made.
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+from bench.mock_server import start_mock_server
+from bench.pdf import build_pdf
+
+
+async def run(name: str, graph, path: str, stats: dict):
+    requests = stats["requests"]
+    start = time.perf_counter()
+    first_page = None
+    async for mode, _ in graph.astream({"medical_recode_path": path},
+                                       stream_mode=["custom", "updates"]):
+        if mode == "custom" and first_page is None:
+            first_page = time.perf_counter() - start
+    elapsed = time.perf_counter() - start
+    first = f"{first_page * 1000:8.1f}ms" if first_page else "       -"
+    print(f"{name:<16} first page {first}  record "
+          f"{elapsed * 1000:8.1f}ms  OCR calls "
+          f"{stats['requests'] - requests}")
+
+
+async def main(args):
+    server, base_url = start_mock_server(latency_ms=args.latency_ms,
+                                         per_item_ms=args.per_token_ms)
+    stats = server.RequestHandlerClass.stats
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ.update({
+            "MODEL_URL": base_url,
+            "BASE_URL": base_url,
+            "API_KEY": os.getenv("API_KEY", "mock"),
+            "CACHE_DIR": directory,
+            "TRACE_FILE": str(Path(directory) / "traces.jsonl"),
+            "LLM_CACHE": "false",
+        })
+        from langgraph.graph import StateGraph, START, END
+        from agent.node import InputProcessor
+        from agent.state import InputProcessorState
+        from agent.utils.ocr import _ocr_cache
+
+        builder = StateGraph(InputProcessorState)
+        builder.add_node("Input Processor", InputProcessor)
+        builder.add_edge(START, "Input Processor")
+        builder.add_edge("Input Processor", END)
+        graph = builder.compile()
+
+        path = str(Path(directory) / "record.pdf")
+        build_pdf(path, args.pages, args.scanned_ratio)
+        for concurrency in args.concurrency:
+            os.environ["OCR_CONCURRENCY"] = str(concurrency)
+            _ocr_cache().clear()
+            await run(f"concurrency {concurrency}", graph, path, stats)
+        await run("cached", graph, path, stats)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=12)
+    parser.add_argument("--scanned-ratio", type=float, default=1.0)
+    parser.add_argument("--concurrency",
+                        type=int,
+                        nargs="+",
+                        default=[1, 4, 8])
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--per-token-ms", type=float, default=5)
+    asyncio.run(main(parser.parse_args()))
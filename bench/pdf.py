@@ -0,0 +1,99 @@
+"""Compare whole-document rasterization with the streaming PDF pipeline.
+
+    python -m bench.pdf --pages 60 --scanned-ratio 0.5
+
+Builds a synthetic PDF mixing text pages and image-only (scanned) pages,
+then runs each strategy in a fresh interpreter and reports wall time and
+peak resident memory (parent plus worker processes).
+"""
+import os
+import sys
+import time
+import random
+import resource
+import argparse
+import tempfile
+import subprocess
+
+
+def build_pdf(path: str, pages: int, scanned_ratio: float, seed: int = 0):
+    import pymupdf
+
+    rng = random.Random(seed)
+    document = pymupdf.open()
+    for page_number in range(pages):
+        page = document.new_page()
+        if rng.random() < scanned_ratio:
+            noise = pymupdf.Pixmap(pymupdf.csRGB,
+                                   pymupdf.IRect(0, 0, 600, 800), False)
+            noise.set_rect(noise.irect, (240, 240, 240))
+            for _ in range(200):
+                x, y = rng.randrange(580), rng.randrange(780)
+                noise.set_rect(pymupdf.IRect(x, y, x + 20, y + 6),
+                               (20, 20, 20))
+            page.insert_image(page.rect, pixmap=noise)
+        else:
+            page.insert_text((72, 72),
+                             f"Page {page_number}: clinical note " * 20,
+                             fontsize=9)
+    document.save(path)
+
+
+def run_legacy(path: str, dpi: int):
+    from agent.utils.tools import image_to_base64, pdf_to_image_list
+
+    return len(image_to_base64(pdf_to_image_list(path, dpi=dpi)))
+
+
+def run_streaming(path: str, dpi: int, max_in_flight: int):
+    from agent.utils.pdf import iter_pdf_pages
+
+    pages = 0
+    for page in iter_pdf_pages(path, dpi=dpi, max_in_flight=max_in_flight):
+        pages += 1
+    return pages
+
+
+def child(args):
+    start = time.perf_counter()
+    if args.mode == "legacy":
+        pages = run_legacy(args.pdf, args.dpi)
+    else:
+        pages = run_streaming(args.pdf, args.dpi, args.max_in_flight)
+    elapsed = time.perf_counter() - start
+    peak_kb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss +
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    print(f"{args.mode:<10} {pages:5d} pages  {elapsed:7.2f}s  "
+          f"peak RSS {peak_kb / 1024:8.1f} MB")
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "record.pdf")
+        build_pdf(path, args.pages, args.scanned_ratio)
+        for mode in ("legacy", "streaming"):
+            result = subprocess.run([
+                sys.executable, "-m", "bench.pdf", "--child", mode, "--pdf",
+                path, "--dpi",
+                str(args.dpi), "--max-in-flight",
+                str(args.max_in_flight)
+            ],
+                                    capture_output=True,
+                                    text=True)
+            if result.returncode != 0:
+                error = result.stderr.strip().splitlines()[-1:]
+                print(f"{mode:<10} failed: {' '.join(error)}")
+            else:
+                print(result.stdout.strip())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=60)
+    parser.add_argument("--scanned-ratio", type=float, default=0.5)
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    parser.add_argument("--child", dest="mode", default=None)
+    parser.add_argument("--pdf", default=None)
+    args = parser.parse_args()
+    child(args) if args.mode else main(args)
@@ -0,0 +1,142 @@
+"""Compare Qdrant collection profiles on recall@k and latency.
+
+    python -m bench.profiles --corpus corpus.jsonl --queries queries.jsonl
+    python -m bench.profiles --synthetic 20000 --profiles default scalar tiny
+
+`--corpus`/`--queries` are JSONL files with a `content`/`query` field and
+are embedded with the configured (cached) embedding model; use a held-out
+query set to choose a profile. `--synthetic` generates vectors whose
+variance decays over the dimensions, which only smoke-tests the harness.
+Ground truth is exact float32 cosine top-k over the full vectors.
+"""
+import json
+import time
+import asyncio
+import argparse
+import statistics
+import numpy as np
+from typing import List
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http import models
+from agent.utils.store import QdrantStore
+from agent.utils.nrag import AsyncQdrantRAG, COLLECTION_PROFILES
+
+BYTES_PER_DIM = {None: 4.0, "scalar": 1.0, "binary": 1 / 8}
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def synthetic(n: int, n_queries: int, dims: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    scale = 1 / np.sqrt(1 + np.arange(dims) / 64)
+    centers = rng.standard_normal((64, dims)) * scale
+    corpus = centers[rng.integers(0, 64, n)] + 0.5 * rng.standard_normal(
+        (n, dims)) * scale
+    queries = corpus[rng.integers(0, n,
+                                  n_queries)] + 0.3 * rng.standard_normal(
+                                      (n_queries, dims)) * scale
+    return normalize(corpus), normalize(queries)
+
+
+async def embedded(rag_client: AsyncQdrantRAG, corpus_path: str,
+                   queries_path: str):
+
+    def read(path: str, field: str) -> List[str]:
+        with open(path, encoding="utf-8") as file:
+            return [json.loads(line)[field] for line in file if line.strip()]
+
+    corpus = await rag_client.embedding_model.aembed_documents(
+        read(corpus_path, "content"))
+    queries = await rag_client.embedding_model.aembed_documents(
+        read(queries_path, "query"))
+    return normalize(np.asarray(corpus)), normalize(np.asarray(queries))
+
+
+async def evaluate(profile: str, corpus: np.ndarray, queries: np.ndarray,
+                   truth: np.ndarray, k: int, client: AsyncQdrantClient,
+                   keep: bool):
+    rag_client = AsyncQdrantRAG(profile=profile,
+                                store=QdrantStore(COLLECTION_PROFILES[profile],
+                                                  client=client))
+    rag_client.vector_size = corpus.shape[1]
+    rag_client.dimensions = min(
+        rag_client.profile.get("dimensions", corpus.shape[1]), corpus.shape[1])
+    collection_name = f"bench_profile_{profile}"
+    await client.delete_collection(collection_name)
+    await rag_client.create_collection(collection_name)
+
+    start = time.perf_counter()
+    for i in range(0, len(corpus), 512):
+        await client.upsert(
+            collection_name=collection_name,
+            points=[
+                models.PointStruct(id=index,
+                                   vector=rag_client.prepare_vector(
+                                       corpus[index].tolist()))
+                for index in range(i, min(i + 512, len(corpus)))
+            ])
+    ingest = time.perf_counter() - start
+
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        begin = time.perf_counter()
+        results = await rag_client.search_by_vector(collection_name,
+                                                    query.tolist(),
+                                                    limit=k)
+        latencies.append(time.perf_counter() - begin)
+        found = {int(result["id"]) for result in results}
+        recalls.append(len(found & set(expected.tolist())) / k)
+
+    settings = rag_client.profile
+    ram = len(corpus) * rag_client.dimensions * BYTES_PER_DIM[settings.get(
+        "quantization")]
+    if not settings.get("on_disk") and settings.get("quantization"):
+        ram += len(corpus) * rag_client.dimensions * 4
+    latencies.sort()
+    print(f"{profile:<10} dims {rag_client.dimensions:5d}  "
+          f"recall@{k} {statistics.mean(recalls):.3f}  "
+          f"p50 {statistics.median(latencies) * 1000:7.2f}ms  "
+          f"p95 {latencies[int(0.95 * (len(latencies) - 1))] * 1000:7.2f}ms  "
+          f"vectors in RAM {ram / 2**20:8.1f} MB  ingest {ingest:6.1f}s")
+    if not keep:
+        await client.delete_collection(collection_name)
+
+
+async def main(args):
+    if args.local:
+        client = AsyncQdrantClient(":memory:")
+    else:
+        client = QdrantStore({}).client
+    if args.synthetic:
+        corpus, queries = synthetic(args.synthetic, args.n_queries, args.dims)
+    else:
+        corpus, queries = await embedded(AsyncQdrantRAG(), args.corpus,
+                                         args.queries)
+    truth = np.argsort(-(queries @ corpus.T), axis=1)[:, :args.k]
+    for profile in args.profiles:
+        await evaluate(profile, corpus, queries, truth, args.k, client,
+                       args.keep)
+    await client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus")
+    parser.add_argument("--queries")
+    parser.add_argument("--synthetic", type=int, default=0)
+    parser.add_argument("--n-queries", type=int, default=200)
+    parser.add_argument("--dims", type=int, default=4096)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--profiles",
+                        nargs="+",
+                        default=list(COLLECTION_PROFILES))
+    parser.add_argument("--local",
+                        action="store_true",
+                        help="in-process Qdrant (ignores quantization)")
+    parser.add_argument("--keep", action="store_true")
+    args = parser.parse_args()
+    if not args.synthetic and not (args.corpus and args.queries):
+        parser.error("pass --corpus and --queries, or --synthetic N")
+    asyncio.run(main(args))
@@ -0,0 +1,96 @@
+"""Benchmark the rerank client against the local mock server.
+
+    python -m bench.rerank --queries 20 --candidates 64
+
+Compares one unpooled blocking request per query (the previous `rerank`)
+with `AsyncReranker` cold and warm (score cache populated).
+"""
+import os
+import time
+import random
+import asyncio
+import argparse
+import statistics
+import httpx
+from typing import Dict, List
+from agent.utils.reranker import AsyncReranker
+from bench.mock_server import start_mock_server
+
+WORDS = (
+    "fever cough dyspnea pneumonia effusion nodule opacity fracture "
+    "edema cardiomegaly atelectasis consolidation infiltrate mass "
+    "pneumothorax emphysema fibrosis hernia lesion calcification").split()
+
+
+def make_corpus(queries: int,
+                candidates: int,
+                seed: int = 0) -> List[Dict[str, List[str]]]:
+    rng = random.Random(seed)
+    pool = [" ".join(rng.choices(WORDS, k=40)) for _ in range(candidates * 2)]
+    return [{
+        "query": " ".join(rng.choices(WORDS, k=6)),
+        "documents": rng.sample(pool, candidates),
+    } for _ in range(queries)]
+
+
+def report(name: str, latencies: List[float], elapsed: float):
+    latencies = sorted(latencies)
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    print(f"{name:<24} total {elapsed:7.2f}s  "
+          f"{len(latencies) / elapsed:7.1f} q/s  "
+          f"p50 {statistics.median(latencies) * 1000:7.1f}ms  "
+          f"p95 {p95 * 1000:7.1f}ms")
+
+
+async def run_blocking(base_url: str, corpus: List[Dict]):
+    latencies = []
+    start = time.perf_counter()
+    for case in corpus:
+        begin = time.perf_counter()
+        httpx.post(f"{base_url}/rerank",
+                   json={
+                       "model": "mock",
+                       "query": case["query"],
+                       "documents": case["documents"],
+                       "top_n": 5,
+                   },
+                   timeout=60).raise_for_status()
+        latencies.append(time.perf_counter() - begin)
+    report("blocking, unpooled", latencies, time.perf_counter() - start)
+
+
+async def run_async(name: str, reranker: AsyncReranker, corpus: List[Dict]):
+    latencies = []
+
+    async def one(case: Dict):
+        begin = time.perf_counter()
+        await reranker.score(case["query"], case["documents"])
+        latencies.append(time.perf_counter() - begin)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(case) for case in corpus])
+    report(name, latencies, time.perf_counter() - start)
+
+
+async def main(args):
+    server, base_url = start_mock_server(latency_ms=args.latency_ms,
+                                         per_item_ms=args.per_item_ms)
+    corpus = make_corpus(args.queries, args.candidates)
+    await run_blocking(base_url, corpus)
+    os.environ["RERANK_CONCURRENCY"] = str(args.concurrency)
+    reranker = AsyncReranker(base_url=base_url, batch_size=args.batch_size)
+    await run_async("async, cold cache", reranker, corpus)
+    await run_async("async, warm cache", reranker, corpus)
+    print(f"score cache: {reranker.cache.stats()}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--candidates", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--per-item-ms", type=float, default=2)
+    asyncio.run(main(parser.parse_args()))
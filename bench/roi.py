@@ -0,0 +1,94 @@
+"""Payload bytes and latency of region-of-interest crops vs full images.
+
+    python -m bench.roi --cases 6 --size 3000 --image-token-ms 0.3
+
+Runs the image agent (preprocess, classify, find symptoms) against the
+mock model server on synthetic 16-bit X-rays, first with `VLM_ROI=false`,
+where both VLM passes read the full image at the VLM budget, then with
+ROI crops, where the classifier reads a coarse image and places boxes and
+the symptom finder reads native-resolution crops of them in one request.
+Each mode runs twice: cold, encoding every image and crop, and again with
+the image cache warm. The mock charges `--image-token-ms` of prefill per
+28x28 image patch, so latency follows what the VLM has to read.
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+import numpy as np
+from pathlib import Path
+from typing import List
+from bench.mock_server import start_mock_server
+
+
+def make_studies(directory: Path, count: int, size: int) -> List[Path]:
+    from PIL import Image
+
+    paths = []
+    y, x = np.mgrid[0:size, 0:size] / size
+    body = np.exp(-((x - 0.5)**2 + (y - 0.53)**2) / (2 * 0.3**2))
+    ribs = 0.15 * (np.sin(y * size / 40.0) > 0.6) * body
+    for index in range(count):
+        rng = np.random.default_rng(index)
+        noise = rng.normal(0, 0.02, body.shape)
+        pixels = 65535 * np.clip(body + ribs + noise, 0, 1)
+        path = directory / f"study_{index}.png"
+        Image.fromarray(pixels.astype(np.uint16)).save(path)
+        paths.append(path)
+    return paths
+
+
+async def run(name: str, paths: List[Path], stats: dict):
+    from agent.workflow import MedicalImageAgent
+
+    for attempt in ("cold", "cached"):
+        tokens, size = stats["image_tokens"], stats["image_bytes"]
+        latencies, regions = [], 0
+        for path in paths:
+            start = time.perf_counter()
+            result = await MedicalImageAgent.ainvoke(
+                {"medical_image_path": str(path)})
+            latencies.append(time.perf_counter() - start)
+            regions += len(result.get("bb") or [])
+        print(
+            f"{name:<11} {attempt:<7} p50 "
+            f"{statistics.median(latencies) * 1000:8.1f}ms  "
+            f"image payload "
+            f"{(stats['image_bytes'] - size) / len(paths) / 1024:7.1f}KiB  "
+            f"image tokens {(stats['image_tokens'] - tokens) / len(paths):6.0f}"
+            f"  regions {regions / len(paths):.1f} per case")
+
+
+async def main(args):
+    server, base_url = start_mock_server(latency_ms=args.latency_ms,
+                                         image_token_ms=args.image_token_ms)
+    stats = server.RequestHandlerClass.stats
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ.update({
+            "MODEL_URL": base_url,
+            "BASE_URL": base_url,
+            "API_KEY": os.getenv("API_KEY", "mock"),
+            "CACHE_DIR": directory,
+            "TRACE_FILE": str(Path(directory) / "traces.jsonl"),
+            "LLM_CACHE": "false",
+            "CASCADE": "false",
+            "VLM_MAX_IMAGES": str(args.max_images),
+        })
+        paths = make_studies(Path(directory), args.cases, args.size)
+        os.environ["VLM_ROI"] = "false"
+        await run("full image", paths, stats)
+        os.environ["VLM_ROI"] = "true"
+        await run("roi crops", paths, stats)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", type=int, default=6)
+    parser.add_argument("--size", type=int, default=3000)
+    parser.add_argument("--max-images", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--image-token-ms", type=float, default=0.3)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,128 @@
+"""Time to first token of the HTTP service under concurrent uploads.
+
+    python -m bench.serve --clients 32 --concurrency 8 --queue 16
+
+Starts `serve.py` in-process against the mock model server and posts
+`--clients` distinct cases at once, reading each server-sent event stream.
+Reports p50/p95 of the first progress event, the first report token
+(TTFT) and the complete report, which is what a client of a blocking
+endpoint would wait for, plus how many uploads were turned away with 503.
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+from typing import Dict, List, Optional
+from bench.mock_server import start_mock_server
+from bench.workflow import make_cases
+
+
+async def post_case(client, case: Dict[str,
+                                       str]) -> Dict[str, Optional[float]]:
+    result = {
+        "status": None,
+        "first_event": None,
+        "ttft": None,
+        "report": None
+    }
+    start = time.perf_counter()
+    with open(case["medical_image_path"], "rb") as image, \
+            open(case["medical_recode_path"], "rb") as record:
+        files = {"image": image, "record": record}
+        async with client.stream("POST", "/cases", files=files) as response:
+            result["status"] = response.status_code
+            async for line in response.aiter_lines():
+                if not line.startswith("event: "):
+                    continue
+                now = time.perf_counter() - start
+                event = line[len("event: "):]
+                if result["first_event"] is None:
+                    result["first_event"] = now
+                if event == "token" and result["ttft"] is None:
+                    result["ttft"] = now
+                if event in ("report", "review", "error"):
+                    result["report"] = now
+    return result
+
+
+def summary(name: str, values: List[float]) -> str:
+    if not values:
+        return f"{name:<14} -"
+    values = sorted(values)
+    p95 = values[int(0.95 * (len(values) - 1))]
+    return (f"{name:<14} p50 {statistics.median(values) * 1000:8.1f}ms  "
+            f"p95 {p95 * 1000:8.1f}ms")
+
+
+async def main(args):
+    import httpx
+    import uvicorn
+
+    server, base_url = start_mock_server(latency_ms=args.latency_ms,
+                                         per_item_ms=args.per_token_ms,
+                                         completion_tokens=args.tokens)
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ.update({
+            "MODEL_URL": base_url,
+            "BASE_URL": base_url,
+            "API_KEY": os.getenv("API_KEY", "mock"),
+            "RAG": "lrag",
+            "LOCAL_RAG_DIR": str(Path(directory) / "lrag"),
+            "CACHE_DIR": directory,
+            "LLM_CACHE": "false",
+            "EMBEDDING_CACHE": "false",
+            "HUMAN_REVIEW": "false",
+            "SERVE_CONCURRENCY": str(args.concurrency),
+            "SERVE_QUEUE": str(args.queue),
+        })
+        from serve import service
+        from agent.utils.nrag import get_rag
+
+        await get_rag().ensure_collections()
+        cases = make_cases(Path(directory), args.clients + 1)
+        config = uvicorn.Config(service,
+                                host="127.0.0.1",
+                                port=args.port,
+                                log_level="warning")
+        http = uvicorn.Server(config)
+        serving = asyncio.create_task(http.serve())
+        while not http.started:
+            await asyncio.sleep(0.05)
+
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}",
+                                     timeout=None) as client:
+            # Warm up imports and connection pools outside the measurement.
+            await post_case(client, cases[0])
+            start = time.perf_counter()
+            results = await asyncio.gather(*(post_case(client, case)
+                                             for case in cases[1:]))
+            elapsed = time.perf_counter() - start
+
+        served = [result for result in results if result["status"] == 200]
+        print(f"{len(results)} uploads in {elapsed:.1f}s: {len(served)} "
+              f"served, {len(results) - len(served)} turned away with 503 "
+              f"(concurrency {args.concurrency}, queue {args.queue})")
+        for name in ("first_event", "ttft", "report"):
+            print(
+                summary(name, [
+                    result[name]
+                    for result in served if result[name] is not None
+                ]))
+        http.should_exit = True
+        await serving
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--queue", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--per-token-ms", type=float, default=20)
+    parser.add_argument("--tokens", type=int, default=64)
+    parser.add_argument("--port", type=int, default=8765)
+    asyncio.run(main(parser.parse_args()))
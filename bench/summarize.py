@@ -0,0 +1,69 @@
+"""Map-reduce summarization of a long document: cold, cached, one edit.
+
+    python -m bench.summarize --paragraphs 400 --concurrency 1 8
+
+Chunks one synthetic guideline with `RecursiveChunker` and summarizes it
+with `MapReduceSummarizer` against the mock model server: cold at each
+`--concurrency`, again with every summary cached, and after changing one
+paragraph, when only the chunks around it and the merges above them are
+recomputed. Uses the tokenizer configured by `TOKENIZER`.
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+from typing import List
+from bench.chunker import make_corpus
+from bench.mock_server import start_mock_server
+
+
+async def run(name: str, summarizer, chunks: List[str]):
+    calls, cached = summarizer.counts["calls"], summarizer.counts["cached"]
+    start = time.perf_counter()
+    await summarizer("guideline", chunks)
+    print(f"{name:<16} {(time.perf_counter() - start) * 1000:8.1f}ms  "
+          f"{summarizer.counts['calls'] - calls:4d} calls  "
+          f"{summarizer.counts['cached'] - cached:4d} cached")
+
+
+async def main(args):
+    server, base_url = start_mock_server(latency_ms=args.latency_ms,
+                                         per_item_ms=args.per_token_ms)
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ.update({
+            "MODEL_URL": base_url,
+            "BASE_URL": base_url,
+            "API_KEY": os.getenv("API_KEY", "mock"),
+            "CACHE_DIR": directory,
+            "TRACE_FILE": str(Path(directory) / "traces.jsonl"),
+            "LLM_CACHE": "false",
+        })
+        from agent.utils.chunker import RecursiveChunker
+        from agent.utils.summarizer import MapReduceSummarizer, _summary_cache
+
+        text = make_corpus(1, args.paragraphs)[0].page_content
+        chunker = RecursiveChunker()
+        chunks = chunker.split_text(text)
+        print(f"{len(chunks)} chunks")
+        for concurrency in args.concurrency:
+            _summary_cache().clear()
+            summarizer = MapReduceSummarizer(concurrency=concurrency)
+            await run(f"concurrency {concurrency}", summarizer, chunks)
+        await run("cached", summarizer, chunks)
+        paragraphs = text.split("\n\n")
+        middle = len(paragraphs) // 2
+        paragraphs[middle] = "Revised: " + paragraphs[middle]
+        await run("one edit", summarizer,
+                  chunker.split_text("\n\n".join(paragraphs)))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paragraphs", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--per-token-ms", type=float, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,132 @@
+"""End-to-end latency of the medical agent graph against mocked models.
+
+    python -m bench.workflow --cases 10 --latency-ms 200
+
+Every model call goes to the local mock server and retrieval runs against
+empty collections in the in-process store, so only graph structure and
+model round trips are measured. Compares the parallel `app` with the same
+nodes chained one after another (the previous layout) and reports p50/p95
+per case, mean time per node and the two branches that meet at
+"Symptom Checker".
+"""
+import os
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+from typing import Dict, List
+from bench.mock_server import start_mock_server
+
+RECORD_NODES = ["InputProcessor", "KnowledgeRetriever", "KnowledgeReasoner"]
+IMAGE_NODES = ["ImagePreprocessor", "ImageClassifier", "SymptomFinder"]
+
+
+def make_cases(directory: Path, count: int) -> List[Dict[str, str]]:
+    from PIL import Image
+
+    rng = random.Random(0)
+    cases = []
+    for index in range(count):
+        image_path = directory / f"image_{index}.png"
+        record_path = directory / f"record_{index}.png"
+        for path in (image_path, record_path):
+            Image.frombytes("L", (256, 256),
+                            rng.randbytes(256 * 256)).save(path)
+        cases.append({
+            "medical_image_path": str(image_path),
+            "medical_recode_path": str(record_path),
+        })
+    return cases
+
+
+def sequential_graph():
+    from langgraph.graph import StateGraph, START, END
+    from agent import node
+    from agent.state import (MedicalAgentState, MedicalAgentInputState,
+                             MedicalOutputInputState)
+    from agent.workflow import MedicalKnowledgeRetriever
+
+    steps = [
+        ("Input Processor", node.InputProcessor),
+        ("Image Preprocessor", node.ImagePreprocessor),
+        ("Medical Knowledge Agent", MedicalKnowledgeRetriever),
+        ("Image Classifier", node.ImageClassifier),
+        ("Symptom Finder", node.SymptomFinder),
+        ("Symptom Checker", node.SymptomChecker),
+        ("Human Reviewer", node.HumanReviewer),
+        ("Report Generator", node.ReportGenerator),
+    ]
+    graph = StateGraph(MedicalAgentState,
+                       input_schema=MedicalAgentInputState,
+                       output_schema=MedicalOutputInputState)
+    previous = START
+    for name, action in steps:
+        graph.add_node(name, action)
+        graph.add_edge(previous, name)
+        previous = name
+    graph.add_edge(previous, END)
+    return graph.compile()
+
+
+async def run(name: str, graph, cases: List[Dict[str, str]]):
+    latencies, timings = [], []
+    for case in cases:
+        start = time.perf_counter()
+        result = await graph.ainvoke(case)
+        latencies.append(time.perf_counter() - start)
+        timings.append(result["timings"])
+    latencies.sort()
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    nodes = {
+        node: statistics.mean(timing.get(node, 0.0) for timing in timings)
+        for node in timings[0]
+    }
+    record = sum(nodes.get(node, 0.0) for node in RECORD_NODES)
+    image = sum(nodes.get(node, 0.0) for node in IMAGE_NODES)
+    print(f"{name:<11} p50 {statistics.median(latencies) * 1000:8.1f}ms  "
+          f"p95 {p95 * 1000:8.1f}ms  "
+          f"record branch {record * 1000:7.1f}ms  "
+          f"image branch {image * 1000:7.1f}ms")
+    return nodes
+
+
+async def main(args):
+    server, base_url = start_mock_server(latency_ms=args.latency_ms,
+                                         per_item_ms=args.per_token_ms)
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ.update({
+            "MODEL_URL": base_url,
+            "BASE_URL": base_url,
+            "API_KEY": os.getenv("API_KEY", "mock"),
+            "RAG": "lrag",
+            "LOCAL_RAG_DIR": str(Path(directory) / "lrag"),
+            "CACHE_DIR": directory,
+            "LLM_CACHE": "false",
+            "EMBEDDING_CACHE": "false",
+            "HUMAN_REVIEW": "false",
+        })
+        from agent.workflow import app
+        from agent.utils.nrag import get_rag
+
+        await get_rag().ensure_collections()
+        cases = make_cases(Path(directory), args.cases)
+        # Warm up imports and connection pools outside the measurement.
+        await app.ainvoke(cases[0])
+        sequential = await run("sequential", sequential_graph(), cases)
+        parallel = await run("parallel", app, cases)
+        print(f"\n{'node':<20} {'sequential':>10} {'parallel':>10}")
+        for node in sequential:
+            print(f"{node:<20} {sequential[node] * 1000:8.1f}ms "
+                  f"{parallel.get(node, 0.0) * 1000:8.1f}ms")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--per-token-ms", type=float, default=2)
+    asyncio.run(main(parser.parse_args()))
@@ -1,5 +1,5 @@
 MODULE_HOME="$(dirname "$(dirname "$(readlink -f "$0")")")"
 
-set -a && source $MODULE_HOME/conf/agent.conf && set +a
+set -a && source "$MODULE_HOME/conf/agent.conf" && set +a
 
-python -m agent.test
\ No newline at end of file
+python "$MODULE_HOME/run.py" "$@"
\ No newline at end of file
@@ -0,0 +1,187 @@
+"""Run the medical agent over a batch of cases.
+
+    python run.py cases.jsonl --output reports.jsonl --workers 8
+    python run.py data/cases/ --output reports.jsonl
+
+A manifest is JSONL with `medical_image_path`, `medical_recode_path` and
+an optional `case_id` per line; a directory holds one sub-directory per
+case with an `image.*` and an optional `record.*` file. Cases are read
+lazily and run on a pool of asyncio workers, every step is checkpointed,
+and one JSON line per case is appended to the output as soon as it
+finishes. Re-running the same command skips cases already reported and
+resumes interrupted ones from their last checkpoint. Cases parked at
+"Human Reviewer" are reported with status `review`. `--restart` deletes
+each case's checkpoints before running it, so every case runs from
+scratch under its usual thread id.
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import statistics
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Set
+from agent.utils.tools import logger
+
+
+def iter_cases(source: str) -> Iterator[Dict[str, Any]]:
+    path = Path(source)
+    if path.is_dir():
+        for case_dir in sorted(p for p in path.iterdir() if p.is_dir()):
+            files = {file.stem: file for file in case_dir.iterdir()}
+            if "image" not in files:
+                logger.warning(f"Skipping {case_dir}: no image file")
+                continue
+            yield {
+                "case_id": case_dir.name,
+                "medical_image_path": str(files["image"]),
+                "medical_recode_path": str(files.get("record") or ""),
+            }
+        return
+    with open(path, encoding="utf-8") as manifest:
+        for line in manifest:
+            if line.strip():
+                yield json.loads(line)
+
+
+def reported_cases(output: Path) -> Set[str]:
+    """Thread ids that already have a final line in `output`."""
+    if not output.exists():
+        return set()
+    reported = set()
+    with open(output, encoding="utf-8") as reports:
+        for line in reports:
+            try:
+                report = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by a crash
+            if report.get("status") in ("done", "review"):
+                reported.add(report["case_id"])
+    return reported
+
+
+async def run_one(app, case: Dict[str, Any]) -> Dict[str, Any]:
+    from agent.workflow import run_case
+    from agent.utils.checkpoint import case_thread_id
+
+    report = {
+        "case_id": case_thread_id(case),
+        "medical_image_path": case.get("medical_image_path"),
+        "medical_recode_path": case.get("medical_recode_path"),
+    }
+    start = time.perf_counter()
+    try:
+        result = await run_case(app, case)
+    except Exception as e:
+        logger.error(f"Case {report['case_id']} failed: {e!r}")
+        return {**report, "status": "error", "error": repr(e)}
+    report["seconds"] = time.perf_counter() - start
+    if result.get("__interrupt__"):
+        report["status"] = "review"
+        report["review_request"] = result["__interrupt__"][0].value
+    else:
+        report["status"] = "done"
+        report["medical_report"] = result.get("medical_report")
+    report["timings"] = result.get("timings", {})
+    report["rag_iterations"] = result.get("rag_iterations")
+    report["cascade_trace"] = result.get("cascade_trace", [])
+    return report
+
+
+def percentiles(values: List[float]) -> str:
+    values = sorted(values)
+    p95 = values[int(0.95 * (len(values) - 1))]
+    return (f"p50 {statistics.median(values) * 1000:9.1f}ms  "
+            f"p95 {p95 * 1000:9.1f}ms")
+
+
+def summarize(reports: List[Dict[str, Any]], elapsed: float):
+    if not reports:
+        print("\nNo cases left to run")
+        return
+    statuses: Dict[str, int] = {}
+    for report in reports:
+        statuses[report["status"]] = statuses.get(report["status"], 0) + 1
+    print(f"\n{len(reports)} cases in {elapsed:.1f}s "
+          f"({len(reports) / max(elapsed, 1e-9):.2f} cases/s): " +
+          ", ".join(f"{count} {status}"
+                    for status, count in sorted(statuses.items())))
+    finished = [report for report in reports if "seconds" in report]
+    if not finished:
+        return
+    print(f"{'case':<20} {percentiles([r['seconds'] for r in finished])}")
+    nodes: Dict[str, List[float]] = {}
+    for report in finished:
+        for node, seconds in report["timings"].items():
+            nodes.setdefault(node, []).append(seconds)
+    for node, values in nodes.items():
+        print(f"{node:<20} {percentiles(values)}")
+    steps: Dict[str, List[Dict[str, Any]]] = {}
+    for report in finished:
+        for entry in report.get("cascade_trace") or []:
+            steps.setdefault(entry["node"], []).append(entry)
+    for node, entries in steps.items():
+        escalated = sum(entry["escalated"] for entry in entries)
+        cost = sum(entry["cost"] for entry in entries) / len(entries)
+        print(f"{node:<20} escalated {escalated}/{len(entries)} "
+              f"({escalated / len(entries):.0%}), cost {cost:.5f} per call")
+
+
+async def main(args):
+    from agent.workflow import build_app
+    from agent.utils.checkpoint import case_thread_id, open_checkpointer
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    skip = set() if args.restart else reported_cases(output)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=args.workers * 2)
+    reports: List[Dict[str, Any]] = []
+
+    async with open_checkpointer(args.checkpoint_db) as saver:
+        app = build_app(saver)
+
+        async def produce():
+            skipped = 0
+            for case in iter_cases(args.source):
+                if case_thread_id(case) in skip:
+                    skipped += 1
+                    continue
+                await queue.put(case)
+            for _ in range(args.workers):
+                await queue.put(None)
+            if skipped:
+                logger.info(f"Skipped {skipped} cases already reported")
+
+        async def work(file):
+            while (case := await queue.get()) is not None:
+                if args.restart:
+                    # A finished thread would return its stored output.
+                    await saver.adelete_thread(case_thread_id(case))
+                report = await run_one(app, case)
+                file.write(json.dumps(report, ensure_ascii=False) + "\n")
+                file.flush()
+                reports.append(report)
+                logger.info(f"Case {report['case_id']}: {report['status']} "
+                            f"({len(reports)} done)")
+
+        start = time.perf_counter()
+        with open(output, "a", encoding="utf-8") as file:
+            await asyncio.gather(produce(),
+                                 *(work(file) for _ in range(args.workers)))
+        summarize(reports, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="JSONL manifest or case directory")
+    parser.add_argument("--output", default="reports.jsonl")
+    parser.add_argument("--workers",
+                        type=int,
+                        default=int(os.getenv("RUN_WORKERS", 4)))
+    parser.add_argument("--checkpoint-db")
+    parser.add_argument("--restart",
+                        action="store_true",
+                        help="delete each case's checkpoints and run it "
+                        "from scratch, even if already reported")
+    asyncio.run(main(parser.parse_args()))
@@ -1 +1,325 @@
+"""HTTP service around the medical agent graph.
 
+    python serve.py                     # SERVE_HOST:SERVE_PORT
+    curl -N -F image=@xray.png -F record=@record.pdf localhost:8000/cases
+
+`POST /cases` takes a multipart upload (`image`, optional `record` and
+`case_id` of letters, digits, `_` and `-`) and answers with server-sent
+events while the graph runs: `record` with the text of each clinical
+record page as it is OCRed, in page order, `node` as each node finishes,
+`token` for every chunk of the report, then `report`, `review` when the
+case is parked at "Human Reviewer" (answer with
+`POST /cases/{case_id}/review`) or `error`. Runs are checkpointed per
+case id, so posting the same case again resumes it or replays its
+report; a case id already used for other uploads is refused with 409.
+
+At most `SERVE_CONCURRENCY` cases run at once and `SERVE_QUEUE` more
+wait for a slot; beyond that requests are turned away with 503 and
+`Retry-After` before their upload is read. A case runs on one request
+at a time: posting it or its review while it runs gets 409. Model clients, the gateway's
+connection pools and the checkpoint store are shared by all requests.
+"""
+import os
+import re
+import json
+import shutil
+import asyncio
+import hashlib
+import threading
+from pathlib import Path
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Set
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from langgraph.types import Command
+from agent import node
+from agent.workflow import build_app, _output
+from agent.utils.checkpoint import case_config, open_checkpointer
+from agent.utils.nrag import get_rag
+from agent.utils.tools import logger
+from agent.utils.tracing import trace_run
+
+UPLOAD_DIR = Path(
+    os.getenv("UPLOAD_DIR",
+              Path(os.getenv("CACHE_DIR", "./cache")) / "uploads"))
+REPORT_NODE = "Report Generator"
+# Client case ids name their upload directory.
+CASE_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+class Admission:
+    """Run at most `concurrency` cases and queue at most `queue` more, each
+    case on at most one request at a time."""
+
+    def __init__(self, concurrency: int, queue: int):
+        self.slots = asyncio.Semaphore(concurrency)
+        self.capacity = concurrency + queue
+        self.admitted = 0
+        self.running: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def admit(self) -> bool:
+        with self._lock:
+            if self.admitted >= self.capacity:
+                return False
+            self.admitted += 1
+            return True
+
+    def claim(self, thread_id: str) -> bool:
+        """Reserve `thread_id` for this request; False if it is taken."""
+        with self._lock:
+            if thread_id in self.running:
+                return False
+            self.running.add(thread_id)
+            return True
+
+    def release(self, thread_id: Optional[str] = None):
+        with self._lock:
+            self.admitted -= 1
+            if thread_id is not None:
+                self.running.discard(thread_id)
+
+
+class CaseStream(StreamingResponse):
+    """Event stream that gives back its admission slot and case once
+    served, even when the client leaves before the first event."""
+
+    def __init__(self, content: AsyncIterator[str], admission: Admission,
+                 thread_id: str, **kwargs):
+        super().__init__(content, media_type="text/event-stream", **kwargs)
+        self.admission = admission
+        self.thread_id = thread_id
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.admission.release(self.thread_id)
+
+
+@asynccontextmanager
+async def lifespan(service: FastAPI):
+    for get_model in (node.get_mk_agent, node.get_llm_agent,
+                      node.get_vlm_agent, node.get_ocr_agent):
+        get_model()
+    await get_rag().ensure_collections()
+    async with open_checkpointer() as saver:
+        service.state.graph = build_app(saver)
+        service.state.admission = Admission(
+            int(os.getenv("SERVE_CONCURRENCY", 8)),
+            int(os.getenv("SERVE_QUEUE", 32)))
+        yield
+
+
+service = FastAPI(title="Medical Agent", lifespan=lifespan)
+
+
+def _event(name: str, data: Any) -> str:
+    return f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _busy() -> JSONResponse:
+    return JSONResponse({"error": "too many cases in flight"},
+                        status_code=503,
+                        headers={"Retry-After": "1"})
+
+
+async def _stream(graph, admission: Admission, config: Dict[str, Any],
+                  payload: Any) -> AsyncIterator[str]:
+    """Run the graph from `payload` and translate its stream into events.
+
+    `payload` is the case for a new thread, None to resume one, or a
+    `Command` answering its review.
+    """
+    thread_id = config["configurable"]["thread_id"]
+    try:
+        async with admission.slots:
+            with trace_run("case", case_id=thread_id):
+                snapshot = await graph.aget_state(config)
+                run = True
+                if isinstance(payload, dict) and snapshot.values:
+                    # Posted again: resume a run cut short, replay any other.
+                    payload = None
+                    run = bool(snapshot.next) and not snapshot.interrupts
+                if run:
+                    async for _, mode, chunk in graph.astream(
+                            payload,
+                            config,
+                            stream_mode=["updates", "messages", "custom"],
+                            subgraphs=True):
+                        if mode == "custom":
+                            if "record_page" in chunk:
+                                yield _event("record", chunk)
+                            continue
+                        if mode == "messages":
+                            message, metadata = chunk
+                            if (metadata.get("langgraph_node") == REPORT_NODE
+                                    and message.content):
+                                yield _event("token",
+                                             {"text": message.content})
+                            continue
+                        for name, update in chunk.items():
+                            if name != "__interrupt__":
+                                timings = (update or {}).get("timings")
+                                yield _event("node", {
+                                    "node": name,
+                                    "timings": timings
+                                })
+                    snapshot = await graph.aget_state(config)
+                if snapshot.interrupts:
+                    yield _event("review", snapshot.interrupts[0].value)
+                else:
+                    yield _event("report", _output(snapshot.values))
+    except Exception as e:
+        logger.error(f"Case {thread_id} failed: {e!r}")
+        yield _event("error", {"error": repr(e)})
+
+
+def _save(directory: Path, name: str, upload) -> str:
+    path = directory / f"{name}{Path(upload.filename or '').suffix}"
+    with open(path, "wb") as file:
+        shutil.copyfileobj(upload.file, file)
+    return str(path)
+
+
+async def _digest(form) -> str:
+    digest = hashlib.sha256()
+    for field in ("image", "record"):
+        if form.get(field) is not None:
+            digest.update(await form[field].read())
+            await form[field].seek(0)
+    return digest.hexdigest()
+
+
+def _load_case(path: Path) -> Optional[Dict[str, Any]]:
+    if not path.exists():
+        return None
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def _write_case(path: Path, case: Dict[str, Any]):
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(case, file, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+async def _store_case(form, case_id: str,
+                      digest: str) -> Optional[Dict[str, Any]]:
+    """Save the uploads of `case_id` once; None if the case id already
+    holds different uploads."""
+    directory = UPLOAD_DIR / case_id
+    stored = await asyncio.to_thread(_load_case, directory / "case.json")
+    if stored is not None:
+        return stored if stored.pop("digest") == digest else None
+    directory.mkdir(parents=True, exist_ok=True)
+    case = {"case_id": case_id, "medical_recode_path": ""}
+    case["medical_image_path"] = await asyncio.to_thread(
+        _save, directory, "image", form["image"])
+    if form.get("record") is not None:
+        case["medical_recode_path"] = await asyncio.to_thread(
+            _save, directory, "record", form["record"])
+    await asyncio.to_thread(_write_case, directory / "case.json", {
+        **case, "digest": digest
+    })
+    return case
+
+
+def _refuse(admission: Admission,
+            status_code: int,
+            error: str,
+            thread_id: Optional[str] = None) -> JSONResponse:
+    admission.release(thread_id)
+    return JSONResponse({"error": error}, status_code=status_code)
+
+
+@service.post("/cases")
+async def create_case(request: Request):
+    admission: Admission = request.app.state.admission
+    if not admission.admit():
+        return _busy()
+    claimed = None
+    try:
+        form = await request.form()
+        if form.get("image") is None:
+            return _refuse(admission, 400, "an image upload is required")
+        digest = await _digest(form)
+        case_id = form.get("case_id") or digest[:16]
+        if not CASE_ID_PATTERN.fullmatch(case_id):
+            return _refuse(admission, 400,
+                           "case_id must be 1-64 letters, digits, _ or -")
+        config = case_config({"case_id": case_id})
+        thread_id = config["configurable"]["thread_id"]
+        if not admission.claim(thread_id):
+            return _refuse(admission, 409, "case is already running")
+        claimed = thread_id
+        case = await _store_case(form, case_id, digest)
+        if case is None:
+            return _refuse(admission, 409,
+                           "case_id is already used for other uploads",
+                           thread_id)
+    except Exception:
+        admission.release(claimed)
+        raise
+    logger.info(f"Case {case_id} accepted")
+    stream = _stream(request.app.state.graph, admission, config, case)
+    return CaseStream(stream,
+                      admission,
+                      thread_id,
+                      headers={"X-Case-Id": case_id})
+
+
+@service.post("/cases/{case_id}/review")
+async def review_case(case_id: str, request: Request):
+    try:
+        review = await request.json()
+    except ValueError:
+        return JSONResponse({"error": "the review must be a JSON body"},
+                            status_code=400)
+    admission: Admission = request.app.state.admission
+    if not admission.admit():
+        return _busy()
+    graph = request.app.state.graph
+    config = case_config({"case_id": case_id})
+    thread_id = config["configurable"]["thread_id"]
+    if not admission.claim(thread_id):
+        return _refuse(admission, 409, "case is already running")
+    try:
+        waiting = bool((await graph.aget_state(config)).interrupts)
+    except Exception:
+        admission.release(thread_id)
+        raise
+    if not waiting:
+        return _refuse(admission, 409, "case is not waiting for review",
+                       thread_id)
+    stream = _stream(graph, admission, config, Command(resume=review))
+    return CaseStream(stream, admission, thread_id)
+
+
+@service.get("/cases/{case_id}")
+async def get_case(case_id: str, request: Request):
+    snapshot = await request.app.state.graph.aget_state(
+        case_config({"case_id": case_id}))
+    if not snapshot.values:
+        return JSONResponse({"error": "unknown case"}, status_code=404)
+    status = "running"
+    if snapshot.interrupts:
+        status = "review"
+    elif not snapshot.next:
+        status = "done"
+    return {"case_id": case_id, "status": status, **_output(snapshot.values)}
+
+
+@service.get("/health")
+async def health(request: Request):
+    admission: Admission = request.app.state.admission
+    return {"status": "ok", "in_flight": admission.admitted}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(service,
+                host=os.getenv("SERVE_HOST", "0.0.0.0"),
+                port=int(os.getenv("SERVE_PORT", 8000)))
@@ -72,29 +72,30 @@ text = "LangChain is the framework for building context-aware reasoning applicat
 single_vector = embedding_model.embed_query(text)
 logger.info(f"Single vector embedding for the text: {single_vector[:5]}...")
 
-rerank_result = rerank(
-    query="Python programming",
-    documents=[
-        {
-            "content": "Python is great",
-            "metadata": {
-                "file_name": "doc1"
-            }
-        },
-        {
-            "content": "Java is fast",
-            "metadata": {
-                "file_name": "doc2"
-            }
-        },
-        {
-            "content": "C++ is powerful",
-            "metadata": {
-                "file_name": "doc1"
-            }
-        },
-    ],
-)
+rerank_result = asyncio.run(
+    rerank(
+        query="Python programming",
+        documents=[
+            {
+                "content": "Python is great",
+                "metadata": {
+                    "file_name": "doc1"
+                }
+            },
+            {
+                "content": "Java is fast",
+                "metadata": {
+                    "file_name": "doc2"
+                }
+            },
+            {
+                "content": "C++ is powerful",
+                "metadata": {
+                    "file_name": "doc1"
+                }
+            },
+        ],
+    ))
 logger.info(rerank_result)
 
 qdrant_client = AsyncQdrantRAG()